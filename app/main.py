@@ -1,5 +1,5 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import uuid
@@ -8,7 +8,9 @@ import asyncio
 import time
 import json
 import shutil
-from typing import List, Optional
+import hashlib
+from typing import Dict, Any, List, Optional
+import aiofiles
 
 from rag_core.config import config
 from rag_core.pipeline import RAGPipeline
@@ -16,11 +18,18 @@ from rag_core.query import QueryProcessor
 from rag_core.advanced_query import AdvancedQueryProcessor
 from rag_core.conversion.excel_to_pdf import (
     convert_excel_to_pdf,
-    get_latest_debug_artifacts_dir,
-    get_latest_debug_combined_pdf,
     needs_conversion,
 )
 from rag_core.parsers import ParserFactory
+from rag_core.mineru_pool import get_mineru_pool, shutdown_mineru_pool
+from rag_core.parse_cache import get_parse_cache
+from rag_core.asset_store import get_asset_stats
+from rag_core.pdf_text import shutdown_pdf_text_pool
+from rag_core.jobs import get_job_queue
+from rag_core.ingest_worker import IngestWorker
+from rag_core.processors import get_image_preview
+from rag_core.llm_unified import LLM_TASKS
+from rag_core.image_prep import image_preparer
 from rag_core.schemas import (
     ProcessingStatus,
     DocumentMetadata,
@@ -91,17 +100,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multipart form overhead (boundaries, other fields) allowed on top of MAX_FILE_SIZE_MB
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse bodies whose Content-Length exceeds MAX_FILE_SIZE_MB before they are read.
+
+    Chunked requests carry no Content-Length; Starlette spools those to a temporary file
+    before the handler runs, and save_upload rejects them afterwards.
+    """
+    length = request.headers.get("content-length")
+    max_bytes = config.MAX_FILE_SIZE_MB * 1024 * 1024 + UPLOAD_FORM_OVERHEAD
+    if request.method == "POST" and length and length.isdigit() and int(length) > max_bytes:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File too large (max {config.MAX_FILE_SIZE_MB}MB)"}
+        )
+    return await call_next(request)
+
+async def save_upload(file: UploadFile, file_path: Path) -> Dict[str, Any]:
+    """Copy an upload to disk in fixed-size chunks, hashing on the fly.
+
+    Starlette has already spooled the multipart body by the time this runs, so this keeps
+    memory flat rather than stopping the transfer early. Raises 413 once the copy passes
+    MAX_FILE_SIZE_MB (for chunked requests the middleware had no Content-Length to check);
+    the partial file is removed.
+    """
+    max_bytes = config.MAX_FILE_SIZE_MB * 1024 * 1024
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large (max {config.MAX_FILE_SIZE_MB}MB)"
+        )
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(file_path, "wb") as f:
+            while chunk := await file.read(config.UPLOAD_CHUNK_SIZE_KB * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large (max {config.MAX_FILE_SIZE_MB}MB)"
+                    )
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        # Drop the per-upload directory too if nothing else is in it
+        try:
+            file_path.parent.rmdir()
+        except OSError:
+            pass
+        raise
+    finally:
+        await file.close()
+    return {"size": size, "sha256": digest.hexdigest()}
+
 # Initialize processors
 pipeline = RAGPipeline()
 legacy_query_processor = QueryProcessor()
-advanced_query_processor = AdvancedQueryProcessor(pipeline.lightrag)
-
-# Task management
-processing_tasks = {}
+advanced_query_processor = AdvancedQueryProcessor(pipeline.lightrag, pipeline.index_writer)
+
+# Ingest jobs are persisted in the job queue; workers run them (in-process and/or `python -m app.worker`)
+job_queue = get_job_queue()
+embedded_worker: Optional[IngestWorker] = None
+embedded_worker_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_embedded_worker():
+    """Run an ingest worker inside the API process unless dedicated workers are deployed"""
+    global embedded_worker, embedded_worker_task
+    if config.INGEST_EMBEDDED_WORKER:
+        embedded_worker = IngestWorker(pipeline, job_queue)
+        embedded_worker_task = asyncio.create_task(embedded_worker.run())
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stop the embedded ingest worker, MinerU and PDF text-scan worker processes"""
+    if embedded_worker is not None:
+        embedded_worker.stop()
+        await embedded_worker_task
+    await shutdown_mineru_pool()
+    shutdown_pdf_text_pool()
 
 @app.post("/ingest")
 async def ingest_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     enable_images: bool = True,
     enable_tables: bool = True,
@@ -111,7 +197,6 @@ async def ingest_document(
 ):
     """Ingest document for processing (alias for /ingest/upload)"""
     return await upload_document(
-        background_tasks=background_tasks,
         file=file,
         enable_images=enable_images,
         enable_tables=enable_tables,
@@ -121,7 +206,6 @@ async def ingest_document(
 
 @app.post("/ingest/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     enable_images: bool = True,
     enable_tables: bool = True,
@@ -133,12 +217,6 @@ async def upload_document(
     try:
         request_start = time.time()
         logger.info("[INGEST] Upload started: filename=%s", file.filename)
-        # Validate file size
-        if file.size > config.MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File too large (max {config.MAX_FILE_SIZE_MB}MB)"
-            )
         
         # Generate task ID
         task_id = str(uuid.uuid4())
@@ -149,81 +227,41 @@ async def upload_document(
         
         # Save file
         file_path = upload_dir / file.filename
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        upload = await save_upload(file, file_path)
         logger.info(
-            "[INGEST] File saved: task_id=%s path=%s elapsed=%.3fs",
+            "[INGEST] File saved: task_id=%s path=%s size=%d sha256=%s elapsed=%.3fs",
             task_id,
             str(file_path),
+            upload["size"],
+            upload["sha256"][:12],
             time.time() - request_start
         )
 
-        # Check if file needs conversion and convert if necessary
-        if needs_conversion(str(file_path)):
-            logger.info("[INGEST] File needs conversion, converting to PDF: %s", file_path)
-            conversion_start = time.time()
-            try:
-                converted_pdf_path = convert_excel_to_pdf(str(file_path))  # Will save to input/converted
-                file_path = Path(converted_pdf_path)  # Update file_path to point to the PDF
-                debug_dir = get_latest_debug_artifacts_dir()
-                debug_combined = get_latest_debug_combined_pdf()
-                conversion_elapsed = time.time() - conversion_start
-                logger.info(
-                    "[INGEST] Conversion completed: original=%s pdf=%s conversion_time=%.2fs total_elapsed=%.2fs",
-                    str(upload_dir / file.filename),
-                    str(file_path),
-                    conversion_elapsed,
-                    time.time() - request_start
-                )
-                if debug_dir:
-                    logger.info("[INGEST] Debug artifacts stored at %s", debug_dir)
-                if debug_combined:
-                    logger.info("[INGEST] Debug combined PDF at %s", debug_combined)
-            except Exception as conv_error:
-                logger.error("[INGEST] Conversion failed after %.2fs for %s: %s",
-                           time.time() - conversion_start, file_path, str(conv_error))
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Document conversion failed: {str(conv_error)}"
-                )
-
-        # Start background processing
-        background_tasks.add_task(
-            process_document_background,
-            task_id=task_id,
-            file_path=str(file_path),
-            parser_type=parser,
-            config_overrides={
+        # Queue for an ingest worker (Office→PDF conversion runs there as the first pipeline stage)
+        await asyncio.to_thread(job_queue.enqueue, task_id, {
+            "file_path": str(file_path),
+            "file_sha256": upload["sha256"],
+            "parser_type": parser,
+            "config_overrides": {
                 "enable_images": enable_images,
                 "enable_tables": enable_tables,
                 "enable_equations": enable_equations
             }
-        )
-        logger.info(
-            "[INGEST] Background task queued: task_id=%s elapsed=%.3fs",
-            task_id,
-            time.time() - request_start
-        )
-        
-        # Initialize task status
-        processing_tasks[task_id] = {
-            "status": "processing",
-            "file_path": str(file_path),
-            "start_time": time.time()
-        }
+        })
         logger.info(
-            "[INGEST] Tracking initialized: task_id=%s total_elapsed=%.3fs",
+            "[INGEST] Job queued: task_id=%s total_elapsed=%.3fs",
             task_id,
             time.time() - request_start
         )
         
         return {
             "task_id": task_id,
-            "status": "processing",
-            "message": "Document upload successful, processing started"
+            "status": "queued",
+            "message": "Document upload successful, queued for processing"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Document upload failed: {str(e)}")
         raise HTTPException(
@@ -239,13 +277,6 @@ async def convert_document(file: UploadFile = File(...)):
         request_start = time.time()
         logger.info("[CONVERT] Conversion started: filename=%s", file.filename)
 
-        # Validate file size
-        if file.size > config.MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File too large (max {config.MAX_FILE_SIZE_MB}MB)"
-            )
-
         # Check if file needs conversion
         file_ext = Path(file.filename).suffix.lower()
         if not needs_conversion(file.filename):
@@ -263,15 +294,15 @@ async def convert_document(file: UploadFile = File(...)):
 
         # Save original file
         original_file_path = upload_dir / file.filename
-        content = await file.read()
-        with open(original_file_path, "wb") as f:
-            f.write(content)
+        await save_upload(file, original_file_path)
 
         # Convert to PDF (will save to input/converted directory)
         conversion_start = time.time()
         try:
             logger.info("[CONVERT] Starting conversion for task_id=%s: %s", task_id, original_file_path)
-            converted_pdf_path = convert_excel_to_pdf(str(original_file_path))
+            converted_pdf_path, debug_dir, debug_combined = await asyncio.to_thread(
+                convert_excel_to_pdf, str(original_file_path)
+            )
             conversion_elapsed = time.time() - conversion_start
             logger.info(
                 "[CONVERT] Conversion completed: task_id=%s original=%s pdf=%s conversion_time=%.2fs total_elapsed=%.2fs",
@@ -287,8 +318,8 @@ async def convert_document(file: UploadFile = File(...)):
                 "status": "converted",
                 "original_file": str(original_file_path),
                 "converted_pdf": converted_pdf_path,
-                "debug_artifacts_dir": get_latest_debug_artifacts_dir(),
-                "debug_combined_pdf": get_latest_debug_combined_pdf(),
+                "debug_artifacts_dir": debug_dir,
+                "debug_combined_pdf": debug_combined,
                 "message": "Document conversion successful"
             }
 
@@ -328,37 +359,29 @@ async def process_document_preview(
         request_start = time.time()
         logger.info("[PROCESS] Upload started: filename=%s", file.filename)
 
-        if file.size > config.MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File too large (max {config.MAX_FILE_SIZE_MB}MB)"
-            )
-
         process_id = str(uuid.uuid4())
         upload_dir = config.get_upload_dir() / process_id
         upload_dir.mkdir(parents=True, exist_ok=True)
 
         original_file_path = upload_dir / file.filename
-        content = await file.read()
-        with open(original_file_path, "wb") as f:
-            f.write(content)
+        await save_upload(file, original_file_path)
         logger.info("[PROCESS] File saved: %s", original_file_path)
 
         working_file_path = original_file_path
 
-        if needs_conversion(str(original_file_path)):
+        if needs_conversion(str(original_file_path)) and not ParserFactory.native_parser_for(str(original_file_path), parser):
             logger.info("[PROCESS] File needs conversion, converting to PDF: %s", original_file_path)
             conversion_start = time.time()
             try:
-                converted_pdf_path = convert_excel_to_pdf(str(original_file_path))
+                converted_pdf_path, debug_dir, debug_combined = await asyncio.to_thread(
+                    convert_excel_to_pdf, str(original_file_path)
+                )
                 working_file_path = Path(converted_pdf_path)
                 logger.info(
                     "[PROCESS] Conversion completed: pdf=%s conversion_time=%.2fs",
                     working_file_path,
                     time.time() - conversion_start
                 )
-                debug_dir = get_latest_debug_artifacts_dir()
-                debug_combined = get_latest_debug_combined_pdf()
             except Exception as conv_error:
                 logger.error("[PROCESS] Conversion failed: %s", str(conv_error))
                 raise HTTPException(
@@ -517,23 +540,46 @@ async def process_document_preview(
 async def get_processing_status(task_id: str):
     """Get document processing status"""
     
-    if task_id not in processing_tasks:
+    task_info = await asyncio.to_thread(job_queue.get, task_id)
+    if task_info is None:
         raise HTTPException(
             status_code=404,
             detail="Task not found"
         )
     
-    task_info = processing_tasks[task_id].copy()
+    # Add processing time (finished jobs are purged by workers after JOB_RETENTION_HOURS)
+    task_info["processing_time"] = (task_info["completed_at"] or time.time()) - task_info["start_time"]
     
-    # Add processing time
-    task_info["processing_time"] = time.time() - task_info["start_time"]
+    return task_info
+
+@app.post("/ingest/retry/{task_id}")
+async def retry_processing(task_id: str):
+    """Queue a failed ingest job again; it resumes after its last checkpointed stage"""
     
-    # Clean up completed tasks after 1 hour
-    if (task_info["status"] in ["completed", "failed"] and
-        task_info["processing_time"] > 3600):
-        del processing_tasks[task_id]
+    task_info = await asyncio.to_thread(job_queue.get, task_id)
+    if task_info is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Task not found"
+        )
+    if not Path(task_info["file_path"]).exists():
+        raise HTTPException(
+            status_code=410,
+            detail="Uploaded file is no longer available; upload the document again"
+        )
+    if not await asyncio.to_thread(job_queue.retry, task_id):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Only failed tasks can be retried (status: {task_info['status']})"
+        )
+    logger.info("[INGEST] Job requeued: task_id=%s stages_done=%s", task_id, task_info.get("stages_done"))
     
-    return task_info
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "stages_done": task_info.get("stages_done") or [],
+        "message": "Task queued for retry"
+    }
 
 @app.post("/query", response_model=QueryResponse)
 async def query_knowledge(request: QueryRequest):
@@ -553,6 +599,34 @@ async def query_knowledge(request: QueryRequest):
             detail=f"Query failed: {str(e)}"
         )
 
+@app.get("/assets/preview")
+async def get_asset_preview(path: str, max_size: int = 300):
+    """Render a cached JPEG preview of an extracted image asset on demand"""
+    
+    asset_path = Path(path).resolve()
+    allowed_roots = [config.get_working_dir().resolve(), config.get_upload_dir().resolve()]
+    if not any(asset_path.is_relative_to(root) for root in allowed_roots):
+        raise HTTPException(status_code=403, detail="Asset path outside storage directories")
+    if not asset_path.is_file():
+        raise HTTPException(status_code=404, detail="Asset not found")
+    if not 16 <= max_size <= 2048:
+        raise HTTPException(status_code=400, detail="max_size must be between 16 and 2048")
+    
+    try:
+        preview = await asyncio.to_thread(get_image_preview, str(asset_path), max_size)
+    except Exception as e:
+        logger.error(f"Failed to render preview for {asset_path}: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Failed to render preview: {str(e)}"
+        )
+    
+    return Response(
+        content=preview,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
 @app.get("/documents")
 async def list_documents():
     """List all processed documents"""
@@ -612,6 +686,14 @@ async def delete_document(doc_id: str):
         # Delete from registry
         pipeline.doc_registry.remove_document(doc_id)
         
+        # Delete stored table data
+        if pipeline.table_store:
+            pipeline.table_store.delete_document(doc_id)
+
+        # Drop reusable image analyses written for this document
+        if pipeline.image_dedup:
+            pipeline.image_dedup.remove_document(doc_id)
+        
         # Delete chunks
         chunks = pipeline.chunk_manager.get_chunks_by_doc(doc_id)
         for chunk in chunks:
@@ -639,13 +721,23 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "active_tasks": len(processing_tasks),
+        "active_tasks": (job_counts := await asyncio.to_thread(job_queue.counts)).get("processing", 0),
+        "jobs": job_counts,
+        "embedded_worker": embedded_worker.get_stats() if embedded_worker else None,
         "lightrag_enabled": config.LIGHTRAG_ENABLED and pipeline.lightrag is not None,
         "config": {
             "max_file_size": config.MAX_FILE_SIZE_MB,
             "parser": config.PARSER,
-            "embedding_model": config.EMBEDDING_MODEL
-        }
+            "embedding_model": config.EMBEDDING_MODEL,
+            "llm_tasks": {
+                task: config.get_llm_task_config(task)["model"] for task in LLM_TASKS
+            }
+        },
+        "llm_usage": pipeline.llm.get_usage_stats(),
+        "image_prep": image_preparer.get_stats(),
+        "mineru_pool": mineru_pool.get_stats() if (mineru_pool := get_mineru_pool()) else None,
+        "parse_cache": parse_cache.get_stats() if (parse_cache := get_parse_cache()) else None,
+        "asset_store": get_asset_stats()
     }
 
 # Advanced LightRAG endpoints
@@ -795,68 +887,3 @@ async def get_entity_relationships(
             status_code=500,
             detail=f"Entity relationships query failed: {str(e)}"
         )
-
-async def process_document_background(
-    task_id: str,
-    file_path: str,
-    parser_type: str = None,
-    config_overrides: dict = None
-):
-    """Background document processing"""
-    
-    try:
-        bg_start = time.time()
-        logger.info("[INGEST] Processing started: task_id=%s file=%s", task_id, file_path)
-        # Update task status
-        processing_tasks[task_id].update({
-            "status": "processing",
-            "progress": 0.0
-        })
-        
-        # Process document
-        status = await pipeline.process_document(
-            file_path=file_path,
-            task_id=task_id,
-            parser_type=parser_type
-        )
-        
-        # Update task status
-        processing_tasks[task_id].update({
-            "status": status.status,
-            "progress": status.progress,
-            "doc_id": status.doc_id,
-            "chunks_created": status.chunks_created,
-            "entities_found": status.entities_found,
-            "completed_at": time.time()
-        })
-        started_at = processing_tasks[task_id].get("start_time", bg_start)
-        logger.info(
-            "[INGEST] Processing completed: task_id=%s doc_id=%s chunks=%s entities=%s elapsed=%.3fs total_elapsed=%.3fs",
-            task_id,
-            status.doc_id,
-            status.chunks_created,
-            status.entities_found,
-            time.time() - bg_start,
-            time.time() - started_at
-        )
-        
-        # Clean up upload file
-        Path(file_path).unlink(missing_ok=True)
-        
-    except Exception as e:
-        logger.error(f"Document processing failed: {str(e)}")
-        processing_tasks[task_id].update({
-            "status": "failed",
-            "error": str(e),
-            "completed_at": time.time()
-        })
-        started_at = processing_tasks[task_id].get("start_time", None)
-        if started_at:
-            logger.info(
-                "[INGEST] Processing failed: task_id=%s elapsed=%.3fs",
-                task_id,
-                time.time() - started_at
-            )
-        
-        # Clean up on error
-        Path(file_path).unlink(missing_ok=True)
@@ -0,0 +1,116 @@
+"""Dedicated ingest worker: python -m app.worker [--processes N] [--concurrency N]"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+
+from rag_core.config import config
+from rag_core.pipeline import RAGPipeline
+from rag_core.ingest_worker import IngestWorker
+from rag_core.index_writer import RemoteIndexWriter, serve_index_writer
+from rag_core.mineru_pool import shutdown_mineru_pool
+from rag_core.pdf_text import shutdown_pdf_text_pool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(concurrency: int, index_writer=None):
+    worker = IngestWorker(RAGPipeline(index_writer), concurrency=concurrency)
+
+    # Finish running jobs on SIGTERM/SIGINT; unfinished ones are requeued by lease expiry otherwise
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await shutdown_mineru_pool()
+        shutdown_pdf_text_pool()
+
+def run_process(concurrency: int, index_writer=None):
+    """Entry point of one forked worker process (own event loop, pipeline and LLM client)"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    asyncio.run(main(concurrency, index_writer))
+
+def _make_index_writer():
+    return RAGPipeline().index_writer
+
+def run_index_writer(requests, responses):
+    """Entry point of the writer process; it stops on the supervisor's sentinel, after the workers"""
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    serve_index_writer(_make_index_writer, requests, responses)
+
+def supervise(processes: int, concurrency: int):
+    """Fork worker processes plus one LightRAG writer process, restarting any that exit unexpectedly"""
+    ctx = multiprocessing.get_context("fork")
+    stopping = False
+    # Each worker sizes its MinerU and page-scan pools to its share of the cores
+    config.INGEST_PROCESSES = processes
+
+    # Workers parse and analyze in parallel; their LightRAG inserts all go to one writer process,
+    # since LightRAG's file storages would lose documents with several writers
+    writer = None
+    writer_requests = ctx.Queue()
+    writer_responses = [ctx.Queue() for _ in range(processes)]
+    writer_pid = ctx.Value("i", 0)
+
+    def start_writer():
+        proc = ctx.Process(target=run_index_writer, args=(writer_requests, writer_responses), name="index-writer")
+        proc.start()
+        writer_pid.value = proc.pid
+        return proc
+
+    def start(slot: int):
+        index_writer = None
+        if writer is not None:
+            index_writer = RemoteIndexWriter(writer_requests, writer_responses[slot], slot, writer_pid)
+        proc = ctx.Process(target=run_process, args=(concurrency, index_writer), name="ingest-worker")
+        proc.start()
+        return proc
+
+    if config.LIGHTRAG_ENABLED:
+        writer = start_writer()
+    procs = [start(slot) for slot in range(processes)]
+    logger.info(f"[WORKER] Started {processes} worker processes, concurrency={concurrency} each")
+
+    def handle_signal(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    while not stopping:
+        for slot, proc in enumerate(procs):
+            if not proc.is_alive() and not stopping:
+                logger.warning(f"[WORKER] Process {proc.pid} exited with code {proc.exitcode}, restarting")
+                procs[slot] = start(slot)
+        if writer is not None and not writer.is_alive() and not stopping:
+            logger.warning(f"[WORKER] Index writer {writer.pid} exited with code {writer.exitcode}, restarting")
+            writer = start_writer()
+        time.sleep(1.0)
+
+    # Workers finish their running jobs first; those still need the writer
+    for proc in procs:
+        proc.join()
+    if writer is not None:
+        writer_requests.put(None)
+        writer.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ingest jobs from the job queue")
+    parser.add_argument("--processes", type=int, default=config.MAX_WORKERS)
+    parser.add_argument("--concurrency", type=int, default=config.INGEST_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    if args.processes > 1:
+        supervise(args.processes, args.concurrency)
+    else:
+        asyncio.run(main(args.concurrency))
@@ -13,8 +13,10 @@ from pathlib import Path
 
 from lightrag.lightrag import QueryParam
 from .config import config
-from .llm_unified import UnifiedLLM
+from .llm_unified import UnifiedLLM, make_lightrag_model_func
 from .storage import StorageManager
+from .query import QUERY_ENTITIES_SCHEMA, table_aggregate_context
+from .table_store import TableStore
 from .schemas import QueryRequest, QueryResponse
 
 logger = logging.getLogger(__name__)
@@ -23,11 +25,16 @@ logger = logging.getLogger(__name__)
 class AdvancedQueryProcessor:
     """Advanced query processor using LightRAG's capabilities"""
 
-    def __init__(self, lightrag=None):
+    def __init__(self, lightrag=None, index_writer=None):
         self.lightrag = lightrag
         self.config = config
         self.llm = UnifiedLLM()
-        self.storage = StorageManager(lightrag)
+        self.storage = StorageManager(lightrag, index_writer)
+        # Reloads LightRAG storage after the ingest writer process saved new documents
+        self.index_writer = self.storage.index_writer
+        self.table_store = None
+        if config.TABLE_STORE_ENABLED:
+            self.table_store = TableStore(config.get_working_dir() / "kv" / "tables.sqlite")
 
         # Initialize fallback storage for compatibility
         if not lightrag:
@@ -51,6 +58,13 @@ class AdvancedQueryProcessor:
         start_time = time.time()
 
         try:
+            await self.index_writer.refresh()
+
+            # Aggregates over stored tables are computed locally and passed alongside retrieval
+            table_context = None
+            if not request.multimodal_content:
+                table_context = await table_aggregate_context(self.table_store, request.query, as_user_prompt=True)
+
             # Enhance query if multimodal content provided
             enhanced_query = request.query
             if request.multimodal_content:
@@ -73,6 +87,8 @@ class AdvancedQueryProcessor:
                 max_total_tokens=30000,
                 enable_rerank=True,
                 include_references=True,
+                model_func=make_lightrag_model_func("answer"),
+                user_prompt=table_context,
             )
 
             # Execute query using LightRAG
@@ -213,6 +229,8 @@ class AdvancedQueryProcessor:
             )
 
         try:
+            await self.index_writer.refresh()
+
             # Get query embedding
             embeddings = await self.llm.get_embeddings(texts=[query])
             query_embedding = embeddings[0]
@@ -263,6 +281,8 @@ class AdvancedQueryProcessor:
             return {"error": "LightRAG not available"}
 
         try:
+            await self.index_writer.refresh()
+
             # Get embeddings for vector search
             embeddings = await self.llm.get_embeddings(texts=[query])
             query_embedding = embeddings[0]
@@ -309,24 +329,17 @@ class AdvancedQueryProcessor:
 
             Query: {query}
 
-            Return a JSON array of entity names:
-            ["Entity1", "Entity2", "Entity3"]
+            Return the entity names as an "entities" list.
             """
 
-            response = await self.llm.generate_text(
+            response = await self.llm.generate_json(
                 prompt=prompt,
-                system_prompt="You are an expert at extracting key terms and entities from text."
+                schema=QUERY_ENTITIES_SCHEMA,
+                schema_name="query_entities",
+                system_prompt="You are an expert at extracting key terms and entities from text.",
+                task="extract"
             )
-
-            # Parse entities from response
-            import re
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                import json
-                entities = json.loads(json_match.group())
-                return entities
-            else:
-                return []
+            return response["entities"]
 
         except Exception as e:
             logger.warning(f"Failed to extract entities from query: {e}")
@@ -0,0 +1,92 @@
+from typing import Dict, Any
+import logging
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+stats = {"stored": 0, "deduplicated": 0, "linked": 0, "copied": 0, "bytes_written": 0}
+
+def asset_store_root() -> Path:
+    """Content-addressed image store shared by all documents"""
+    return config.get_working_dir() / "assets" / "by_hash"
+
+def staging_dir() -> Path:
+    """Scratch space on the same filesystem as the asset store, so files can be hardlinked out of it"""
+    path = config.get_working_dir() / "tmp"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _count(key: str, amount: int = 1):
+    with _lock:
+        stats[key] += amount
+
+def link_or_copy(source: str, target: str) -> str:
+    """Hardlink source to target, copying only across filesystems (usable as a copytree copy_function)"""
+    if os.path.lexists(target):
+        os.unlink(target)
+    try:
+        os.link(source, target)
+        _count("linked")
+    except OSError:
+        shutil.copy2(source, target)
+        _count("copied")
+        _count("bytes_written", os.path.getsize(target))
+    return target
+
+def _asset_path(digest: str, suffix: str) -> Path:
+    return asset_store_root() / digest[:2] / f"{digest}{suffix.lower()}"
+
+def store_asset(source: Path) -> Path:
+    """Store a file under its sha256 and return the stored path; identical content is kept once"""
+    source = Path(source)
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    target = _asset_path(digest.hexdigest(), source.suffix)
+    if target.exists():
+        _count("deduplicated")
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+        _count("linked")
+    except FileExistsError:
+        _count("deduplicated")
+        return target
+    except OSError:
+        # Different filesystem: copy to a temp name, then rename into place atomically
+        with open(source, "rb") as src, tempfile.NamedTemporaryFile(dir=target.parent, delete=False) as tmp:
+            shutil.copyfileobj(src, tmp)
+        os.replace(tmp.name, target)
+        _count("copied")
+        _count("bytes_written", target.stat().st_size)
+    _count("stored")
+    return target
+
+def store_asset_bytes(data: bytes, suffix: str) -> Path:
+    """Store in-memory image bytes under their sha256"""
+    target = _asset_path(hashlib.sha256(data).hexdigest(), suffix)
+    if target.exists():
+        _count("deduplicated")
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=target.parent, delete=False) as tmp:
+        tmp.write(data)
+    os.replace(tmp.name, target)
+    _count("stored")
+    _count("bytes_written", len(data))
+    return target
+
+def get_asset_stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(stats)
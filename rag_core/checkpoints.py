@@ -0,0 +1,141 @@
+from typing import Dict, Any, List, Optional
+import logging
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in execution order
+CHECKPOINT_STAGES = ("convert", "parse", "separate", "text_index", "multimodal", "graph", "register")
+
+def checkpoint_root() -> Path:
+    return Path(config.CHECKPOINT_DIR) if config.CHECKPOINT_DIR else config.get_working_dir() / "checkpoints"
+
+def _write_json(path: Path, data: Any):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    tmp_path.replace(path)
+
+class StageCheckpoints:
+    """Stage outputs of one ingest task, so a retried or restarted job resumes after the last completed stage.
+
+    Checkpoints belong to a task and the hash of its source file; a different file under the
+    same task id starts from scratch.
+    """
+
+    def __init__(self, task_id: str, content_hash: str, root: Optional[Path] = None):
+        self.task_id = task_id
+        self.content_hash = content_hash
+        self.dir = Path(root or checkpoint_root()) / task_id
+        self.manifest_path = self.dir / "manifest.json"
+        self.manifest = self._load_manifest()
+        # Text indexing and multimodal analysis complete concurrently
+        self._lock = threading.Lock()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("content_hash") == self.content_hash:
+                    return manifest
+                logger.info(f"[CHECKPOINT] Source changed for task_id={self.task_id}, discarding checkpoints")
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"[CHECKPOINT] Unreadable manifest for task_id={self.task_id}: {str(e)}")
+            shutil.rmtree(self.dir, ignore_errors=True)
+        return {"task_id": self.task_id, "content_hash": self.content_hash, "stages": {}}
+
+    def completed(self) -> List[str]:
+        """Completed stages in pipeline order"""
+        return [stage for stage in CHECKPOINT_STAGES if stage in self.manifest["stages"]]
+
+    def done(self, stage: str) -> bool:
+        return stage in self.manifest["stages"]
+
+    def path(self, name: str) -> Path:
+        """Location for a file a stage produces (e.g. the converted PDF)"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return self.dir / name
+
+    def save(self, stage: str, data: Any, ingest_summary: Optional[Dict[str, Any]] = None):
+        """Record a stage as completed with its output and the ingest summary so far"""
+        _write_json(self.path(f"{stage}.json"), {"data": data, "ingest_summary": ingest_summary})
+        with self._lock:
+            self.manifest["stages"][stage] = time.time()
+            _write_json(self.manifest_path, self.manifest)
+
+    def load(self, stage: str) -> Any:
+        with open(self.dir / f"{stage}.json", encoding="utf-8") as f:
+            return json.load(f)["data"]
+
+    def last_ingest_summary(self) -> Optional[Dict[str, Any]]:
+        """Ingest summary saved with the most recent completed stage"""
+        completed = self.completed()
+        if not completed:
+            return None
+        with open(self.dir / f"{completed[-1]}.json", encoding="utf-8") as f:
+            return json.load(f)["ingest_summary"]
+
+    def save_item(self, stage: str, index: int, result: Any):
+        """Record the result of one item inside a stage (multimodal analyses)"""
+        with open(self.path(f"{stage}.items.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"index": index, "result": result}, ensure_ascii=False, default=str) + "\n")
+
+    def load_items(self, stage: str) -> Dict[int, Any]:
+        items_path = self.dir / f"{stage}.items.jsonl"
+        items: Dict[int, Any] = {}
+        if items_path.exists():
+            with open(items_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from a crash mid-write
+                        continue
+                    items[entry["index"]] = entry["result"]
+        return items
+
+    def save_item_failure(self, stage: str, index: int, error: str, skipped: bool = False):
+        """Record a failed attempt at one item, and whether the stage gave up on it"""
+        with open(self.path(f"{stage}.failures.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"index": index, "error": error, "skipped": skipped}, ensure_ascii=False) + "\n")
+
+    def load_item_failures(self, stage: str) -> Dict[int, Dict[str, Any]]:
+        """Failed attempts per item: count, last error, and whether the item was given up on"""
+        failures_path = self.dir / f"{stage}.failures.jsonl"
+        failures: Dict[int, Dict[str, Any]] = {}
+        if failures_path.exists():
+            with open(failures_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    failure = failures.setdefault(entry["index"], {"attempts": 0, "error": None, "skipped": False})
+                    failure["attempts"] += 1
+                    failure["error"] = entry["error"]
+                    failure["skipped"] = failure["skipped"] or entry["skipped"]
+        return failures
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+def purge_checkpoints(older_than_seconds: Optional[float] = None) -> int:
+    """Delete checkpoints of tasks not touched within the job retention window"""
+    root = checkpoint_root()
+    if not root.exists():
+        return 0
+    cutoff = time.time() - (older_than_seconds or config.JOB_RETENTION_HOURS * 3600)
+    purged = 0
+    for task_dir in root.iterdir():
+        manifest = task_dir / "manifest.json"
+        mtime = (manifest if manifest.exists() else task_dir).stat().st_mtime
+        if mtime < cutoff:
+            shutil.rmtree(task_dir, ignore_errors=True)
+            purged += 1
+    return purged
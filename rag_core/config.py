@@ -14,6 +14,8 @@ class RAGConfig(BaseSettings):
     
     # Parser configuration
     PARSER: str = "mineru"  # Primary parser for Office documents, PDFs, images
+    # Native parsers by file extension; these skip PDF conversion and MinerU
+    FILE_TYPE_PARSERS: Dict[str, str] = {".xlsx": "xlsx", ".xlsm": "xlsx"}
     PARSE_METHOD: str = "auto"  # "auto", "ocr", "txt"
     
     # AWS Configuration
@@ -34,6 +36,23 @@ class RAGConfig(BaseSettings):
     OPENAI_LLM_MODEL: Optional[str] = os.getenv("OPENAI_LLM_MODEL")  # For .env compatibility
     VISION_MODEL: str = os.getenv("VISION_MODEL", "gpt-4o-mini")
     OPENAI_VISION_MODEL: Optional[str] = os.getenv("OPENAI_VISION_MODEL")  # For .env compatibility
+
+    # Per-task model routing (unset values fall back to LLM_MODEL / VISION_MODEL)
+    # extract: query/fallback entity extraction, summarize: table/equation analysis,
+    # answer: final answer synthesis, vision: image analysis
+    LLM_EXTRACT_MODEL: Optional[str] = None
+    LLM_EXTRACT_MAX_TOKENS: Optional[int] = None  # Unset: no cap, extraction JSON must not be truncated
+    LLM_EXTRACT_TIMEOUT: float = 30.0
+    LLM_SUMMARIZE_MODEL: Optional[str] = None
+    LLM_SUMMARIZE_MAX_TOKENS: int = 1024
+    LLM_SUMMARIZE_TIMEOUT: float = 60.0
+    LLM_ANSWER_MODEL: Optional[str] = None
+    LLM_ANSWER_MAX_TOKENS: Optional[int] = None
+    LLM_ANSWER_TIMEOUT: float = 120.0
+    LLM_VISION_MODEL: Optional[str] = None
+    LLM_VISION_MAX_TOKENS: int = 1000
+    LLM_VISION_TIMEOUT: float = 90.0
+
     LIGHTRAG_ENABLED: bool = True  # Set to False to disable LightRAG
     LIGHTRAG_WORKING_DIR: Optional[str] = None
     LIGHTRAG_KV_STORAGE: str = "JsonKVStorage"
@@ -43,9 +62,14 @@ class RAGConfig(BaseSettings):
     
     # Processing Configuration
     MAX_FILE_SIZE_MB: int = 100
-    MAX_WORKERS: int = 4
+    UPLOAD_CHUNK_SIZE_KB: int = 1024  # Uploads are streamed to disk in chunks of this size
+    MAX_WORKERS: int = 4  # Ingest worker processes forked by `python -m app.worker`
+    INGEST_PROCESSES: int = 1  # Ingest processes sharing this host's cores (set by `python -m app.worker`)
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    MULTIMODAL_CONCURRENCY: int = 8  # Max in-flight vision/LLM calls per document
+    CONTEXT_WINDOW: int = 2  # Pages before/after a multimodal item used as context
+    MAX_CONTEXT_TOKENS: int = 1000  # Token budget for a multimodal item's context
     
     # Database Configuration
     VECTOR_DB: str = "local://vectors"  # Use local storage instead of Qdrant
@@ -59,6 +83,89 @@ class RAGConfig(BaseSettings):
     ENABLE_TABLES: bool = True
     ENABLE_EQUATIONS: bool = True
 
+    # Image deduplication (identical images across documents, near-identical dHash within one)
+    IMAGE_DEDUP_ENABLED: bool = True
+    IMAGE_DEDUP_MAX_DISTANCE: int = 4  # Max Hamming distance (of 64 bits) for near-duplicates in a document
+    IMAGE_DEDUP_MAX_ENTRIES: int = 50000  # Oldest analyses are dropped beyond this
+
+    # Image triage: skip / caption-only / full vision analysis
+    IMAGE_TRIAGE_ENABLED: bool = True
+    IMAGE_TRIAGE_MIN_SIDE: int = 24  # Both sides below this (px): bullet or icon fragment; thinner strips are separators
+    IMAGE_TRIAGE_SMALL_SIDE: int = 96  # Both sides below this (px): only captions are used
+    IMAGE_TRIAGE_BLANK_STD: float = 4.0  # Mean per-channel std below which an image is blank
+    IMAGE_TRIAGE_MIN_EDGE_DENSITY: float = 0.01  # Share of edge pixels below which an image may be decorative
+    IMAGE_TRIAGE_MIN_ENTROPY: float = 1.0  # ...if its grayscale entropy (bits) is also below this
+    IMAGE_TRIAGE_MAX_ASPECT: float = 12.0  # Wider/taller than this, and thinner than MIN_SIDE, is a separator line
+
+    # Image preparation for vision models
+    VISION_IMAGE_MAX_SIDE: int = 1568  # Longest side sent to the vision model (px)
+    VISION_IMAGE_QUALITY: int = 85  # JPEG/WebP quality
+    VISION_IMAGE_PREFER_WEBP: bool = False  # Use WebP instead of JPEG/PNG where lossy/alpha output is needed
+    VISION_IMAGE_PASSTHROUGH_BYTES: int = 200_000  # Send smaller files in supported formats unchanged
+    VISION_IMAGE_CACHE_SIZE: int = 256  # Encoded payloads kept in memory (LRU by content hash)
+    IMAGE_PREP_WORKERS: int = 4
+
+    # Table prompts: large tables are sent as a local statistical profile plus an excerpt
+    TABLE_PROFILE_ENABLED: bool = True
+    TABLE_PROMPT_MAX_CHARS: int = 4000  # Tables up to this size are sent verbatim
+    TABLE_PROMPT_SAMPLE_ROWS: int = 8  # Representative rows included in the excerpt
+    TABLE_PROFILE_TOP_VALUES: int = 3  # Most frequent values listed per text column
+
+    # MinerU worker pool (models stay loaded between documents)
+    MINERU_POOL_ENABLED: bool = True
+    MINERU_POOL_SIZE: int = 0  # Per ingest process; 0 = this process's cores / MINERU_CPU_PER_WORKER
+    MINERU_CPU_PER_WORKER: int = 4  # Torch/BLAS threads per worker
+    MINERU_JOB_TIMEOUT: int = 900  # Seconds before a parse job is killed
+    MINERU_POOL_WARMUP: bool = True  # Load models at pool start instead of on the first document
+    MINERU_PAGE_RANGE_SIZE: int = 50  # Pages per parallel parse job for large PDFs
+    MINERU_SPLIT_MIN_PAGES: int = 80  # PDFs shorter than this are parsed as one job
+    MINERU_PARSE_PARALLELISM: int = 0  # Concurrent page-range jobs; 0 = pool size
+
+    # Text-layer pre-pass: born-digital PDF pages are extracted with PyMuPDF instead of MinerU OCR
+    PDF_TEXT_LAYER_ENABLED: bool = True
+    PDF_TEXT_MIN_CHARS: int = 100  # Fewer extractable characters means a scanned page
+    PDF_TEXT_MAX_IMAGE_COVERAGE: float = 0.2  # Share of page area covered by images before OCR
+    PDF_TEXT_MIN_FIGURE_AREA: float = 0.01  # A single image this share of the page is a figure: page goes to MinerU
+    PDF_TEXT_MAX_TABLE_ROWS: int = 2  # More column-aligned rows than this is a borderless table: page goes to MinerU
+    PDF_TEXT_MAX_DRAWINGS: int = 40  # Vector paths (ruled tables, charts) before layout analysis
+    PDF_TEXT_MAX_GARBLED_RATIO: float = 0.05  # Replacement/control characters from broken fonts
+    PDF_TEXT_WORKERS: int = 0  # Page-scan processes per ingest process; 0 = this process's cores
+    PDF_TEXT_POOL_MIN_PAGES: int = 32  # Smaller PDFs are scanned in a thread
+
+    # In-process Docling converter (models loaded once per process)
+    DOCLING_WORKERS: int = 1  # Concurrent conversions on the shared converter
+    DOCLING_IMAGES_SCALE: float = 2.0  # Render scale for extracted pictures
+
+    # Ingest job queue and workers
+    JOB_QUEUE_BACKEND: str = "sqlite"  # "sqlite" (single host) or "redis"
+    JOB_QUEUE_PATH: str = ""  # SQLite file; empty = <WORKING_DIR>/kv/jobs.sqlite
+    JOB_QUEUE_REDIS_URL: str = "redis://localhost:6379/0"
+    INGEST_WORKER_CONCURRENCY: int = 2  # Jobs one worker process runs at once
+    INGEST_EMBEDDED_WORKER: bool = True  # Also run a worker inside the API process; disable with `python -m app.worker` (one LightRAG writer)
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds between queue polls when idle
+    JOB_LEASE_SECONDS: int = 300  # Jobs without a worker heartbeat this long are requeued
+    JOB_MAX_ATTEMPTS: int = 3  # Worker losses before a job is marked failed
+    JOB_RETENTION_HOURS: float = 24  # Finished jobs are purged after this
+
+    # Stage checkpoints: a retried or restarted ingest job resumes after its last completed stage
+    CHECKPOINTS_ENABLED: bool = True
+    CHECKPOINT_DIR: str = ""  # Empty = <WORKING_DIR>/checkpoints
+    MULTIMODAL_ITEM_MAX_ATTEMPTS: int = 3  # Failed attempts before a multimodal item is skipped
+
+    # Parse cache: content lists keyed by file hash and parser settings
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_DIR: str = ""  # Empty = <WORKING_DIR>/parse_cache
+    PARSE_CACHE_MAX_MB: int = 2048  # Least recently used entries are evicted above this size
+
+    # Native XLSX parsing
+    XLSX_CHUNK_ROWS: int = 200  # Rows per table item for large sheet regions
+    XLSX_MAX_CELL_CHARS: int = 500
+    XLSX_EXTRACT_MEDIA: bool = True  # Extract embedded images and chart data
+
+    # Typed table store (SQLite) answering aggregate questions locally
+    TABLE_STORE_ENABLED: bool = True
+    TABLE_QUERY_MAX_GROUPS: int = 50  # Group-by rows passed to the answer prompt
+
     # LibreOffice Online conversion (Collabora CODE)
     LOOL_ENABLED: bool = True
     LOOL_BASE_URL: str = os.getenv("LOOL_BASE_URL", "http://localhost:9980")
@@ -73,6 +180,10 @@ class RAGConfig(BaseSettings):
         case_sensitive = True
         extra = "ignore"  # Ignore extra fields from environment
 
+    def get_cpu_share(self) -> int:
+        """CPU cores for this process's pools, split evenly between INGEST_PROCESSES"""
+        return max(1, (os.cpu_count() or 1) // max(1, self.INGEST_PROCESSES))
+
     def get_working_dir(self) -> Path:
         return Path(self.WORKING_DIR).absolute()
 
@@ -106,6 +217,26 @@ class RAGConfig(BaseSettings):
             "vision_model": vision_model
         }
 
+    def get_llm_task_config(self, task: str) -> Dict[str, Any]:
+        """Resolve model, max_tokens and timeout for an LLM task tier"""
+        model_config = self.get_model_config()
+        tasks = {
+            "extract": (self.LLM_EXTRACT_MODEL, self.LLM_EXTRACT_MAX_TOKENS, self.LLM_EXTRACT_TIMEOUT),
+            "summarize": (self.LLM_SUMMARIZE_MODEL, self.LLM_SUMMARIZE_MAX_TOKENS, self.LLM_SUMMARIZE_TIMEOUT),
+            "answer": (self.LLM_ANSWER_MODEL, self.LLM_ANSWER_MAX_TOKENS, self.LLM_ANSWER_TIMEOUT),
+            "vision": (self.LLM_VISION_MODEL, self.LLM_VISION_MAX_TOKENS, self.LLM_VISION_TIMEOUT),
+        }
+        if task not in tasks:
+            raise ValueError(f"Unsupported LLM task: {task}")
+
+        model, max_tokens, timeout = tasks[task]
+        default_model = model_config["vision_model"] if task == "vision" else model_config["llm_model"]
+        return {
+            "model": model or default_model,
+            "max_tokens": max_tokens,
+            "timeout": timeout
+        }
+
     def get_lightrag_config(self) -> Dict[str, Any]:
         return {
             "kv_storage": self.LIGHTRAG_KV_STORAGE,
@@ -119,7 +250,10 @@ class RAGConfig(BaseSettings):
             "max_file_size": self.MAX_FILE_SIZE_MB * 1024 * 1024,
             "max_workers": self.MAX_WORKERS,
             "chunk_size": self.CHUNK_SIZE,
-            "chunk_overlap": self.CHUNK_OVERLAP
+            "chunk_overlap": self.CHUNK_OVERLAP,
+            "multimodal_concurrency": self.MULTIMODAL_CONCURRENCY,
+            "context_window": self.CONTEXT_WINDOW,
+            "max_context_tokens": self.MAX_CONTEXT_TOKENS
         }
 
 # Create global config instance
@@ -1,16 +1,165 @@
 from typing import List, Dict, Any, Optional, Tuple
 import logging
+from bisect import bisect_left
+from itertools import accumulate
 from pathlib import Path
 from .config import config
 from .schemas import ContentType
 
 logger = logging.getLogger(__name__)
 
+# Optional tokenizer - falls back to a ~4 chars/token estimate when unavailable (e.g. offline)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+_encoder = None
+_encoder_loaded = False
+
+# Budget for the "[Page N] " marker added to lines from neighbouring pages
+_PAGE_MARKER_TOKENS = 5
+
+def _get_encoder():
+    """Load the tiktoken encoder once, None if unavailable"""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        if TIKTOKEN_AVAILABLE:
+            try:
+                _encoder = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"tiktoken encoding unavailable, estimating token counts: {str(e)}")
+    return _encoder
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text"""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoder = _get_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoder.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+class ContextIndex:
+    """Per-document page index for O(window) context lookups"""
+
+    def __init__(
+        self,
+        content_list: List[Dict[str, Any]],
+        extractor: "ContextExtractor"
+    ):
+        self.context_window = extractor.context_window
+        self.max_context_tokens = extractor.max_context_tokens
+
+        # Bucket text by page once, keeping document order within each page
+        buckets: Dict[int, List[str]] = {}
+        for item in content_list:
+            text_content = extractor._extract_text_from_item(item)
+            if text_content:
+                buckets.setdefault(item.get("page_idx", 0), []).append(text_content)
+
+        self.pages: List[int] = sorted(buckets)
+        self.texts: List[str] = []
+        self.text_pages: List[int] = []
+        self.page_ranges: Dict[int, Tuple[int, int]] = {}
+        for page in self.pages:
+            start = len(self.texts)
+            self.texts.extend(buckets[page])
+            self.text_pages.extend([page] * len(buckets[page]))
+            self.page_ranges[page] = (start, len(self.texts))
+
+        # Prefix sums of per-line token costs: window cost is prefix[end] - prefix[start]
+        self.token_costs = [count_tokens(text) + _PAGE_MARKER_TOKENS for text in self.texts]
+        self.token_prefix = [0] + list(accumulate(self.token_costs))
+
+    def get_context(self, current_item: Dict[str, Any]) -> str:
+        """Context for an item from pages within the window, bounded by max_context_tokens"""
+        current_page = current_item.get("page_idx", 0)
+        start_page = max(0, current_page - self.context_window)
+        end_page = current_page + self.context_window + 1
+
+        first_page = bisect_left(self.pages, start_page)
+        last_page = bisect_left(self.pages, end_page)
+        if first_page >= last_page:
+            return ""
+
+        window_start = self.page_ranges[self.pages[first_page]][0]
+        window_end = self.page_ranges[self.pages[last_page - 1]][1]
+
+        if self.token_prefix[window_end] - self.token_prefix[window_start] <= self.max_context_tokens:
+            return self._render(window_start, window_end, current_page)
+
+        return self._render_truncated(window_start, window_end, current_page)
+
+    def _render(self, start: int, end: int, current_page: int, last_text: Optional[str] = None) -> str:
+        context_parts = []
+        for index in range(start, end):
+            text_content = self.texts[index]
+            if last_text is not None and index == end - 1:
+                text_content = last_text
+            item_page = self.text_pages[index]
+            if item_page != current_page:
+                context_parts.append(f"[Page {item_page}] {text_content}")
+            else:
+                context_parts.append(text_content)
+        return "\n".join(context_parts)
+
+    def _render_truncated(self, window_start: int, window_end: int, current_page: int) -> str:
+        """Keep the current page first, then grow outward to the nearest neighbouring lines"""
+        budget = self.max_context_tokens
+        if current_page in self.page_ranges:
+            page_start, page_end = self.page_ranges[current_page]
+        else:
+            page_start = page_end = bisect_left(self.text_pages, current_page, window_start, window_end)
+
+        # Current page, truncating its last fitting line if the page alone exceeds the budget
+        if self.token_prefix[page_end] - self.token_prefix[page_start] > budget:
+            end = page_start
+            while end < page_end and self.token_costs[end] <= budget:
+                budget -= self.token_costs[end]
+                end += 1
+            partial = truncate_to_tokens(self.texts[end], budget - _PAGE_MARKER_TOKENS) if end < page_end else ""
+            if partial:
+                return self._render(page_start, end + 1, current_page, last_text=partial)
+            return self._render(page_start, end, current_page)
+
+        budget -= self.token_prefix[page_end] - self.token_prefix[page_start]
+        start, end = page_start, page_end
+        grow_left = grow_right = True
+        while grow_left or grow_right:
+            if grow_right:
+                grow_right = end < window_end and self.token_costs[end] <= budget
+                if grow_right:
+                    budget -= self.token_costs[end]
+                    end += 1
+            if grow_left:
+                grow_left = start > window_start and self.token_costs[start - 1] <= budget
+                if grow_left:
+                    budget -= self.token_costs[start - 1]
+                    start -= 1
+
+        return self._render(start, end, current_page)
+
 class ContextExtractor:
     def __init__(self, config_params: Optional[Dict[str, Any]] = None):
         self.config = config_params or config.get_processing_config()
-        self.context_window = 2  # Pages before/after for context
-        self.max_context_tokens = 1000  # Max tokens for context
+        self.context_window = self.config.get("context_window", 2)  # Pages before/after for context
+        self.max_context_tokens = self.config.get("max_context_tokens", 1000)  # Max tokens for context
+    
+    def build_index(self, content_list: List[Dict[str, Any]]) -> ContextIndex:
+        """Build a page index once per document for repeated context lookups"""
+        return ContextIndex(content_list, self)
     
     def extract_context(
         self,
@@ -19,29 +168,8 @@ class ContextExtractor:
         content_format: str = "auto"
     ) -> str:
         """Extract context around current multimodal item"""
-        
-        current_page = current_item.get("page_idx", 0)
-        window_size = self.context_window
-        
-        start_page = max(0, current_page - window_size)
-        end_page = current_page + window_size + 1
-        
-        context_parts = []
-        
-        for item in content_source:
-            item_page = item.get("page_idx", 0)
-            item_type = item.get("type", "")
-            
-            # Check if within context window
-            if start_page <= item_page < end_page:
-                text_content = self._extract_text_from_item(item)
-                if text_content:
-                    if item_page != current_page:
-                        context_parts.append(f"[Page {item_page}] {text_content}")
-                    else:
-                        context_parts.append(text_content)
-        
-        return "\n".join(context_parts)
+        # One-off lookup; callers processing many items should reuse build_index()
+        return self.build_index(content_source).get_context(current_item)
     
     def _extract_text_from_item(self, item: Dict[str, Any]) -> Optional[str]:
         """Extract text content from different item types"""
@@ -154,28 +282,86 @@ class ContextExtractor:
     ) -> List[Dict[str, Any]]:
         """Extract cross-references between content items"""
         
+        # Same result and order as comparing every pair (i < j) with _items_are_related,
+        # but only items in pages within the context window are visited, and cross-page
+        # candidates come from a per-page index of caption keyword flags.
         references = []
+        window = self.context_window
+        
+        pages = [item.get("page_idx", 0) for item in content_list]
+        buckets: Dict[Any, Dict[str, List[int]]] = {}
+        for index, item in enumerate(content_list):
+            bucket = buckets.setdefault(pages[index], {
+                "all": [], "images": [], "tables": [], "refs_image": [], "refs_table": []
+            })
+            bucket["all"].append(index)
+            item_type = item.get("type")
+            if item_type == ContentType.IMAGE:
+                bucket["images"].append(index)
+                refs_image, refs_table = self._caption_reference_flags(item)
+                if refs_image:
+                    bucket["refs_image"].append(index)
+                if refs_table:
+                    bucket["refs_table"].append(index)
+            elif item_type == ContentType.TABLE:
+                bucket["tables"].append(index)
+        sorted_pages = sorted(buckets)
+        
+        identifiers: Dict[int, str] = {}
+        
+        def identifier(index: int) -> str:
+            if index not in identifiers:
+                identifiers[index] = self._get_item_identifier(content_list[index])
+            return identifiers[index]
         
         for i, item1 in enumerate(content_list):
-            item1_page = item1.get("page_idx", 0)
-            item1_type = item1.get("type", "")
+            item1_page = pages[i]
+            item1_type = item1.get("type")
+            raw_page = item1.get("page_idx")
+            refs_image = refs_table = False
+            if item1_type == ContentType.IMAGE:
+                refs_image, refs_table = self._caption_reference_flags(item1)
             
-            for j, item2 in enumerate(content_list[i+1:], i+1):
-                item2_page = item2.get("page_idx", 0)
-                item2_type = item2.get("type", "")
-                
-                # Check for potential references
-                if abs(item1_page - item2_page) <= self.context_window:
-                    if self._items_are_related(item1, item2):
-                        references.append({
-                            "source": self._get_item_identifier(item1),
-                            "target": self._get_item_identifier(item2),
-                            "type": "contextual",
-                            "confidence": 0.8
-                        })
+            candidates = set()
+            lo = bisect_left(sorted_pages, item1_page - window)
+            hi = bisect_left(sorted_pages, item1_page + window + 1)
+            for page in sorted_pages[lo:hi]:
+                bucket = buckets[page]
+                if page == item1_page:
+                    # Same page: every later item is related (raw page values must match)
+                    for j in bucket["all"][bisect_left(bucket["all"], i + 1):]:
+                        if content_list[j].get("page_idx") == raw_page:
+                            candidates.add(j)
+                # Cross-page: caption of either image mentions the other item's kind
+                keyword_lists = []
+                if refs_image:
+                    keyword_lists.append(bucket["images"])
+                if refs_table:
+                    keyword_lists.append(bucket["tables"])
+                if item1_type == ContentType.IMAGE:
+                    keyword_lists.append(bucket["refs_image"])
+                elif item1_type == ContentType.TABLE:
+                    keyword_lists.append(bucket["refs_table"])
+                for indices in keyword_lists:
+                    candidates.update(indices[bisect_left(indices, i + 1):])
+            
+            for j in sorted(candidates):
+                references.append({
+                    "source": identifier(i),
+                    "target": identifier(j),
+                    "type": "contextual",
+                    "confidence": 0.8
+                })
         
         return references
     
+    def _caption_reference_flags(self, item: Dict[str, Any]) -> Tuple[bool, bool]:
+        """Whether an image's captions reference figures/images and tables"""
+        captions = [caption.lower() for caption in item.get("image_caption") or []]
+        refs_image = any("figure" in caption or "image" in caption for caption in captions)
+        refs_table = any("table" in caption for caption in captions)
+        return refs_image, refs_table
+    
     def _items_are_related(self, item1: Dict[str, Any], item2: Dict[str, Any]) -> bool:
         """Check if two items are potentially related"""
         # This is a simplified check - in practice you'd want more sophisticated logic
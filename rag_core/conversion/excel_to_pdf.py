@@ -26,9 +26,6 @@ logger = logging.getLogger(__name__)
 EXCEL_EXTENSIONS = (".xlsx", ".xls")
 OFFICE_EXTENSIONS = EXCEL_EXTENSIONS + (".docx", ".doc", ".pptx", ".ppt")
 
-_LATEST_DEBUG_ARTIFACTS: Optional[Path] = None
-_LATEST_DEBUG_COMBINED_PDF: Optional[Path] = None
-
 # ---------- Config ----------
 MAC_SOFFICE = "/Applications/LibreOffice.app/Contents/MacOS/soffice"
 INCLUDE_FULL_SHEET_IF_UNKNOWN_DRAWINGS = True   # safest to avoid clipping SmartArt
@@ -207,8 +204,14 @@ def _patch_pagesetup_xlsx(src_xlsx: Path) -> Path:
 def _convert_with_soffice(input_path: Path, outdir: Path, filter_str: str) -> Path:
     soffice = _soffice_bin()
     outdir.mkdir(parents=True, exist_ok=True)
-    cmd = [soffice, "--headless", "--convert-to", filter_str, "--outdir", str(outdir), str(input_path)]
-    _run(cmd)
+    # A private profile per run: concurrent soffice processes sharing the default
+    # profile hand off to the first instance or fail on its lock
+    with tempfile.TemporaryDirectory(prefix="soffice-profile-") as profile_dir:
+        cmd = [
+            soffice, f"-env:UserInstallation={Path(profile_dir).as_uri()}",
+            "--headless", "--convert-to", filter_str, "--outdir", str(outdir), str(input_path)
+        ]
+        _run(cmd)
 
     # LibreOffice writes <stem>.<ext> (usually). Resolve robustly:
     produced = outdir / f"{input_path.stem}.{filter_str.split(':', 1)[0]}"
@@ -287,9 +290,6 @@ def _maybe_generate_debug_artifacts(input_path: Path) -> Tuple[Optional[Path], O
             "[DEBUG] Generated debug artifacts under %s (sheets + PDFs)",
             base_dir,
         )
-        global _LATEST_DEBUG_ARTIFACTS, _LATEST_DEBUG_COMBINED_PDF
-        _LATEST_DEBUG_ARTIFACTS = base_dir
-        _LATEST_DEBUG_COMBINED_PDF = combined_pdf
         return base_dir, combined_pdf
     except Exception as exc:
         logger.warning("[DEBUG] Failed to generate debug artifacts for %s: %s", input_path, exc)
@@ -349,10 +349,11 @@ def _excel_to_pdf_no_uno(input_path: Path, office_outdir: Path) -> Path:
     return pdf_path
 
 
-def _convert_excel_document(input_path: Path, output_dir: Path) -> Path:
+def _convert_excel_document(input_path: Path, output_dir: Path) -> Tuple[Path, Optional[Path], Optional[Path]]:
     """
     Convert an Excel workbook using LOOL when enabled, falling back to the
     local soffice-based pipeline if necessary.
+    Returns (pdf_path, debug_artifacts_dir, debug_combined_pdf).
     """
     last_exc: Optional[Exception] = None
     pdf_path: Optional[Path] = None
@@ -406,21 +407,7 @@ def _convert_excel_document(input_path: Path, output_dir: Path) -> Path:
     if debug_dir:
         logger.info("[DEBUG] Debug artifacts available at %s", debug_dir)
 
-    return pdf_path
-
-
-def get_latest_debug_artifacts_dir() -> Optional[str]:
-    """Return the most recent debug artifact directory generated."""
-    if _LATEST_DEBUG_ARTIFACTS:
-        return str(_LATEST_DEBUG_ARTIFACTS)
-    return None
-
-
-def get_latest_debug_combined_pdf() -> Optional[str]:
-    """Return the most recent combined debug PDF path."""
-    if _LATEST_DEBUG_COMBINED_PDF:
-        return str(_LATEST_DEBUG_COMBINED_PDF)
-    return None
+    return pdf_path, debug_dir, combined_pdf
 
 def convert_office_to_pdf(input_path: str, output_dir: Optional[str] = None) -> Tuple[str, bool]:
     """Convert Office documents to PDF with comprehensive logging and timing (UNO-free for Excel)"""
@@ -449,7 +436,7 @@ def convert_office_to_pdf(input_path: str, output_dir: Optional[str] = None) ->
 
     try:
         if ext in EXCEL_EXTENSIONS:
-            pdf_path = _convert_excel_document(input_path, office_outdir)
+            pdf_path, _, _ = _convert_excel_document(input_path, office_outdir)
         else:
             # Standard conversion for Word/PowerPoint
             logger.info("[CONVERSION] Processing Office file with standard conversion: %s", input_path)
@@ -470,11 +457,14 @@ def convert_office_to_pdf(input_path: str, output_dir: Optional[str] = None) ->
             temp_dir.cleanup()
             logger.debug("[CONVERSION] Cleaned up temporary directory")
 
-def convert_excel_to_pdf(input_path: str, output_dir: Optional[str] = None) -> str:
+def convert_excel_to_pdf(
+    input_path: str, output_dir: Optional[str] = None
+) -> Tuple[str, Optional[str], Optional[str]]:
     """
     Convert Excel file to PDF and save to input/converted directory.
     Ensures landscape + 1x1 pages; expands print area to include images/charts;
     optionally full-sheet if unparsed drawings (SmartArt) are present.
+    Returns (pdf_path, debug_artifacts_dir, debug_combined_pdf) for this conversion.
     """
     excel_start = time.time()
     input_path = Path(input_path)
@@ -498,11 +488,11 @@ def convert_excel_to_pdf(input_path: str, output_dir: Optional[str] = None) -> s
         raise ValueError(f"Input file {input_path} is not an Excel file")
 
     logger.debug("[EXCEL] Converting Excel file via configured pipeline")
-    pdf_path = _convert_excel_document(input_path, output_dir)
+    pdf_path, debug_dir, combined_pdf = _convert_excel_document(input_path, output_dir)
 
     total_elapsed = time.time() - excel_start
     logger.info("[EXCEL] Excel conversion completed successfully in %.2fs: %s", total_elapsed, pdf_path)
-    return str(pdf_path)
+    return str(pdf_path), str(debug_dir) if debug_dir else None, str(combined_pdf) if combined_pdf else None
 
 def needs_conversion(file_path: str) -> bool:
     """Check if a file needs to be converted to PDF."""
@@ -0,0 +1,107 @@
+from typing import Dict, Any, List, Optional
+import logging
+import asyncio
+import importlib.util
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .asset_store import store_asset_bytes
+from .config import config
+from .schemas import ContentType
+
+logger = logging.getLogger(__name__)
+
+DOCLING_AVAILABLE = importlib.util.find_spec("docling") is not None
+
+# Furniture and layout labels that carry no document content
+_SKIPPED_LABELS = {"page_header", "page_footer"}
+
+_converter = None
+_converter_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_document_converter():
+    """Shared Docling converter; models are loaded once and reused across documents"""
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            from docling.datamodel.base_models import InputFormat
+            from docling.datamodel.pipeline_options import PdfPipelineOptions
+            from docling.document_converter import DocumentConverter, PdfFormatOption
+
+            parser_config = config.get_parser_config()
+            pipeline_options = PdfPipelineOptions()
+            pipeline_options.do_ocr = parser_config["method"] != "txt"
+            pipeline_options.do_table_structure = parser_config["enable_tables"]
+            pipeline_options.generate_picture_images = parser_config["enable_images"]
+            pipeline_options.images_scale = config.DOCLING_IMAGES_SCALE
+            _converter = DocumentConverter(
+                format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)}
+            )
+            logger.info("[DOCLING] Document converter created")
+        return _converter
+
+def _page_idx(item) -> int:
+    """0-based page of a document item (Docling pages are 1-based)"""
+    return item.prov[0].page_no - 1 if getattr(item, "prov", None) else 0
+
+def document_items(document) -> List[Dict[str, Any]]:
+    """Map a DoclingDocument to our content list item dicts"""
+    from docling_core.types.doc import PictureItem, SectionHeaderItem, TableItem, TextItem
+
+    items: List[Dict[str, Any]] = []
+    for element, _level in document.iterate_items():
+        label = str(getattr(element.label, "value", element.label))
+        if label in _SKIPPED_LABELS:
+            continue
+        page_idx = _page_idx(element)
+
+        if isinstance(element, TableItem):
+            caption = element.caption_text(document)
+            items.append({
+                "type": ContentType.TABLE,
+                "table_body": element.export_to_html(doc=document),
+                "table_caption": [caption] if caption else [],
+                "table_footnote": [],
+                "page_idx": page_idx,
+            })
+        elif isinstance(element, PictureItem):
+            image = element.get_image(document)
+            if image is None:
+                continue
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            img_path = store_asset_bytes(buffer.getvalue(), ".png")
+            caption = element.caption_text(document)
+            items.append({
+                "type": ContentType.IMAGE,
+                "img_path": str(img_path),
+                "image_caption": [caption] if caption else [],
+                "image_footnote": [],
+                "page_idx": page_idx,
+            })
+        elif isinstance(element, TextItem) and element.text.strip():
+            if label == "formula":
+                items.append({"type": ContentType.EQUATION, "latex": element.text, "text": element.text, "page_idx": page_idx})
+                continue
+            if isinstance(element, SectionHeaderItem):
+                text_level = element.level
+            elif label == "title":
+                text_level = 1
+            else:
+                text_level = 0
+            items.append({"type": ContentType.TEXT, "text": element.text, "text_level": text_level, "page_idx": page_idx})
+    return items
+
+def convert_document(file_path: str) -> List[Dict[str, Any]]:
+    """Convert a file with the shared converter and map it to content list items"""
+    result = get_document_converter().convert(file_path)
+    return document_items(result.document)
+
+async def convert_document_async(file_path: str) -> List[Dict[str, Any]]:
+    """Run a conversion on the Docling worker threads, off the event loop"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.DOCLING_WORKERS, thread_name_prefix="docling")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, convert_document, file_path)
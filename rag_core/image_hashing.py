@@ -0,0 +1,205 @@
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+import logging
+import asyncio
+import json
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from .parse_cache import file_sha256
+from .utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+def dhash(image_path: str, hash_size: int = 8) -> Optional[int]:
+    """Compute a difference hash (dHash) for an image, None if it cannot be read"""
+    try:
+        with Image.open(image_path) as img:
+            # Grayscale thumbnail one column wider than the hash so each row yields hash_size diffs
+            small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+            pixels = np.asarray(small, dtype=np.int16)
+    except Exception as e:
+        logger.warning(f"Failed to hash image {image_path}: {str(e)}")
+        return None
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def hamming_distances(hashes: np.ndarray, image_hash: int) -> np.ndarray:
+    """Vectorized Hamming distance between one 64-bit hash and an array of hashes"""
+    if len(hashes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    xor = np.bitwise_xor(hashes, np.uint64(image_hash))
+    return np.unpackbits(xor.view(np.uint8)).reshape(len(hashes), -1).sum(axis=1)
+
+def image_fingerprint(image_path: str, sha256: Optional[str] = None) -> Tuple[Optional[int], Optional[str]]:
+    """dHash plus exact sha256 of an image file; pass a sha256 already computed to skip re-reading the file"""
+    image_hash = dhash(image_path)
+    if image_hash is None:
+        return None, None
+    return image_hash, sha256 or file_sha256(image_path)
+
+class ImageDedupIndex:
+    """Persistent image index mapping duplicate images to a shared vision analysis.
+
+    Across documents only byte-identical images (same sha256) share an analysis; near-identical
+    images (dHash within max_distance) share one only inside the same document, where the
+    analysis was written with the same context.
+    """
+
+    def __init__(self, index_path: Path, max_distance: int = 4, max_entries: int = 50000):
+        self.index_path = Path(index_path)
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._added: Dict[str, Dict[str, Any]] = {}
+        self._keys: list = []
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._docs = np.zeros(0, dtype=object)
+        self._inflight: Dict[str, Tuple[int, str, asyncio.Future]] = {}
+        self._version = None
+        self._load()
+
+    def _file_version(self):
+        if not self.index_path.exists():
+            return None
+        stat = self.index_path.stat()
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _load(self):
+        """Load the index from disk"""
+        self._entries = {}
+        self._version = self._file_version()
+        if self._version is not None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                # Entries from before content hashes were recorded can't be matched safely
+                self._entries = {key: entry for key, entry in entries.items() if "dhash" in entry}
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Failed to load image hash index: {str(e)}")
+        self._entries.update(self._added)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._keys = list(self._entries)
+        self._hashes = np.array([int(self._entries[key]["dhash"], 16) for key in self._keys], dtype=np.uint64)
+        self._docs = np.array([self._entries[key]["doc_id"] for key in self._keys], dtype=object)
+
+    def _write(self):
+        # Keep the newest entries when over the cap
+        if len(self._entries) > self.max_entries:
+            newest = sorted(self._entries.items(), key=lambda kv: kv[1]["created_at"], reverse=True)
+            self._entries = dict(newest[:self.max_entries])
+            self._rebuild()
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        tmp_path.replace(self.index_path)
+        self._version = self._file_version()
+
+    def save(self):
+        """Persist entries added since the last save"""
+        if not self._added:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        # Other worker processes may have saved or deleted since we loaded; merge only our additions
+        with file_lock(self.index_path):
+            self._load()
+            self._write()
+        self._added = {}
+
+    def remove_document(self, doc_id: str) -> int:
+        """Drop the analyses a deleted document contributed"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.index_path):
+            self._added = {key: entry for key, entry in self._added.items() if entry["doc_id"] != doc_id}
+            self._load()
+            before = len(self._entries)
+            self._entries = {key: entry for key, entry in self._entries.items() if entry["doc_id"] != doc_id}
+            removed = before - len(self._entries)
+            if removed:
+                self._rebuild()
+                self._write()
+        return removed
+
+    def find(self, image_hash: int, content_hash: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Return an identical stored image, or the closest near-duplicate from the same document"""
+        # Pick up saves and deletions from other processes
+        if self._file_version() != self._version:
+            self._load()
+        if content_hash in self._entries:
+            return self._entries[content_hash]
+        distances = hamming_distances(self._hashes, image_hash)
+        if len(distances) == 0:
+            return None
+        distances = np.where(self._docs == doc_id, distances, self.max_distance + 1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        return self._entries[self._keys[best]]
+
+    def add(self, image_hash: int, content_hash: str, analysis: str, image_path: str, doc_id: str):
+        """Store an analysis for an image"""
+        entry = {
+            "dhash": f"{image_hash:016x}",
+            "analysis": analysis,
+            "image_path": image_path,
+            "doc_id": doc_id,
+            "created_at": time.time()
+        }
+        if content_hash not in self._entries:
+            self._keys.append(content_hash)
+            self._hashes = np.append(self._hashes, np.uint64(image_hash))
+            self._docs = np.append(self._docs, np.array([doc_id], dtype=object))
+        self._entries[content_hash] = entry
+        self._added[content_hash] = entry
+
+    def _find_inflight(self, image_hash: int, content_hash: str, doc_id: str) -> Optional[asyncio.Future]:
+        if content_hash in self._inflight:
+            return self._inflight[content_hash][2]
+        for pending_hash, pending_doc, future in self._inflight.values():
+            if pending_doc == doc_id and bin(pending_hash ^ image_hash).count("1") <= self.max_distance:
+                return future
+        return None
+
+    async def analyze(
+        self,
+        image_hash: int,
+        content_hash: str,
+        image_path: str,
+        doc_id: str,
+        analyze_fn: Callable[[], Awaitable[str]]
+    ) -> Tuple[str, Optional[str]]:
+        """Run analyze_fn once per group of duplicate images.
+
+        Returns (analysis, source) where source is None for a fresh analysis,
+        "inflight" when sharing a concurrent call, or the doc_id of a stored match.
+        """
+        entry = self.find(image_hash, content_hash, doc_id)
+        if entry is not None:
+            return entry["analysis"], entry["doc_id"]
+
+        pending = self._find_inflight(image_hash, content_hash, doc_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending), "inflight"
+            except Exception:
+                # The group leader failed; analyze this image on its own
+                pass
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[content_hash] = (image_hash, doc_id, future)
+        try:
+            analysis = await analyze_fn()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(content_hash, None)
+
+        future.set_result(analysis)
+        self.add(image_hash, content_hash, analysis, image_path, doc_id)
+        return analysis, None
@@ -0,0 +1,144 @@
+from typing import Dict, Any, NamedTuple, Optional
+import logging
+import asyncio
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Formats vision endpoints accept as-is
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+class PreparedImage(NamedTuple):
+    data: str  # base64 payload
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    encoded_bytes: int
+
+class ImagePreparer:
+    """Downsizes and re-encodes images for vision models, cached by content hash"""
+
+    def __init__(
+        self,
+        max_side: Optional[int] = None,
+        jpeg_quality: Optional[int] = None,
+        prefer_webp: Optional[bool] = None,
+        cache_size: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ):
+        self.max_side = max_side or config.VISION_IMAGE_MAX_SIDE
+        self.jpeg_quality = jpeg_quality or config.VISION_IMAGE_QUALITY
+        self.prefer_webp = config.VISION_IMAGE_PREFER_WEBP if prefer_webp is None else prefer_webp
+        self.cache_size = cache_size or config.VISION_IMAGE_CACHE_SIZE
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.IMAGE_PREP_WORKERS,
+            thread_name_prefix="image-prep"
+        )
+        self._cache: "OrderedDict[str, PreparedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"prepared": 0, "cache_hits": 0, "original_bytes": 0, "encoded_bytes": 0}
+
+    async def prepare(self, image_path: str) -> PreparedImage:
+        """Prepare an image off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.prepare_sync, image_path)
+
+    def prepare_sync(self, image_path: str) -> PreparedImage:
+        """Read, downsize and encode an image, reusing cached payloads for identical content"""
+        with open(image_path, "rb") as f:
+            raw = f.read()
+
+        key = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached
+
+        prepared = self._encode(raw)
+
+        with self._lock:
+            self._cache[key] = prepared
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self.stats["prepared"] += 1
+            self.stats["original_bytes"] += prepared.original_bytes
+            self.stats["encoded_bytes"] += prepared.encoded_bytes
+
+        if prepared.encoded_bytes < prepared.original_bytes:
+            logger.debug(
+                f"Prepared {image_path}: {prepared.original_bytes} -> {prepared.encoded_bytes} bytes "
+                f"({prepared.width}x{prepared.height} {prepared.mime_type})"
+            )
+        return prepared
+
+    def _encode(self, raw: bytes) -> PreparedImage:
+        """Downsize to max_side and pick an output format by content"""
+        with Image.open(io.BytesIO(raw)) as img:
+            source_format = img.format
+            width, height = img.size
+
+            # Small files in a supported format are sent untouched
+            if max(width, height) <= self.max_side and source_format in _PASSTHROUGH_FORMATS \
+                    and len(raw) <= config.VISION_IMAGE_PASSTHROUGH_BYTES:
+                return PreparedImage(
+                    base64.b64encode(raw).decode(), _PASSTHROUGH_FORMATS[source_format],
+                    width, height, len(raw), len(raw)
+                )
+
+            img.load()
+            if max(width, height) > self.max_side:
+                img.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            output_format = self._choose_format(img, has_alpha)
+
+            buffer = io.BytesIO()
+            if output_format == "PNG":
+                if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                    img = img.convert("RGBA" if has_alpha else "RGB")
+                img.save(buffer, format="PNG", optimize=True)
+            elif output_format == "WEBP":
+                img = img.convert("RGBA" if has_alpha else "RGB")
+                img.save(buffer, format="WEBP", quality=self.jpeg_quality, method=4)
+            else:
+                img = img.convert("RGB")
+                img.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+
+            encoded = buffer.getvalue()
+            mime_type = f"image/{output_format.lower()}"
+            return PreparedImage(
+                base64.b64encode(encoded).decode(), mime_type,
+                img.width, img.height, len(raw), len(encoded)
+            )
+
+    def _choose_format(self, img: Image.Image, has_alpha: bool) -> str:
+        """PNG for line art and transparency, JPEG/WebP for photographic content"""
+        if has_alpha:
+            return "WEBP" if self.prefer_webp else "PNG"
+
+        # Charts, diagrams and screenshots use few distinct colours and compress better losslessly
+        sample = img.copy()
+        sample.thumbnail((128, 128))
+        colors = sample.convert("RGB").getcolors(maxcolors=256)
+        if colors is not None:
+            return "PNG"
+
+        return "WEBP" if self.prefer_webp else "JPEG"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Encoding and cache counters"""
+        with self._lock:
+            return {**self.stats, "cached": len(self._cache)}
+
+# Shared preparer so the cache and thread pool are reused across pipeline and queries
+image_preparer = ImagePreparer()
@@ -0,0 +1,209 @@
+"""Single writer for LightRAG storage.
+
+LightRAG's file storages (NanoVectorDB, NetworkX, JSON KV) hold the index in memory and rewrite
+whole files on save, so two writing processes overwrite each other's documents. Every write goes
+through one IndexWriter: in-process for the API / a single worker, or in a dedicated writer
+process that `python -m app.worker` feeds from its worker processes (RemoteIndexWriter).
+"""
+from typing import Dict, Any, List, Optional, Callable, Tuple
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+from .llm_unified import llm_usage_scope, merge_llm_usage
+
+logger = logging.getLogger(__name__)
+
+# Vector and graph storages reload from their files when their update flag is set
+_FLAGGED_STORAGES = ("chunks_vdb", "entities_vdb", "relationships_vdb", "chunk_entity_relation_graph")
+# JSON KV storages use the same flag for "unsaved changes", so they are re-read directly
+_KV_STORAGES = (
+    "text_chunks", "full_docs", "full_entities", "full_relations", "entity_chunks", "relation_chunks", "doc_status"
+)
+
+def _file_version(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+class IndexWriter:
+    """Applies LightRAG writes in this process and stamps a version file other processes watch"""
+
+    def __init__(self, lightrag):
+        self.lightrag = lightrag
+        self.version_path = Path(lightrag.working_dir) / "index_version"
+        self._version = _file_version(self.version_path)
+        # LightRAG's ainsert only queues its documents and returns if another insert is
+        # already running the pipeline, so inserts go one at a time
+        self._insert_lock = asyncio.Lock()
+
+    async def ainsert(self, **kwargs: Any) -> str:
+        """Insert documents and return once they are indexed; raises if LightRAG failed any of them"""
+        async with self._insert_lock:
+            try:
+                track_id = await self.lightrag.ainsert(**kwargs)
+            finally:
+                self._stamp()
+        await self._raise_for_failed_docs(kwargs.get("ids"))
+        return track_id
+
+    async def _raise_for_failed_docs(self, ids: Any):
+        """LightRAG records extraction errors in doc_status instead of raising them"""
+        if not ids:
+            return
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        for doc_id, doc in zip(ids, await self.lightrag.doc_status.get_by_ids(ids)):
+            doc = doc or {"status": "missing"}
+            # DocStatus is a str enum, so this also matches statuses read back from JSON
+            if doc["status"] != "processed":
+                raise RuntimeError(f"LightRAG did not index {doc_id}: {doc.get('error_msg') or doc['status']}")
+
+    async def upsert(self, namespace: str, data: Dict[str, Dict[str, Any]]):
+        """Upsert into one of LightRAG's vector storages (chunks_vdb, entities_vdb, relationships_vdb) and save"""
+        storage = getattr(self.lightrag, namespace)
+        await storage.upsert(data)
+        await storage.index_done_callback()
+        self._stamp()
+
+    def _stamp(self):
+        tmp_path = self.version_path.with_name(f"{self.version_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(str(time.time()))
+        os.replace(tmp_path, self.version_path)
+        self._version = _file_version(self.version_path)
+
+    async def refresh(self) -> bool:
+        """Reload storages if another process wrote since we last looked; True if it did"""
+        version = _file_version(self.version_path)
+        if version == self._version:
+            return False
+        self._version = version
+
+        from lightrag.utils import load_json
+
+        for name in _FLAGGED_STORAGES:
+            storage = getattr(self.lightrag, name, None)
+            if getattr(storage, "storage_updated", None) is not None:
+                storage.storage_updated.value = True
+        for name in _KV_STORAGES:
+            storage = getattr(self.lightrag, name, None)
+            if storage is None or not hasattr(storage, "_file_name") or storage._data is None:
+                continue  # server-backed storage, always current
+            async with storage._storage_lock:
+                storage._data.clear()
+                storage._data.update(load_json(storage._file_name) or {})
+        logger.info("[INDEX] Reloaded LightRAG storage written by another process")
+        return True
+
+class RemoteIndexWriter:
+    """IndexWriter stand-in for worker processes: forwards writes to the writer process"""
+
+    def __init__(self, requests, responses, slot: int, writer_pid):
+        self.requests = requests
+        self.responses = responses
+        self.slot = slot
+        # Shared value the supervisor updates whenever it (re)starts the writer process
+        self.writer_pid = writer_pid
+        self._pending: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Future, int]] = {}
+        self._reader: Optional[threading.Thread] = None
+
+    async def ainsert(self, **kwargs: Any) -> str:
+        return await self._call("ainsert", kwargs)
+
+    async def upsert(self, namespace: str, data: Dict[str, Dict[str, Any]]):
+        await self._call("upsert", {"namespace": namespace, "data": data})
+
+    async def refresh(self) -> bool:
+        return False
+
+    async def _call(self, method: str, kwargs: Dict[str, Any]) -> Any:
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_responses, name="index-writer-responses", daemon=True)
+            self._reader.start()
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (asyncio.get_running_loop(), future, self.writer_pid.value)
+        try:
+            await asyncio.to_thread(self.requests.put, (self.slot, request_id, method, kwargs))
+            result, error, usage = await future
+        finally:
+            self._pending.pop(request_id, None)
+        # LLM calls made by the writer (entity extraction) count towards this job
+        merge_llm_usage(usage)
+        if error:
+            raise RuntimeError(f"Index writer failed: {error}")
+        return result
+
+    def _read_responses(self):
+        while True:
+            try:
+                request_id, result, error, usage = self.responses.get(timeout=1.0)
+            except queue.Empty:
+                self._fail_orphaned()
+                continue
+            entry = self._pending.get(request_id)
+            if entry is not None:
+                loop, future, _ = entry
+                loop.call_soon_threadsafe(_resolve, future, (result, error, usage))
+
+    def _fail_orphaned(self):
+        """Requests sent to a writer process that has since exited will never be answered"""
+        for loop, future, pid in list(self._pending.values()):
+            if pid != self.writer_pid.value or not _pid_alive(pid):
+                loop.call_soon_threadsafe(_resolve, future, (None, "index writer process exited", {}))
+
+def _resolve(future: asyncio.Future, value: Any):
+    if not future.done():
+        future.set_result(value)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def serve_index_writer(make_writer: Callable[[], IndexWriter], requests, responses: List):
+    """Main loop of the writer process: apply workers' writes until a None request arrives"""
+    asyncio.run(_serve(make_writer(), requests, responses))
+
+async def _serve(writer: IndexWriter, requests, responses: List):
+    parent = os.getppid()
+    tasks = set()
+    logger.info(f"[INDEX] Writer process {os.getpid()} ready")
+    while True:
+        try:
+            request = await asyncio.to_thread(requests.get, True, 1.0)
+        except queue.Empty:
+            if os.getppid() != parent:
+                break  # supervisor is gone
+            continue
+        if request is None:
+            break
+        # Requests run concurrently; IndexWriter.ainsert runs LightRAG inserts one at a time
+        task = asyncio.create_task(_handle(writer, responses, *request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if hasattr(writer.lightrag, "finalize_storages"):
+        await writer.lightrag.finalize_storages()
+
+async def _handle(writer: IndexWriter, responses: List, slot: int, request_id: str, method: str, kwargs: Dict[str, Any]):
+    with llm_usage_scope() as usage:
+        try:
+            if method == "ainsert":
+                result, error = await writer.ainsert(**kwargs), None
+            else:
+                result, error = await writer.upsert(**kwargs), None
+        except Exception as e:
+            logger.error(f"[INDEX] {method} failed: {str(e)}")
+            result, error = None, str(e) or type(e).__name__
+    await asyncio.to_thread(responses[slot].put, (request_id, result, error, usage.snapshot()))
@@ -0,0 +1,152 @@
+from typing import Dict, Any, Optional, Set
+import logging
+import asyncio
+import os
+import shutil
+import socket
+import time
+import uuid
+from pathlib import Path
+from .config import config
+from .checkpoints import purge_checkpoints
+from .jobs import JobQueue, get_job_queue
+from .schemas import ProcessingStatus
+
+logger = logging.getLogger(__name__)
+
+class IngestWorker:
+    """Claims ingest jobs from the queue and runs up to `concurrency` of them at once"""
+
+    def __init__(self, pipeline, queue: Optional[JobQueue] = None, concurrency: Optional[int] = None):
+        self.pipeline = pipeline
+        self.queue = queue or get_job_queue()
+        self.concurrency = max(1, concurrency or config.INGEST_WORKER_CONCURRENCY)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self.stats = {"completed": 0, "failed": 0}
+        # Pipeline progress updates go to the job record
+        self.pipeline.status_callback = self._on_status
+
+    async def run(self):
+        """Poll the queue until stop() is called"""
+        logger.info(f"[WORKER] {self.worker_id} started, concurrency={self.concurrency}")
+        last_maintenance = 0.0
+        while not self._stopping.is_set():
+            if time.time() - last_maintenance > config.JOB_LEASE_SECONDS / 3:
+                await self._maintenance()
+                last_maintenance = time.time()
+
+            claimed = False
+            while len(self._running) < self.concurrency:
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+                if job is None:
+                    break
+                claimed = True
+                self._running.add(job["task_id"])
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), config.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"[WORKER] {self.worker_id} stopped")
+
+    def stop(self):
+        """Stop claiming jobs; run() returns once the running jobs finish"""
+        self._stopping.set()
+
+    async def _maintenance(self):
+        """Renew leases of running jobs, recover jobs of dead workers, purge old records"""
+        try:
+            await asyncio.to_thread(self.queue.heartbeat, list(self._running))
+            await asyncio.to_thread(self.queue.requeue_stale)
+            await asyncio.to_thread(self.queue.purge)
+            await asyncio.to_thread(purge_checkpoints)
+            await asyncio.to_thread(self._purge_uploads)
+        except Exception as e:
+            logger.warning(f"[WORKER] Queue maintenance failed: {str(e)}")
+
+    def _purge_uploads(self):
+        """Remove uploads kept for retrying failed jobs once the retention window has passed"""
+        upload_dir = config.get_upload_dir()
+        if not upload_dir.exists():
+            return
+        cutoff = time.time() - config.JOB_RETENTION_HOURS * 3600
+        for task_dir in upload_dir.iterdir():
+            if not task_dir.is_dir() or task_dir.stat().st_mtime >= cutoff:
+                continue
+            job = self.queue.get(task_dir.name)
+            if job is None or job["status"] in ("completed", "failed"):
+                shutil.rmtree(task_dir, ignore_errors=True)
+
+    def _lost_job(self, task_id: str):
+        logger.warning(
+            f"[WORKER] {self.worker_id} lost task_id={task_id} (lease expired and the job was requeued); "
+            "its outcome was not recorded"
+        )
+
+    async def _on_status(self, status: ProcessingStatus):
+        if status.task_id in self._running:
+            await asyncio.to_thread(
+                self.queue.update, status.task_id,
+                progress=status.progress,
+                stage=status.stage,
+                stages_done=status.stages_done,
+                multimodal_total=status.multimodal_total,
+                multimodal_done=status.multimodal_done
+            )
+
+    async def _run_job(self, job: Dict[str, Any]):
+        """Process one document and record the outcome on the job"""
+        task_id, file_path = job["task_id"], job["file_path"]
+        job_start = time.time()
+        completed = False
+        try:
+            logger.info(f"[WORKER] Processing started: task_id={task_id} file={file_path} attempt={job['attempts']}")
+            status = await self.pipeline.process_document(
+                file_path=file_path,
+                task_id=task_id,
+                parser_type=job.get("parser_type"),
+                file_hash=job.get("file_sha256")
+            )
+            completed = status.status == "completed"
+            recorded = await asyncio.to_thread(
+                self.queue.finish, task_id, status.status, status.error,
+                worker_id=self.worker_id,
+                progress=status.progress,
+                stage=status.stage,
+                stages_done=status.stages_done,
+                doc_id=status.doc_id,
+                chunks_created=status.chunks_created,
+                entities_found=status.entities_found,
+                ingest_summary=status.ingest_summary
+            )
+            if not recorded:
+                self._lost_job(task_id)
+            self.stats["completed" if status.status == "completed" else "failed"] += 1
+            logger.info(
+                f"[WORKER] Processing completed: task_id={task_id} doc_id={status.doc_id} "
+                f"chunks={status.chunks_created} entities={status.entities_found} "
+                f"elapsed={time.time() - job_start:.3f}s total_elapsed={time.time() - job['start_time']:.3f}s"
+            )
+        except Exception as e:
+            logger.error(f"[WORKER] Document processing failed: task_id={task_id} error={str(e)}")
+            self.stats["failed"] += 1
+            if not await asyncio.to_thread(self.queue.finish, task_id, "failed", str(e), worker_id=self.worker_id):
+                self._lost_job(task_id)
+        finally:
+            self._running.discard(task_id)
+            # Clean up upload file; a failed job keeps it so a retry can resume from its checkpoints
+            if completed:
+                Path(file_path).unlink(missing_ok=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "worker_id": self.worker_id, "running": len(self._running), "concurrency": self.concurrency}
@@ -0,0 +1,402 @@
+from typing import Dict, Any, List, Optional
+import logging
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "processing", "completed", "failed")
+
+class JobQueue(ABC):
+    """Persistent ingest job queue shared by the API (enqueue/status) and ingest workers (claim/update)"""
+
+    @abstractmethod
+    def enqueue(self, task_id: str, payload: Dict[str, Any]):
+        """Add a job in the queued state"""
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job and mark it processing, or None when the queue is empty"""
+
+    @abstractmethod
+    def update(self, task_id: str, **state: Any):
+        """Merge progress fields (progress, doc_id, ...) into a job's state"""
+
+    @abstractmethod
+    def heartbeat(self, task_ids: List[str]):
+        """Renew the lease of jobs a live worker is still running"""
+
+    @abstractmethod
+    def finish(
+        self, task_id: str, status: str, error: Optional[str] = None, worker_id: Optional[str] = None, **state: Any
+    ) -> bool:
+        """Mark a job completed or failed, merging final state.
+
+        With worker_id, only if that worker still holds the job; False if it lost it (e.g. the
+        lease expired and another worker claimed it) and nothing was written.
+        """
+
+    @abstractmethod
+    def retry(self, task_id: str) -> bool:
+        """Queue a failed job again; False if it is not failed"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Job record, None if unknown"""
+
+    @abstractmethod
+    def requeue_stale(self, lease_seconds: Optional[float] = None, max_attempts: Optional[int] = None) -> int:
+        """Requeue processing jobs whose worker stopped heartbeating (or fail them after max_attempts)"""
+
+    @abstractmethod
+    def purge(self, older_than_seconds: Optional[float] = None) -> int:
+        """Delete finished jobs older than the retention window"""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+
+def _record(
+    task_id: str, status: str, payload: Dict[str, Any], state: Dict[str, Any], error: Optional[str],
+    attempts: int, worker: Optional[str], created: float, started: Optional[float], completed: Optional[float]
+) -> Dict[str, Any]:
+    """Job as returned to callers: the same shape the API has always reported for tasks"""
+    return {
+        "task_id": task_id,
+        "status": status,
+        **payload,
+        **state,
+        "error": error,
+        "attempts": attempts,
+        "worker": worker,
+        "start_time": created,
+        "started_at": started,
+        "completed_at": completed,
+    }
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a SQLite file; safe across processes on one host"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    heartbeat REAL,
+                    completed REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front, so claims never race"""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, task_id: str, payload: Dict[str, Any]):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (task_id, status, payload, created) VALUES (?, 'queued', ?, ?)",
+                (task_id, json.dumps(payload), time.time())
+            )
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT task_id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', worker = ?, started = ?, heartbeat = ?, "
+                "attempts = attempts + 1 WHERE task_id = ?",
+                (worker_id, now, now, row[0])
+            )
+            return self._get(conn, row[0])
+
+    def update(self, task_id: str, **state: Any):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None:
+                merged = {**json.loads(row[0]), **state}
+                conn.execute(
+                    "UPDATE jobs SET state = ?, heartbeat = ? WHERE task_id = ?",
+                    (json.dumps(merged, default=str), time.time(), task_id)
+                )
+
+    def heartbeat(self, task_ids: List[str]):
+        if not task_ids:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET heartbeat = ? WHERE task_id = ? AND status = 'processing'",
+                [(time.time(), task_id) for task_id in task_ids]
+            )
+
+    def finish(
+        self, task_id: str, status: str, error: Optional[str] = None, worker_id: Optional[str] = None, **state: Any
+    ) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state, status, worker FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+            if worker_id is not None and (row is None or row[1] != "processing" or row[2] != worker_id):
+                return False
+            merged = {**(json.loads(row[0]) if row else {}), **state}
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, state = ?, completed = ? WHERE task_id = ?",
+                (status, error, json.dumps(merged, default=str), time.time(), task_id)
+            )
+            return True
+
+    def retry(self, task_id: str) -> bool:
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'queued', error = NULL, worker = NULL, attempts = 0, completed = NULL "
+                "WHERE task_id = ? AND status = 'failed'",
+                (task_id,)
+            ).rowcount == 1
+
+    def _get(self, conn, task_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            "SELECT task_id, status, payload, state, error, attempts, worker, created, started, completed "
+            "FROM jobs WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return _record(row[0], row[1], json.loads(row[2]), json.loads(row[3]), *row[4:])
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._get(conn, task_id)
+
+    def requeue_stale(self, lease_seconds: Optional[float] = None, max_attempts: Optional[int] = None) -> int:
+        deadline = time.time() - (lease_seconds or config.JOB_LEASE_SECONDS)
+        max_attempts = max_attempts or config.JOB_MAX_ATTEMPTS
+        with self._transaction() as conn:
+            stale = conn.execute(
+                "SELECT task_id, attempts FROM jobs WHERE status = 'processing' AND heartbeat < ?", (deadline,)
+            ).fetchall()
+            for task_id, attempts in stale:
+                if attempts >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, completed = ? WHERE task_id = ?",
+                        (f"Worker lost {attempts} time(s); giving up", time.time(), task_id)
+                    )
+                else:
+                    conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE task_id = ?", (task_id,))
+        if stale:
+            logger.warning(f"[JOBS] Recovered {len(stale)} job(s) from lost workers")
+        return len(stale)
+
+    def purge(self, older_than_seconds: Optional[float] = None) -> int:
+        cutoff = time.time() - (older_than_seconds or config.JOB_RETENTION_HOURS * 3600)
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND completed < ?", (cutoff,)
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in JOB_STATUSES} | dict(rows)
+
+# Pop the oldest queued job, mark it processing and lease it
+_CLAIM_SCRIPT = """
+local task_id = redis.call('RPOP', KEYS[1])
+if not task_id then return nil end
+local job = ARGV[3] .. task_id
+redis.call('HSET', job, 'status', 'processing', 'worker', ARGV[1], 'started', ARGV[2])
+redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[2], task_id)
+return task_id
+"""
+
+# Record a job's outcome, if the given worker (or any, when empty) still holds it; 0 if not
+_FINISH_SCRIPT = """
+if ARGV[1] ~= '' and (redis.call('HGET', KEYS[1], 'status') ~= 'processing'
+        or redis.call('HGET', KEYS[1], 'worker') ~= ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[2], 'error', ARGV[3], 'state', ARGV[4], 'completed', ARGV[5])
+redis.call('ZREM', KEYS[2], ARGV[6])
+redis.call('ZADD', KEYS[3], ARGV[5], ARGV[6])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+return 1
+"""
+
+# Queue a failed job again; 0 if it is not failed
+_RETRY_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'failed' then return 0 end
+redis.call('HSET', KEYS[1], 'status', 'queued', 'error', '', 'worker', '', 'attempts', 0, 'completed', '')
+redis.call('PERSIST', KEYS[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Requeue a job whose lease expired, or fail it after max attempts; only the caller that removes the lease acts
+_RECOVER_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then return 0 end
+local attempts = tonumber(redis.call('HGET', KEYS[2], 'attempts') or '0')
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[2], 'status', 'failed', 'error', 'Worker lost ' .. attempts .. ' time(s); giving up',
+        'completed', ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+    redis.call('ZADD', KEYS[4], ARGV[3], ARGV[1])
+    return 2
+end
+redis.call('HSET', KEYS[2], 'status', 'queued', 'worker', '')
+redis.call('RPUSH', KEYS[3], ARGV[1])
+return 1
+"""
+
+class RedisJobQueue(JobQueue):
+    """Job queue in Redis, for workers on several hosts"""
+
+    def __init__(self, url: str, prefix: str = "ragapi:jobs"):
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.queued_key = f"{prefix}:queued"
+        self.leases_key = f"{prefix}:leases"
+        # Finished task ids by completion time, for counts (the job hashes expire on their own)
+        self.finished_keys = {status: f"{prefix}:{status}" for status in ("completed", "failed")}
+        # Multi-step transitions run as scripts so no other worker (or a crash) sees them half done
+        self._claim_script = self.redis.register_script(_CLAIM_SCRIPT)
+        self._finish_script = self.redis.register_script(_FINISH_SCRIPT)
+        self._retry_script = self.redis.register_script(_RETRY_SCRIPT)
+        self._recover_script = self.redis.register_script(_RECOVER_SCRIPT)
+
+    def _job_key(self, task_id: str) -> str:
+        return f"{self.prefix}:job:{task_id}"
+
+    def enqueue(self, task_id: str, payload: Dict[str, Any]):
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(task_id), mapping={
+            "status": "queued", "payload": json.dumps(payload), "state": "{}", "attempts": 0, "created": time.time()
+        })
+        pipe.lpush(self.queued_key, task_id)
+        pipe.execute()
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        task_id = self._claim_script(
+            keys=[self.queued_key, self.leases_key], args=[worker_id, time.time(), f"{self.prefix}:job:"]
+        )
+        return self.get(task_id) if task_id is not None else None
+
+    def update(self, task_id: str, **state: Any):
+        key = self._job_key(task_id)
+        merged = {**json.loads(self.redis.hget(key, "state") or "{}"), **state}
+        self.redis.hset(key, "state", json.dumps(merged, default=str))
+        self.heartbeat([task_id])
+
+    def heartbeat(self, task_ids: List[str]):
+        if task_ids:
+            now = time.time()
+            self.redis.zadd(self.leases_key, {task_id: now for task_id in task_ids}, xx=True)
+
+    def finish(
+        self, task_id: str, status: str, error: Optional[str] = None, worker_id: Optional[str] = None, **state: Any
+    ) -> bool:
+        key = self._job_key(task_id)
+        merged = {**json.loads(self.redis.hget(key, "state") or "{}"), **state}
+        # Finished jobs expire on their own instead of being purged
+        return bool(self._finish_script(
+            keys=[key, self.leases_key, self.finished_keys[status]],
+            args=[
+                worker_id or "", status, error or "", json.dumps(merged, default=str), time.time(), task_id,
+                int(config.JOB_RETENTION_HOURS * 3600)
+            ]
+        ))
+
+    def retry(self, task_id: str) -> bool:
+        return bool(self._retry_script(
+            keys=[self._job_key(task_id), self.queued_key, self.finished_keys["failed"]], args=[task_id]
+        ))
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        job = self.redis.hgetall(self._job_key(task_id))
+        if not job:
+            return None
+        optional = lambda field: float(job[field]) if job.get(field) else None
+        return _record(
+            task_id, job["status"], json.loads(job["payload"]), json.loads(job.get("state") or "{}"),
+            job.get("error") or None, int(job.get("attempts", 0)), job.get("worker"),
+            float(job["created"]), optional("started"), optional("completed")
+        )
+
+    def requeue_stale(self, lease_seconds: Optional[float] = None, max_attempts: Optional[int] = None) -> int:
+        deadline = time.time() - (lease_seconds or config.JOB_LEASE_SECONDS)
+        max_attempts = max_attempts or config.JOB_MAX_ATTEMPTS
+        stale = self.redis.zrangebyscore(self.leases_key, 0, deadline)
+        for task_id in stale:
+            self._recover_script(
+                keys=[self.leases_key, self._job_key(task_id), self.queued_key, self.finished_keys["failed"]],
+                args=[task_id, max_attempts, time.time(), int(config.JOB_RETENTION_HOURS * 3600)]
+            )
+        if stale:
+            logger.warning(f"[JOBS] Recovered {len(stale)} job(s) from lost workers")
+        return len(stale)
+
+    def purge(self, older_than_seconds: Optional[float] = None) -> int:
+        # Job hashes expire by themselves; only the finished-id index needs trimming
+        cutoff = time.time() - (older_than_seconds or config.JOB_RETENTION_HOURS * 3600)
+        return sum(self.redis.zremrangebyscore(key, 0, cutoff) for key in self.finished_keys.values())
+
+    def counts(self) -> Dict[str, int]:
+        cutoff = time.time() - config.JOB_RETENTION_HOURS * 3600
+        return {
+            "queued": self.redis.llen(self.queued_key),
+            "processing": self.redis.zcard(self.leases_key),
+            **{status: self.redis.zcount(key, cutoff, "+inf") for status, key in self.finished_keys.items()}
+        }
+
+_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> JobQueue:
+    """Shared job queue for the configured backend"""
+    global _queue
+    if _queue is None:
+        if config.JOB_QUEUE_BACKEND.lower() == "redis":
+            _queue = RedisJobQueue(config.JOB_QUEUE_REDIS_URL)
+        elif config.JOB_QUEUE_BACKEND.lower() == "sqlite":
+            db_path = Path(config.JOB_QUEUE_PATH) if config.JOB_QUEUE_PATH else config.get_working_dir() / "kv" / "jobs.sqlite"
+            _queue = SQLiteJobQueue(db_path)
+        else:
+            raise ValueError(f"Unsupported job queue backend: {config.JOB_QUEUE_BACKEND}")
+    return _queue
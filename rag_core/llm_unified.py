@@ -1,6 +1,9 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator
 import logging
 import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 import boto3
 import openai
 from openai import AsyncClient
@@ -8,6 +11,261 @@ from .config import config
 
 logger = logging.getLogger(__name__)
 
+LLM_TASKS = ("extract", "summarize", "answer", "vision")
+
+class LLMUsageStats:
+    """Per-task call counts, latency and token usage"""
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        self,
+        task: str,
+        model: str,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: bool = False
+    ):
+        """Record a single LLM call"""
+        stats = self._task_stats(task)
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["total_latency"] += latency
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def record_event(self, task: str, event: str):
+        """Count a structured-output event (json_failures, json_repaired, json_wasted)"""
+        stats = self._task_stats(task)
+        stats[event] = stats.get(event, 0) + 1
+
+    def merge(self, snapshot: Dict[str, Dict[str, Any]]):
+        """Add counters from another scope's snapshot (e.g. calls made in another process)"""
+        for task, other in snapshot.items():
+            stats = self._task_stats(task)
+            for key, value in other.items():
+                if key == "models":
+                    for model, count in value.items():
+                        stats["models"][model] = stats["models"].get(model, 0) + count
+                elif key != "avg_latency":
+                    stats[key] = stats.get(key, 0) + value
+
+    def _task_stats(self, task: str) -> Dict[str, Any]:
+        return self.tasks.setdefault(task, {
+            "calls": 0,
+            "errors": 0,
+            "total_latency": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "json_failures": 0,
+            "json_repaired": 0,
+            "json_wasted": 0,
+            "models": {}
+        })
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a JSON-serializable copy of the counters"""
+        result = {}
+        for task, stats in self.tasks.items():
+            calls = stats["calls"]
+            result[task] = {
+                **stats,
+                "models": dict(stats["models"]),
+                "total_latency": round(stats["total_latency"], 3),
+                "avg_latency": round(stats["total_latency"] / calls, 3) if calls else 0.0
+            }
+        return result
+
+# Process-wide counters plus an optional per-context scope (e.g. one ingest job)
+llm_usage = LLMUsageStats()
+_usage_scope: ContextVar[Optional[LLMUsageStats]] = ContextVar("llm_usage_scope", default=None)
+
+@contextmanager
+def llm_usage_scope() -> Iterator[LLMUsageStats]:
+    """Collect usage for all LLM calls made within this context (including child tasks)"""
+    stats = LLMUsageStats()
+    token = _usage_scope.set(stats)
+    try:
+        yield stats
+    finally:
+        _usage_scope.reset(token)
+
+def record_llm_usage(
+    task: Optional[str],
+    model: str,
+    latency: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    error: bool = False,
+    scope: Optional[LLMUsageStats] = None
+):
+    """Record a call in the process-wide counters and the given (or active) scope, if any"""
+    task_name = task or "default"
+    llm_usage.record(task_name, model, latency, prompt_tokens, completion_tokens, error)
+    scoped = scope or _usage_scope.get()
+    if scoped is not None:
+        scoped.record(task_name, model, latency, prompt_tokens, completion_tokens, error)
+
+def merge_llm_usage(snapshot: Dict[str, Dict[str, Any]]):
+    """Charge usage recorded in another process to the active scope"""
+    scoped = _usage_scope.get()
+    if scoped is not None and snapshot:
+        scoped.merge(snapshot)
+
+def record_llm_event(task: Optional[str], event: str):
+    """Count a structured-output event globally and in the active scope"""
+    task_name = task or "default"
+    llm_usage.record_event(task_name, event)
+    scoped = _usage_scope.get()
+    if scoped is not None:
+        scoped.record_event(task_name, event)
+
+class StructuredOutputError(ValueError):
+    """Raised when a model response does not match the requested JSON schema"""
+
+    def __init__(self, message: str, raw_response: str = ""):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+_JSON_TYPES = {
+    "string": str, "number": (int, float), "integer": int, "boolean": bool,
+    "array": list, "object": dict, "null": type(None)
+}
+
+def _matches_type(value: Any, spec: Dict[str, Any]) -> bool:
+    expected = spec.get("type")
+    if expected is None:
+        return True
+    if isinstance(value, bool) and expected in ("number", "integer"):
+        return False
+    if not isinstance(value, _JSON_TYPES.get(expected, object)):
+        return False
+    return "enum" not in spec or value in spec["enum"]
+
+def _type_errors(data: Dict[str, Any], schema: Dict[str, Any]) -> List[str]:
+    """Fields whose value (or array item) does not have the declared type; only native modes enforce it"""
+    errors = []
+    for key, spec in schema.get("properties", {}).items():
+        if key not in data:
+            continue
+        value = data[key]
+        if not _matches_type(value, spec):
+            errors.append(f"{key} should be {spec.get('type')}, got {type(value).__name__}")
+        elif spec.get("type") == "array" and "items" in spec:
+            bad = [item for item in value if not _matches_type(item, spec["items"])]
+            if bad:
+                errors.append(f"{key} items should be {spec['items'].get('type')}, got {type(bad[0]).__name__}")
+    return errors
+
+def parse_json_response(raw: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse a JSON object from a model response and check required keys and field types"""
+    text = (raw or "").strip()
+    if text.startswith("```"):
+        # Tolerate fenced output from providers without native JSON mode
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0].strip()
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Invalid JSON: {e}", raw) from e
+
+    if not isinstance(data, dict):
+        raise StructuredOutputError(f"Expected JSON object, got {type(data).__name__}", raw)
+
+    missing = [key for key in schema.get("required", []) if key not in data]
+    if missing:
+        raise StructuredOutputError(f"Missing required fields: {', '.join(missing)}", raw)
+
+    wrong_types = _type_errors(data, schema)
+    if wrong_types:
+        raise StructuredOutputError(f"Wrong field types: {'; '.join(wrong_types)}", raw)
+
+    return data
+
+# Responses that say nothing about the request itself: rate limits, timeouts, rejected credentials
+_TRANSIENT_STATUS_CODES = {401, 403, 408, 409, 429}
+_TRANSIENT_BEDROCK_CODES = {
+    "ThrottlingException", "ServiceUnavailableException", "InternalServerException", "ModelNotReadyException",
+    "ModelTimeoutException", "ExpiredTokenException", "UnrecognizedClientException", "AccessDeniedException"
+}
+
+def is_transient_llm_error(error: BaseException) -> bool:
+    """True if a call failed because of the provider (outage, throttling, credentials), not the request.
+
+    Retrying such a call later can succeed; anything else (invalid image, refused content,
+    output that never matches the schema) will fail the same way again.
+    """
+    import botocore.exceptions
+
+    while error is not None:
+        if isinstance(error, (TimeoutError, ConnectionError, openai.APIConnectionError,
+                              botocore.exceptions.ConnectionError, botocore.exceptions.HTTPClientError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in _TRANSIENT_STATUS_CODES or error.status_code >= 500
+        if isinstance(error, botocore.exceptions.ClientError):
+            return error.response.get("Error", {}).get("Code") in _TRANSIENT_BEDROCK_CODES
+        # Bedrock errors are re-raised as RuntimeError from the botocore error
+        error = error.__cause__
+    return False
+
+class _TokenCollector:
+    """token_tracker adapter for LightRAG's OpenAI helpers"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add_usage(self, token_counts: Dict[str, int]):
+        self.prompt_tokens += token_counts.get("prompt_tokens", 0) or 0
+        self.completion_tokens += token_counts.get("completion_tokens", 0) or 0
+
+def make_lightrag_model_func(task: str):
+    """Build a LightRAG llm_model_func bound to a task tier's model and timeout"""
+    from lightrag.llm.openai import openai_complete_if_cache
+
+    async def model_func(prompt, system_prompt=None, history_messages=None, **kwargs):
+        routing = config.get_llm_task_config(task)
+        scope = kwargs.pop("usage_scope", None)
+        kwargs.setdefault("timeout", routing["timeout"])
+        kwargs["token_tracker"] = tracker = _TokenCollector()
+        started = time.time()
+        try:
+            result = await openai_complete_if_cache(
+                routing["model"],
+                prompt,
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+                **kwargs
+            )
+        except Exception:
+            record_llm_usage(task, routing["model"], time.time() - started, error=True, scope=scope)
+            raise
+        record_llm_usage(
+            task, routing["model"], time.time() - started,
+            tracker.prompt_tokens, tracker.completion_tokens, scope=scope
+        )
+        return result
+
+    return model_func
+
+def bind_usage_scope(queued_func):
+    """Pass the caller's usage scope explicitly through LightRAG's LLM queue.
+
+    LightRAG runs model calls on worker tasks it starts lazily for the first caller; those keep
+    that caller's context, so the scope has to travel with each call as a kwarg.
+    """
+
+    async def call(*args, **kwargs):
+        kwargs.setdefault("usage_scope", _usage_scope.get())
+        return await queued_func(*args, **kwargs)
+
+    return call
+
 class UnifiedLLM:
     def __init__(self):
         self.config = config
@@ -43,6 +301,35 @@ class UnifiedLLM:
                 aws_secret_access_key=self.config.AWS_SECRET_ACCESS_KEY
             )
         return None
+
+    def _resolve_task(self, task: Optional[str]) -> Dict[str, Any]:
+        """Look up per-task routing settings, empty when no task is given"""
+        if not task:
+            return {}
+        return self.config.get_llm_task_config(task)
+
+    def _record_usage(
+        self,
+        task: Optional[str],
+        model: str,
+        started: float,
+        response: Any = None,
+        error: bool = False
+    ):
+        """Record latency and token usage for a completed call"""
+        usage = getattr(response, "usage", None)
+        record_llm_usage(
+            task,
+            model,
+            time.time() - started,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+            error
+        )
+
+    def get_usage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Process-wide per-task LLM usage"""
+        return llm_usage.snapshot()
     
     async def get_embeddings(
         self,
@@ -136,20 +423,26 @@ class UnifiedLLM:
         model: Optional[str] = None,
         system_prompt: Optional[str] = None,
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        task: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None
     ) -> str:
-        """Generate text using configured provider"""
+        """Generate text using configured provider, routed by task tier when given"""
         
-        model = model or self.config.LLM_MODEL
+        routing = self._resolve_task(task)
+        model = model or routing.get("model") or self.config.LLM_MODEL
+        max_tokens = max_tokens or routing.get("max_tokens")
+        timeout = routing.get("timeout")
         
         try:
             if "gpt" in model:  # OpenAI
                 return await self._generate_openai_text(
-                    prompt, model, system_prompt, temperature, max_tokens
+                    prompt, model, system_prompt, temperature, max_tokens, task, timeout,
+                    response_format
                 )
             else:  # AWS Bedrock
                 return await self._generate_bedrock_text(
-                    prompt, model, system_prompt, temperature, max_tokens
+                    prompt, model, system_prompt, temperature, max_tokens, task
                 )
         except Exception as e:
             logger.error(f"Text generation failed: {str(e)}")
@@ -161,7 +454,10 @@ class UnifiedLLM:
         model: str,
         system_prompt: Optional[str],
         temperature: float,
-        max_tokens: Optional[int]
+        max_tokens: Optional[int],
+        task: Optional[str] = None,
+        timeout: Optional[float] = None,
+        response_format: Optional[Dict[str, Any]] = None
     ) -> str:
         """Generate text using OpenAI"""
 
@@ -173,15 +469,20 @@ class UnifiedLLM:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
 
+        started = time.time()
         try:
             response = await self.openai_async_client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                timeout=timeout,
+                **({"response_format": response_format} if response_format else {})
             )
+            self._record_usage(task, model, started, response)
             return response.choices[0].message.content
         except Exception as e:
+            self._record_usage(task, model, started, error=True)
             logger.error(f"OpenAI text generation failed: {str(e)}")
             raise
     
@@ -191,13 +492,15 @@ class UnifiedLLM:
         model: str,
         system_prompt: Optional[str],
         temperature: float,
-        max_tokens: Optional[int]
+        max_tokens: Optional[int],
+        task: Optional[str] = None
     ) -> str:
         """Generate text using AWS Bedrock"""
         
         if not self.bedrock_client:
             raise ValueError("Bedrock client not initialized")
         
+        started = time.time()
         try:
             # Format prompt based on model
             if "claude" in model.lower():
@@ -219,30 +522,113 @@ class UnifiedLLM:
             )
             
             response_body = json.loads(response['body'].read())
+            self._record_usage(task, model, started)
             return response_body.get('completion') or response_body.get('generated_text', '')
         except Exception as e:
+            self._record_usage(task, model, started, error=True)
             logger.error(f"Bedrock text generation failed: {str(e)}")
             raise
     
+    async def generate_json(
+        self,
+        prompt: str,
+        schema: Dict[str, Any],
+        schema_name: str = "response",
+        system_prompt: Optional[str] = None,
+        task: str = "extract",
+        image_data: Optional[str] = None,
+        image_mime_type: str = "image/jpeg"
+    ) -> Dict[str, Any]:
+        """Generate a JSON object constrained to a schema, with one repair attempt"""
+
+        # Native schema enforcement where supported, plus an explicit instruction for other providers
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": schema_name, "schema": schema, "strict": True}
+        }
+        json_prompt = (
+            f"{prompt}\n\nRespond with a single JSON object matching this JSON schema:\n"
+            f"{json.dumps(schema)}"
+        )
+
+        if image_data:
+            raw = await self.analyze_image(
+                image_data=image_data,
+                prompt=json_prompt,
+                system_prompt=system_prompt,
+                task=task,
+                response_format=response_format,
+                mime_type=image_mime_type
+            )
+        else:
+            raw = await self.generate_text(
+                prompt=json_prompt,
+                system_prompt=system_prompt,
+                temperature=0.0,
+                task=task,
+                response_format=response_format
+            )
+
+        try:
+            return parse_json_response(raw, schema)
+        except StructuredOutputError as e:
+            record_llm_event(task, "json_failures")
+            logger.warning(f"Structured output for {schema_name} failed to parse ({e}), attempting repair")
+            first_error = e
+
+        # Single repair pass on the cheap tier: fix the output, don't redo the analysis
+        repair_prompt = (
+            f"The following output was supposed to be JSON matching this schema but is invalid "
+            f"({first_error}).\n\nSchema:\n{json.dumps(schema)}\n\nOutput:\n{raw}\n\n"
+            f"Return only the corrected JSON object, preserving the original content."
+        )
+        try:
+            repaired = await self.generate_text(
+                prompt=repair_prompt,
+                system_prompt="You repair malformed JSON so that it matches a given schema.",
+                temperature=0.0,
+                task="extract",
+                response_format=response_format
+            )
+            data = parse_json_response(repaired, schema)
+        except Exception as e:
+            record_llm_event(task, "json_wasted")
+            raise StructuredOutputError(
+                f"Structured output for {schema_name} could not be repaired: {e}", raw
+            ) from e
+
+        record_llm_event(task, "json_repaired")
+        return data
+
     async def analyze_image(
         self,
         image_data: str,
         prompt: str,
         model: Optional[str] = None,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        task: str = "vision",
+        response_format: Optional[Dict[str, Any]] = None,
+        mime_type: str = "image/jpeg",
+        messages: Optional[List[Dict[str, Any]]] = None
     ) -> str:
-        """Analyze image using vision model"""
+        """Analyze image using vision model (or a prebuilt multi-image chat message list)"""
         
-        model = model or self.config.VISION_MODEL
+        routing = self._resolve_task(task)
+        model = model or routing.get("model") or self.config.VISION_MODEL
+        max_tokens = routing.get("max_tokens") or 1000
+        timeout = routing.get("timeout")
         
         try:
             if "gpt" in model:  # OpenAI Vision
                 return await self._analyze_image_openai(
-                    image_data, prompt, model, system_prompt
+                    image_data, prompt, model, system_prompt, task, max_tokens, timeout,
+                    response_format, mime_type, messages
                 )
             else:  # AWS Bedrock Vision
+                if messages:
+                    raise ValueError("Multi-image messages are only supported for OpenAI vision models")
                 return await self._analyze_image_bedrock(
-                    image_data, prompt, model, system_prompt
+                    image_data, prompt, model, system_prompt, task, max_tokens
                 )
         except Exception as e:
             logger.error(f"Image analysis failed: {str(e)}")
@@ -253,38 +639,50 @@ class UnifiedLLM:
         image_data: str,
         prompt: str,
         model: str,
-        system_prompt: Optional[str]
+        system_prompt: Optional[str],
+        task: Optional[str] = "vision",
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        mime_type: str = "image/jpeg",
+        messages: Optional[List[Dict[str, Any]]] = None
     ) -> str:
         """Analyze image using OpenAI Vision"""
 
         if not self.openai_async_client:
             raise ValueError("OpenAI async client not initialized")
 
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
+        if messages is None:
+            messages = []
+            if system_prompt:
+                messages.append({"role": "system", "content": system_prompt})
 
-        messages.append({
-            "role": "user",
-            "content": [
-                {"type": "text", "text": prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{image_data}"
+            messages.append({
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{image_data}"
+                        }
                     }
-                }
-            ]
-        })
+                ]
+            })
 
+        started = time.time()
         try:
             response = await self.openai_async_client.chat.completions.create(
                 model=model,
                 messages=messages,
-                max_tokens=1000
+                max_tokens=max_tokens,
+                timeout=timeout,
+                **({"response_format": response_format} if response_format else {})
             )
+            self._record_usage(task, model, started, response)
             return response.choices[0].message.content
         except Exception as e:
+            self._record_usage(task, model, started, error=True)
             logger.error(f"OpenAI vision analysis failed: {str(e)}")
             raise
     
@@ -293,13 +691,16 @@ class UnifiedLLM:
         image_data: str,
         prompt: str,
         model: str,
-        system_prompt: Optional[str]
+        system_prompt: Optional[str],
+        task: Optional[str] = "vision",
+        max_tokens: int = 1000
     ) -> str:
         """Analyze image using AWS Bedrock Vision"""
         
         if not self.bedrock_client:
             raise ValueError("Bedrock client not initialized")
         
+        started = time.time()
         try:
             # Format prompt
             formatted_prompt = prompt
@@ -309,7 +710,7 @@ class UnifiedLLM:
             body = json.dumps({
                 "prompt": formatted_prompt,
                 "image": image_data,
-                "maxTokens": 1000
+                "maxTokens": max_tokens
             })
             
             response = self.bedrock_client.invoke_model(
@@ -318,7 +719,9 @@ class UnifiedLLM:
             )
             
             response_body = json.loads(response['body'].read())
+            self._record_usage(task, model, started)
             return response_body.get('generated_text', '')
         except Exception as e:
+            self._record_usage(task, model, started, error=True)
             logger.error(f"Bedrock vision analysis failed: {str(e)}")
-            raise
\ No newline at end of file
+            raise
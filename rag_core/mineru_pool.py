@@ -0,0 +1,288 @@
+from typing import Dict, Any, List, Optional
+import logging
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+MINERU_AVAILABLE = importlib.util.find_spec("mineru") is not None
+
+class MineruJobError(Exception):
+    """A MinerU job failed"""
+
+class MineruTimeoutError(MineruJobError):
+    """A MinerU job exceeded MINERU_JOB_TIMEOUT"""
+
+def _warm_up(settings: Dict[str, Any]):
+    """Parse a blank one-page PDF so layout/OCR models are loaded before the first real job"""
+    import pypdfium2 as pdfium
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "warmup.pdf"
+        pdf = pdfium.PdfDocument.new()
+        pdf.new_page(612, 792)
+        pdf.save(str(pdf_path))
+        _run_job({**settings, "file_path": str(pdf_path), "output_dir": temp_dir})
+
+def _run_job(job: Dict[str, Any]) -> str:
+    """Run MinerU in-process; models stay cached in this process between jobs"""
+    from mineru.cli.common import do_parse, read_fn
+
+    file_path = Path(job["file_path"])
+    do_parse(
+        output_dir=job["output_dir"],
+        pdf_file_names=[file_path.stem],
+        pdf_bytes_list=[read_fn(file_path)],
+        p_lang_list=[job["lang"]],
+        backend="pipeline",
+        parse_method=job["method"],
+        formula_enable=job["enable_equations"],
+        table_enable=job["enable_tables"],
+        f_draw_layout_bbox=False,
+        f_draw_span_bbox=False,
+        f_dump_model_output=False,
+        f_dump_orig_pdf=False,
+    )
+    return job["output_dir"]
+
+def _worker_main(conn, settings: Dict[str, Any]):
+    """Worker loop: load models once, then serve jobs from the pipe until told to stop"""
+    threads = str(settings["threads"])
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = threads
+    os.environ.setdefault("MINERU_DEVICE_MODE", settings["device"])
+
+    try:
+        if settings["warmup"]:
+            _warm_up(settings)
+        conn.send(("ready", None))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        return
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            conn.send(("ok", _run_job({**settings, **job})))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+class _Worker:
+    def __init__(self, context, settings: Dict[str, Any], index: int):
+        self.index = index
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, settings), name=f"mineru-worker-{index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.jobs = 0
+
+    def receive(self, timeout: Optional[float]):
+        """Block (in a thread) until the worker replies or the timeout passes"""
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        return self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+class MineruWorkerPool:
+    """Long-lived MinerU worker processes that keep models loaded between documents"""
+
+    def __init__(self, size: Optional[int] = None, job_timeout: Optional[float] = None):
+        cpu_per_worker = max(1, config.MINERU_CPU_PER_WORKER)
+        self.size = size or config.MINERU_POOL_SIZE or max(1, config.get_cpu_share() // cpu_per_worker)
+        self.job_timeout = job_timeout or config.MINERU_JOB_TIMEOUT
+        parser_config = config.get_parser_config()
+        self.settings = {
+            "method": parser_config["method"],
+            "lang": "en",
+            "device": "cpu",
+            "enable_equations": parser_config["enable_equations"],
+            "enable_tables": parser_config["enable_tables"],
+            "threads": cpu_per_worker,
+            "warmup": config.MINERU_POOL_WARMUP,
+        }
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+        self._start_lock = asyncio.Lock()
+        self.disabled = False
+        self.stats = {"jobs": 0, "failures": 0, "timeouts": 0, "restarts": 0, "busy_seconds": 0.0}
+
+    async def start(self):
+        """Spawn workers and wait until their models are loaded"""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            if self.disabled:
+                raise MineruJobError("MinerU worker pool failed to start earlier")
+            started = time.time()
+            workers = [_Worker(self._context, self.settings, i) for i in range(self.size)]
+            replies = await asyncio.gather(
+                *(asyncio.to_thread(worker.receive, config.MINERU_JOB_TIMEOUT) for worker in workers),
+                return_exceptions=True
+            )
+            failed = [reply for reply in replies if isinstance(reply, Exception) or reply[0] != "ready"]
+            if failed:
+                for worker in workers:
+                    worker.kill()
+                self.disabled = True
+                raise MineruJobError(f"MinerU workers failed to start: {failed[0]}")
+
+            self._workers = workers
+            self._idle = asyncio.Queue()
+            for worker in workers:
+                worker.ready = True
+                self._idle.put_nowait(worker)
+            logger.info(f"[MINERU POOL] {self.size} worker(s) ready in {time.time() - started:.1f}s")
+
+    async def parse(self, file_path: str, output_dir: str) -> str:
+        """Parse a document on an idle worker; output is written under output_dir like the CLI"""
+        if self._idle is None:
+            await self.start()
+
+        worker = await self._idle.get()
+        started = time.time()
+        try:
+            if not worker.ready:
+                # A replacement worker is still loading models
+                status, payload = await asyncio.to_thread(worker.receive, self.job_timeout)
+                if status != "ready":
+                    raise EOFError(payload)
+                worker.ready = True
+                started = time.time()
+            worker.conn.send({"file_path": file_path, "output_dir": output_dir})
+            status, payload = await asyncio.to_thread(worker.receive, self.job_timeout)
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.error(f"[MINERU POOL] Job timed out after {self.job_timeout}s: {file_path}")
+            worker = await self._replace(worker)
+            raise MineruTimeoutError(f"MinerU timed out after {self.job_timeout}s")
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self.stats["failures"] += 1
+            worker = await self._replace(worker)
+            raise MineruJobError(f"MinerU worker died: {str(e)}")
+        finally:
+            self.stats["busy_seconds"] += time.time() - started
+            self._idle.put_nowait(worker)
+
+        self.stats["jobs"] += 1
+        worker.jobs += 1
+        if status != "ok":
+            self.stats["failures"] += 1
+            raise MineruJobError(f"MinerU job failed: {payload}")
+        logger.info(f"[MINERU POOL] Parsed {file_path} on worker {worker.index} in {time.time() - started:.1f}s")
+        return payload
+
+    async def _replace(self, worker: _Worker) -> _Worker:
+        """Kill a stuck or dead worker and start a fresh one in its slot"""
+        await asyncio.to_thread(worker.kill)
+        replacement = _Worker(self._context, self.settings, worker.index)
+        self._workers[self._workers.index(worker)] = replacement
+        self.stats["restarts"] += 1
+        return replacement
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "size": self.size, "started": self._idle is not None}
+
+    async def shutdown(self):
+        """Stop all workers"""
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, 10)
+            worker.kill()
+        self._workers = []
+        self._idle = None
+
+async def run_mineru_cli(file_path: str, output_dir: str, timeout: Optional[float] = None) -> str:
+    """Run the mineru CLI as an async subprocess (used when the pool is disabled or unavailable)"""
+    parser_config = config.get_parser_config()
+    mineru_cmd = str(Path(sys.executable).parent / "mineru")
+    args = [
+        "-p", file_path,
+        "-o", output_dir,
+        "-m", parser_config["method"],
+        "--device", "cpu",
+        "--lang", "en"
+    ]
+    if parser_config["enable_equations"]:
+        args.extend(["--formula", "true"])
+    if parser_config["enable_tables"]:
+        args.extend(["--table", "true"])
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            mineru_cmd, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError as e:
+        raise MineruJobError(f"MinerU executable not found at {mineru_cmd}: {str(e)}")
+
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout or config.MINERU_JOB_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise MineruTimeoutError(f"MinerU command timed out after {timeout or config.MINERU_JOB_TIMEOUT}s")
+
+    if process.returncode != 0:
+        raise MineruJobError(f"MinerU command failed: {stderr.decode(errors='replace')}")
+    return output_dir
+
+_pool: Optional[MineruWorkerPool] = None
+
+def default_parallelism() -> int:
+    """Concurrent MinerU jobs: the pool size, or the same core-based sizing for the CLI"""
+    if _pool is not None:
+        return _pool.size
+    return config.MINERU_POOL_SIZE or max(1, config.get_cpu_share() // max(1, config.MINERU_CPU_PER_WORKER))
+
+def get_mineru_pool() -> Optional[MineruWorkerPool]:
+    """Shared worker pool, None when disabled or MinerU isn't importable"""
+    global _pool
+    if not config.MINERU_POOL_ENABLED or not MINERU_AVAILABLE:
+        return None
+    if _pool is None:
+        _pool = MineruWorkerPool()
+    return _pool
+
+async def run_mineru(file_path: str, output_dir: str) -> str:
+    """Parse with the warm pool when possible, otherwise fall back to the CLI"""
+    pool = get_mineru_pool()
+    if pool is not None:
+        try:
+            return await pool.parse(file_path, output_dir)
+        except MineruTimeoutError:
+            raise
+        except MineruJobError as e:
+            logger.warning(f"[MINERU POOL] {str(e)}; falling back to CLI")
+    return await run_mineru_cli(file_path, output_dir)
+
+async def shutdown_mineru_pool():
+    """Stop the shared pool if it was started"""
+    global _pool
+    if _pool is not None:
+        await _pool.shutdown()
+        _pool = None
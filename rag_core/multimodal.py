@@ -1,17 +1,52 @@
 from typing import Dict, Any, List, Optional, Tuple
 import logging
-import base64
 from pathlib import Path
-from PIL import Image
-import io
 import json
-import pandas as pd
+import hashlib
 from .config import config
 from .llm_unified import UnifiedLLM
+from .image_prep import image_preparer
+from .table_profile import build_table_prompt, parse_table_body, profile_table
 from .schemas import ContentType
 
 logger = logging.getLogger(__name__)
 
+def _object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Strict JSON schema object with every property required"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+IMAGE_ANALYSIS_SCHEMA = _object_schema({
+    "detailed_description": _STRING,
+    "key_elements": _STRING_LIST,
+    "context_relevance": _STRING,
+    "technical_details": _STRING,
+    "extracted_text": _STRING
+})
+
+TABLE_ANALYSIS_SCHEMA = _object_schema({
+    "main_findings": _STRING_LIST,
+    "statistical_insights": _STRING,
+    "context_relevance": _STRING,
+    "notable_points": _STRING_LIST,
+    "patterns": _STRING
+})
+
+EQUATION_ANALYSIS_SCHEMA = _object_schema({
+    "explanation": _STRING,
+    "components": _STRING_LIST,
+    "context_relevance": _STRING,
+    "applications": _STRING,
+    "complexity_level": {"type": "string", "enum": ["basic", "intermediate", "advanced"]}
+})
+
 class BaseModalProcessor:
     def __init__(self, llm: Optional[UnifiedLLM] = None):
         self.llm = llm or UnifiedLLM()
@@ -64,19 +99,20 @@ class ImageProcessor(BaseModalProcessor):
         """
         
         try:
-            # Get image data
-            image_data = self._encode_image(image_path)
+            # Get downsized, re-encoded image data
+            prepared = await image_preparer.prepare(image_path)
             
             # Analyze with vision model
-            analysis = await self.llm.analyze_image(
-                image_data=image_data,
+            analysis_data = await self.llm.generate_json(
                 prompt=prompt,
-                system_prompt="You are an expert image analyst specializing in document understanding."
+                schema=IMAGE_ANALYSIS_SCHEMA,
+                schema_name="image_analysis",
+                system_prompt="You are an expert image analyst specializing in document understanding.",
+                task="vision",
+                image_data=prepared.data,
+                image_mime_type=prepared.mime_type
             )
             
-            # Parse analysis
-            analysis_data = json.loads(analysis)
-            
             # Create chunk content
             chunk_content = f"""
             Image Analysis:
@@ -116,26 +152,6 @@ class ImageProcessor(BaseModalProcessor):
         except Exception as e:
             logger.error(f"Image processing failed: {str(e)}")
             raise
-    
-    def _encode_image(self, image_path: str) -> str:
-        """Encode image to base64"""
-        try:
-            with Image.open(image_path) as img:
-                # Convert to RGB if needed
-                if img.mode in ('RGBA', 'LA'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[-1])
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Convert to base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=85)
-                return base64.b64encode(buffer.getvalue()).decode()
-        except Exception as e:
-            logger.error(f"Image encoding failed: {str(e)}")
-            raise
 
 class TableProcessor(BaseModalProcessor):
     async def process_item(
@@ -151,11 +167,9 @@ class TableProcessor(BaseModalProcessor):
         captions = item.get("table_caption", [])
         
         try:
-            # Convert markdown table to DataFrame
-            df = self._parse_markdown_table(table_body)
-            
-            # Generate statistics
-            stats = self._generate_table_stats(df)
+            # Large tables are sent as a local profile plus excerpt; the chunk keeps the full body
+            table_prompt = build_table_prompt(table_body)
+            stats = self._generate_table_stats(table_body, table_prompt.profile)
             
             # Build analysis prompt
             prompt = f"""
@@ -168,7 +182,7 @@ class TableProcessor(BaseModalProcessor):
             {json.dumps(stats, indent=2)}
             
             Table Data:
-            {table_body}
+            {table_prompt.text}
             
             Provide a comprehensive analysis including:
             1. Key findings and patterns
@@ -186,14 +200,14 @@ class TableProcessor(BaseModalProcessor):
             """
             
             # Get analysis from LLM
-            analysis = await self.llm.generate_text(
+            analysis_data = await self.llm.generate_json(
                 prompt=prompt,
-                system_prompt="You are an expert data analyst specializing in table understanding."
+                schema=TABLE_ANALYSIS_SCHEMA,
+                schema_name="table_analysis",
+                system_prompt="You are an expert data analyst specializing in table understanding.",
+                task="summarize"
             )
             
-            # Parse analysis
-            analysis_data = json.loads(analysis)
-            
             # Create chunk content
             chunk_content = f"""
             Table Analysis:
@@ -221,7 +235,7 @@ class TableProcessor(BaseModalProcessor):
             
             # Create entity info
             entity_info = {
-                "entity_name": f"table_{item.get('page_idx', 0)}_{hash(table_body)[:8]}",
+                "entity_name": f"table_{item.get('page_idx', 0)}_{hashlib.md5(table_body.encode()).hexdigest()[:8]}",
                 "entity_type": "table",
                 "description": analysis_data['statistical_insights'][:200],
                 "metadata": {
@@ -237,48 +251,20 @@ class TableProcessor(BaseModalProcessor):
             logger.error(f"Table processing failed: {str(e)}")
             raise
     
-    def _parse_markdown_table(self, table_body: str) -> pd.DataFrame:
-        """Parse markdown table to DataFrame"""
-        try:
-            # Split into lines and clean
-            lines = [line.strip() for line in table_body.split('\n') if line.strip()]
-            
-            # Extract headers
-            headers = [col.strip() for col in lines[0].split('|')[1:-1]]
-            
-            # Skip separator line
-            data_lines = lines[2:]
-            
-            # Parse data
-            data = []
-            for line in data_lines:
-                row = [cell.strip() for cell in line.split('|')[1:-1]]
-                data.append(row)
-            
-            return pd.DataFrame(data, columns=headers)
-        except Exception as e:
-            logger.error(f"Table parsing failed: {str(e)}")
-            raise
-    
-    def _generate_table_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _generate_table_stats(self, table_body: str, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate statistical information about table"""
         try:
-            stats = {
-                "dimensions": df.shape,
-                "column_types": {},
-                "has_numeric": False
-            }
-            
-            for col in df.columns:
-                # Try to convert to numeric
-                numeric_series = pd.to_numeric(df[col], errors='coerce')
-                if numeric_series.notna().any():
-                    stats["has_numeric"] = True
-                    stats["column_types"][col] = "numeric"
-                else:
-                    stats["column_types"][col] = "text"
+            if profile is None:
+                df = parse_table_body(table_body)
+                profile = profile_table(df) if df is not None else {
+                    "rows": 0, "columns": 0, "column_profiles": [], "numeric_columns": []
+                }
             
-            return stats
+            return {
+                "dimensions": (profile["rows"], profile["columns"]),
+                "column_types": {column["name"]: column["type"] for column in profile["column_profiles"]},
+                "has_numeric": bool(profile["numeric_columns"])
+            }
         except Exception as e:
             logger.error(f"Stats generation failed: {str(e)}")
             raise
@@ -320,14 +306,14 @@ class EquationProcessor(BaseModalProcessor):
             """
             
             # Get analysis from LLM
-            analysis = await self.llm.generate_text(
+            analysis_data = await self.llm.generate_json(
                 prompt=prompt,
-                system_prompt="You are an expert mathematician specializing in equation understanding."
+                schema=EQUATION_ANALYSIS_SCHEMA,
+                schema_name="equation_analysis",
+                system_prompt="You are an expert mathematician specializing in equation understanding.",
+                task="summarize"
             )
             
-            # Parse analysis
-            analysis_data = json.loads(analysis)
-            
             # Create chunk content
             chunk_content = f"""
             Equation Analysis:
@@ -352,7 +338,7 @@ class EquationProcessor(BaseModalProcessor):
             
             # Create entity info
             entity_info = {
-                "entity_name": f"equation_{item.get('page_idx', 0)}_{hash(latex)[:8]}",
+                "entity_name": f"equation_{item.get('page_idx', 0)}_{hashlib.md5(latex.encode()).hexdigest()[:8]}",
                 "entity_type": "equation",
                 "description": analysis_data['explanation'][:200],
                 "metadata": {
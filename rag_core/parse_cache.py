@@ -0,0 +1,169 @@
+from typing import Dict, Any, List, NamedTuple, Optional
+import logging
+import asyncio
+import hashlib
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from importlib import metadata
+from pathlib import Path
+from .asset_store import link_or_copy, store_asset
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Bump when parser post-processing changes the shape of cached content lists
+PARSE_CACHE_VERSION = 1
+
+class CachedParse(NamedTuple):
+    content_list: List[Dict[str, Any]]
+    parser_used: str
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Streaming sha256 of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def package_version(name: str) -> str:
+    """Installed version of a distribution, empty when missing"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return ""
+
+def parse_cache_key(file_hash: str, parser_settings: Dict[str, Any]) -> str:
+    """Cache key for a file hash plus everything that changes parser output"""
+    payload = json.dumps(
+        {"file": file_hash, "cache_version": PARSE_CACHE_VERSION, **parser_settings}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ParseCache:
+    """Content-addressed cache of parsed content lists and their assets, LRU-evicted by size"""
+
+    def __init__(self, cache_dir: Path, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or config.PARSE_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    parser_used TEXT,
+                    bytes INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.cache_dir / "index.sqlite", timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str) -> Optional[CachedParse]:
+        """Cached content list with its assets restored to the asset store, or None"""
+        entry_dir = self._entry_dir(key)
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT parser_used FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not (entry_dir / "content_list.json").exists():
+                self.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.stats["hits"] += 1
+
+        with open(entry_dir / "content_list.json") as f:
+            content_list = json.load(f)
+        for item in content_list:
+            cached_asset = item.get("img_path")
+            if not cached_asset:
+                continue
+            source = entry_dir / cached_asset
+            item["img_path"] = str(store_asset(source)) if source.exists() else ""
+        return CachedParse(content_list, row[0])
+
+    def put(self, key: str, content_list: List[Dict[str, Any]], parser_used: str):
+        """Store a content list plus hardlinks to the assets it references, then evict to size"""
+        entry_dir = self._entry_dir(key)
+        staging_dir = entry_dir.with_name(f"{key}.tmp-{threading.get_ident()}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        (staging_dir / "assets").mkdir(parents=True)
+
+        stored = []
+        for position, item in enumerate(content_list):
+            item = dict(item)
+            img_path = item.get("img_path")
+            if img_path and Path(img_path).exists():
+                name = f"{position}_{Path(img_path).name}"
+                link_or_copy(img_path, str(staging_dir / "assets" / name))
+                item["img_path"] = f"assets/{name}"
+            elif img_path:
+                item["img_path"] = ""
+            stored.append(item)
+        with open(staging_dir / "content_list.json", "w") as f:
+            json.dump(stored, f, default=str)
+
+        size = sum(path.stat().st_size for path in staging_dir.rglob("*") if path.is_file())
+        with self._lock:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            staging_dir.rename(entry_dir)
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, parser_used, bytes, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, parser_used, size, now, now)
+                )
+            self.stats["stored"] += 1
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute("SELECT key, bytes FROM entries ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                self.stats["evicted"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+        return {**self.stats, "entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+_cache: Optional[ParseCache] = None
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Shared parse cache, None when disabled"""
+    global _cache
+    if not config.PARSE_CACHE_ENABLED:
+        return None
+    cache_dir = Path(config.PARSE_CACHE_DIR) if config.PARSE_CACHE_DIR else config.get_working_dir() / "parse_cache"
+    if _cache is None or _cache.cache_dir != cache_dir.absolute():
+        _cache = ParseCache(cache_dir.absolute())
+    return _cache
+
+async def cached_parse_key(file_path: str, parser_settings: Dict[str, Any]) -> str:
+    """Hash the file off the event loop and build its cache key"""
+    file_hash = await asyncio.to_thread(file_sha256, file_path)
+    return parse_cache_key(file_hash, parser_settings)
@@ -1,35 +1,76 @@
 from typing import List, Dict, Any, Optional
 from pathlib import Path
-import subprocess
 import json
 import tempfile
 import logging
 import shutil
-import sys
 import re
+import asyncio
+import datetime
 from .config import config
+from .asset_store import link_or_copy, staging_dir, store_asset, store_asset_bytes
+from .mineru_pool import default_parallelism, run_mineru
+from .parse_cache import cached_parse_key, get_parse_cache, package_version
+from .docling_convert import DOCLING_AVAILABLE, convert_document_async
+from .pdf_text import PYMUPDF_AVAILABLE, scan_settings, scan_pdf
 from .schemas import ContentType, TextContent, ImageContent, TableContent, EquationContent
 
 logger = logging.getLogger(__name__)
 
+def excel_cell_text(value: Any, max_chars: Optional[int] = None) -> str:
+    """Render a cell value for a pipe table: whitespace collapsed, truncated, pipes escaped"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        value = value.date()
+    text = value if isinstance(value, str) else str(value)
+    if "\n" in text or "\r" in text or "\t" in text or "  " in text:
+        text = " ".join(text.split())
+    max_chars = max_chars or config.XLSX_MAX_CELL_CHARS
+    if len(text) > max_chars:
+        text = text[:max_chars] + "…"
+    return text.replace("|", "\\|") if "|" in text else text
+
+def _pipe_rows(rows: List[tuple], width: int) -> str:
+    """Pipe-table lines for a chunk of raw row tuples, padded or cut to the header width"""
+    lines = []
+    for values in rows:
+        cells = [excel_cell_text(value) for value in values[:width]]
+        if len(cells) < width:
+            cells.extend([""] * (width - len(cells)))
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
 class BaseParser:
     def __init__(self):
         self.config = config.get_parser_config()
+        # Set when the last parse fell back to basic text extraction
+        self.degraded = False
     
     async def parse_document(self, file_path: str) -> List[Dict[str, Any]]:
         """Base method for document parsing"""
         raise NotImplementedError
+
+    def cache_settings(self) -> Dict[str, Any]:
+        """Everything besides file content that changes this parser's output (parse cache key)"""
+        return {
+            "parser": self.__class__.__name__,
+            "method": self.config["method"],
+            "enable_images": self.config["enable_images"],
+            "enable_tables": self.config["enable_tables"],
+            "enable_equations": self.config["enable_equations"],
+        }
     
     @staticmethod
     def _persist_assets(
         content_list: List[Dict[str, Any]],
-        source_root: Path,
-        dest_root: Path
+        source_root: Path
     ) -> List[Dict[str, Any]]:
-        """Copy parser-produced assets (e.g., images) from a temp directory to a stable location
-        and rewrite paths inside content_list to point to the persisted files.
+        """Move parser-produced assets (e.g., images) into the content-addressed asset store
+        and rewrite paths inside content_list to point to the stored files.
         """
-        dest_root.mkdir(parents=True, exist_ok=True)
         updated: List[Dict[str, Any]] = []
         
         for item in content_list:
@@ -42,10 +83,7 @@ class BaseParser:
                         p = source_root / p
                     try:
                         if p.exists():
-                            target = dest_root / p.name
-                            if str(p.resolve()) != str(target.resolve()):
-                                shutil.copy2(p, target)
-                            item_copy["img_path"] = str(target)
+                            item_copy["img_path"] = str(store_asset(p))
                         else:
                             # leave as-is; downstream may skip if not exists
                             pass
@@ -55,11 +93,18 @@ class BaseParser:
         return updated
 
 class MineruParser(BaseParser):
+    def cache_settings(self) -> Dict[str, Any]:
+        settings = {**super().cache_settings(), "version": package_version("mineru")}
+        if config.PDF_TEXT_LAYER_ENABLED and PYMUPDF_AVAILABLE:
+            settings["text_layer"] = {**scan_settings(), "version": package_version("PyMuPDF")}
+        return settings
+
     async def parse_document(self, file_path: str) -> List[Dict[str, Any]]:
         """Parse document using MinerU"""
 
         # Create temporary directory for output
-        with tempfile.TemporaryDirectory() as temp_dir:
+        # Staged next to the asset store so outputs and images are hardlinked, not copied
+        with tempfile.TemporaryDirectory(dir=staging_dir()) as temp_dir:
             # Convert Office documents to PDF first, skip if already PDF
             from .conversion.excel_to_pdf import convert_office_to_pdf, needs_conversion
             if needs_conversion(file_path):
@@ -68,61 +113,137 @@ class MineruParser(BaseParser):
             else:
                 logger.debug("[MINERU] Skipping conversion for PDF file: %s", file_path)
 
-            # Build MinerU command using the virtual environment executable
-            mineru_cmd = str(Path(sys.executable).parent / "mineru")
+            stem = Path(file_path).stem
+            output_root = config.get_working_dir() / "output" / stem
 
-            base_args = [
-                "-p", file_path,
-                "-o", temp_dir,
-                "-m", self.config["method"],
-                "--device", "cpu",
-                "--lang", "en"
-            ]
-            if self.config["enable_equations"]:
-                base_args.extend(["--formula", "true"])
-            if self.config["enable_tables"]:
-                base_args.extend(["--table", "true"])
+            # Born-digital pages are extracted from the text layer; only the rest go to MinerU
+            text_items: List[Dict[str, Any]] = []
+            page_groups = None
+            if config.PDF_TEXT_LAYER_ENABLED and PYMUPDF_AVAILABLE and Path(file_path).suffix.lower() == ".pdf":
+                try:
+                    scan = await scan_pdf(file_path)
+                    if len(scan.ocr_pages) < scan.page_count:
+                        text_items = scan.text_items
+                        page_groups = self._page_groups(scan.ocr_pages)
+                except Exception as e:
+                    logger.warning(f"[MINERU] Text layer scan failed for {file_path}, parsing all pages: {str(e)}")
+            if page_groups is None:
+                ranges = await asyncio.to_thread(self._page_ranges, file_path)
+                if len(ranges) <= 1:
+                    content_list = await self._parse_range(file_path, temp_dir, output_root)
+                    return self._process_content_list(content_list)
+                page_groups = [list(range(start, end)) for start, end in ranges]
+            elif not page_groups:
+                logger.info(f"[MINERU] Every page of {stem} has a text layer, skipping MinerU")
+                return self._process_content_list(text_items)
+
+            # Parse page groups in parallel and merge with text-layer pages in page order
+            parts = await asyncio.to_thread(self._split_pdf, file_path, page_groups, Path(temp_dir) / "parts")
+            logger.info(
+                f"[MINERU] Parsing {sum(len(group) for group in page_groups)} page(s) of {stem} as {len(parts)} job(s) "
+                f"of up to {config.MINERU_PAGE_RANGE_SIZE} pages"
+            )
+            semaphore = asyncio.Semaphore(config.MINERU_PARSE_PARALLELISM or default_parallelism())
+
+            async def parse_part(part_path: Path, pages: List[int]) -> List[Dict[str, Any]]:
+                label = f"pages_{pages[0] + 1:04d}-{pages[-1] + 1:04d}"
+                async with semaphore:
+                    return await self._parse_range(
+                        str(part_path), str(Path(temp_dir) / label), output_root / label, pages
+                    )
 
-            # Use the virtual environment mineru executable
-            cmd = [mineru_cmd, *base_args]
+            results = await asyncio.gather(*(parse_part(part, pages) for part, pages in zip(parts, page_groups)))
+            merged = text_items + [item for part_items in results for item in part_items]
+            return self._process_content_list(sorted(merged, key=lambda item: item.get("page_idx", 0)))
 
-            try:
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode != 0:
-                    raise Exception(f"MinerU command failed: {result.stderr}")
-            except FileNotFoundError as e:
-                raise Exception(f"MinerU executable not found at {mineru_cmd}: {str(e)}")
-            
-            # Read output files
-            stem = Path(file_path).stem
+    def _page_ranges(self, pdf_path: str) -> List[tuple]:
+        """[start, end) page ranges for a PDF; one range for small documents"""
+        try:
+            from PyPDF2 import PdfReader
+            page_count = len(PdfReader(pdf_path).pages)
+        except Exception as e:
+            logger.warning(f"[MINERU] Could not count pages of {pdf_path}, parsing as one range: {str(e)}")
+            return []
 
-            # Persist full MinerU output for debugging/auditing
-            mineru_temp_root = Path(temp_dir) / stem
-            persist_output_root = config.get_working_dir() / "output" / stem
-            if mineru_temp_root.exists():
-                persist_output_root.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copytree(mineru_temp_root, persist_output_root, dirs_exist_ok=True)
-            else:
-                persist_output_root.mkdir(parents=True, exist_ok=True)
-
-            # MinerU creates a subdirectory structure: {output_dir}/{filename}/{method}/
-            method_dir = persist_output_root / self.config["method"]
-            content_file = method_dir / f"{stem}_content_list.json"
-            
-            if content_file.exists():
-                with open(content_file) as f:
-                    raw_content_list = json.load(f)
-                # Persist assets (images) to stable location under working dir
-                dest_root = config.get_working_dir() / "assets" / stem
-                content_list = self._persist_assets(
-                    content_list=raw_content_list,
-                    source_root=method_dir,
-                    dest_root=dest_root
-                )
-                return self._process_content_list(content_list)
-            
+        range_size = max(1, config.MINERU_PAGE_RANGE_SIZE)
+        if page_count < config.MINERU_SPLIT_MIN_PAGES or page_count <= range_size:
+            return [(0, page_count)]
+        return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+    @staticmethod
+    def _page_groups(pages: List[int]) -> List[List[int]]:
+        """Split selected pages into MinerU jobs; few pages stay in one job"""
+        range_size = max(1, config.MINERU_PAGE_RANGE_SIZE)
+        if len(pages) < config.MINERU_SPLIT_MIN_PAGES:
+            return [pages] if pages else []
+        return [pages[start:start + range_size] for start in range(0, len(pages), range_size)]
+
+    @staticmethod
+    def _split_pdf(pdf_path: str, page_groups: List[List[int]], parts_dir: Path) -> List[Path]:
+        """Write each group of pages to its own PDF"""
+        from PyPDF2 import PdfReader, PdfWriter
+
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        reader = PdfReader(pdf_path)
+        stem = Path(pdf_path).stem
+        parts = []
+        for pages in page_groups:
+            writer = PdfWriter()
+            for page_number in pages:
+                writer.add_page(reader.pages[page_number])
+            part_path = parts_dir / f"{stem}_p{pages[0] + 1:04d}-{pages[-1] + 1:04d}.pdf"
+            with open(part_path, "wb") as f:
+                writer.write(f)
+            parts.append(part_path)
+        return parts
+
+    async def _parse_range(
+        self,
+        pdf_path: str,
+        output_dir: str,
+        output_root: Path,
+        page_map: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Run MinerU on one PDF (or page-group part) and load its content list"""
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        # Parse on a warm worker (models already loaded), or the CLI if the pool is unavailable
+        await run_mineru(pdf_path, output_dir)
+
+        # Persist full MinerU output for debugging/auditing
+        stem = Path(pdf_path).stem
+        mineru_temp_root = Path(output_dir) / stem
+        if mineru_temp_root.exists():
+            output_root.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copytree(mineru_temp_root, output_root, dirs_exist_ok=True, copy_function=link_or_copy)
+        else:
+            output_root.mkdir(parents=True, exist_ok=True)
+
+        return self._load_content_list(output_root / self.config["method"], stem, page_map)
+
+    def _load_content_list(
+        self,
+        method_dir: Path,
+        stem: str,
+        page_map: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Read a MinerU content list, persist its assets and map page_idx to document pages"""
+        # MinerU creates a subdirectory structure: {output_dir}/{filename}/{method}/
+        content_file = method_dir / f"{stem}_content_list.json"
+        if not content_file.exists():
             return []
 
+        with open(content_file) as f:
+            raw_content_list = json.load(f)
+        # Persist assets (images) in the content-addressed store
+        content_list = self._persist_assets(
+            content_list=raw_content_list,
+            source_root=method_dir
+        )
+        if page_map:
+            for item in content_list:
+                item["page_idx"] = page_map[min(item.get("page_idx", 0), len(page_map) - 1)]
+        return content_list
+
     def _process_content_list(self, content_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process and validate MinerU output"""
         processed_content = []
@@ -172,50 +293,29 @@ class MineruParser(BaseParser):
         return processed_content
 
 class DoclingParser(BaseParser):
+    def cache_settings(self) -> Dict[str, Any]:
+        return {
+            **super().cache_settings(),
+            "version": package_version("docling"),
+            "images_scale": config.DOCLING_IMAGES_SCALE,
+        }
+
     async def parse_document(self, file_path: str) -> List[Dict[str, Any]]:
-        """Parse document using Docling (fallback implementation)"""
-        
-        # For now, implement a basic fallback that extracts text
-        # This can be enhanced later with actual Docling integration
-        
+        """Parse document with the shared in-process Docling converter"""
+        self.degraded = False
+        if not DOCLING_AVAILABLE:
+            logger.warning("Docling not available, using fallback text extraction")
+            self.degraded = True
+            return await self._fallback_text_extraction(file_path)
+
         try:
-            # Try to use docling if available
-            with tempfile.TemporaryDirectory() as temp_dir:
-                docling_cmd = str(Path(sys.executable).parent / "docling")
-                cmd = [
-                    docling_cmd,
-                    "convert",
-                    file_path,
-                    "--output-dir", temp_dir,
-                    "--output-format", "json"
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    # Read the generated JSON file
-                    output_file = Path(temp_dir) / f"{Path(file_path).stem}.json"
-                    if output_file.exists():
-                        with open(output_file) as f:
-                            raw_content_list = json.load(f)
-                        # Persist assets (images) to stable location
-                        stem = Path(file_path).stem
-                        dest_root = config.get_working_dir() / "assets" / stem
-                        content_list = self._persist_assets(
-                            content_list=raw_content_list,
-                            source_root=Path(temp_dir),
-                            dest_root=dest_root
-                        )
-                        return self._process_content_list(content_list)
-                
-                # Fallback: if docling fails, use a simple text extraction
-                logger.warning("Docling not available, using fallback text extraction")
-                return await self._fallback_text_extraction(file_path)
-                
+            content_list = await convert_document_async(file_path)
+            return self._process_content_list(content_list)
         except Exception as e:
             logger.warning(f"Docling parsing failed: {str(e)}, using fallback")
+            self.degraded = True
             return await self._fallback_text_extraction(file_path)
-    
+
     async def _fallback_text_extraction(self, file_path: str) -> List[Dict[str, Any]]:
         """Fallback text extraction for when Docling is not available"""
         try:
@@ -264,6 +364,11 @@ class DoclingParser(BaseParser):
 
             else:
                 # Try PDF extraction as fallback for other file types
+                if PYMUPDF_AVAILABLE and file_ext == ".pdf":
+                    try:
+                        return (await scan_pdf(file_path, classify=False)).text_items
+                    except Exception as e:
+                        logger.warning(f"PyMuPDF extraction failed for {file_path}, trying PyPDF2: {str(e)}")
                 try:
                     import PyPDF2
 
@@ -311,13 +416,13 @@ class DoclingParser(BaseParser):
             }]
     
     async def _parse_excel_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Minimal Excel parsing fallback using pandas/openpyxl.
+        """Minimal Excel parsing fallback using openpyxl.
         Produces TABLE items by converting sheets to markdown-like text.
         """
         try:
-            import pandas as pd
+            import openpyxl  # noqa: F401
         except Exception as e:
-            logger.warning(f"pandas not available for Excel parsing: {str(e)}")
+            logger.warning(f"openpyxl not available for Excel parsing: {str(e)}")
             return [{
                 "type": ContentType.TEXT,
                 "text": f"Excel file {Path(file_path).name} processed (no table parser available)",
@@ -325,11 +430,16 @@ class DoclingParser(BaseParser):
                 "text_level": 0
             }]
 
+        def collect() -> List[Dict[str, Any]]:
+            content_list: List[Dict[str, Any]] = []
+            for sheet_items in self._iter_excel_items(file_path):
+                content_list.extend(sheet_items)
+            return content_list
+
         try:
-            # Read all sheets without dtype coercion, keep headers
-            sheets = pd.read_excel(file_path, sheet_name=None, engine="openpyxl")
+            return await asyncio.to_thread(collect)
         except Exception as e:
-            logger.warning(f"Failed reading Excel via pandas: {str(e)}")
+            logger.warning(f"Failed reading Excel via openpyxl: {str(e)}")
             return [{
                 "type": ContentType.TEXT,
                 "text": f"Excel file {Path(file_path).name} could not be parsed",
@@ -337,72 +447,68 @@ class DoclingParser(BaseParser):
                 "text_level": 0
             }]
 
-        content_list: List[Dict[str, Any]] = []
-        max_rows_per_chunk = 200
+    def _iter_excel_items(self, file_path: str, max_rows_per_chunk: int = 200):
+        """Stream a workbook row by row, yielding each sheet's table chunks once the sheet is read.
 
-        for sheet_name, df in sheets.items():
-            # Fill NaNs for readability
-            safe_df = df.copy()
-            safe_df = safe_df.where(pd.notnull(safe_df), "")
-
-            total_rows = len(safe_df)
-            if total_rows == 0:
-                table_body = f"Sheet: {sheet_name}\n(Empty sheet)"
-                content_list.append({
-                    "type": ContentType.TABLE,
-                    "table_body": table_body,
-                    "table_caption": [f"Sheet {sheet_name}"],
-                    "table_footnote": [],
-                    "page_idx": 0
-                })
-                continue
+        Only the current chunk's cells are held; finished chunks are kept as text until the
+        sheet's row count is known for their headers.
+        """
+        from openpyxl import load_workbook
 
-            # Chunk by rows
-            for start in range(0, total_rows, max_rows_per_chunk):
-                end = min(start + max_rows_per_chunk, total_rows)
-                chunk_df = safe_df.iloc[start:end]
-
-                # Convert to simple pipe table (limited width)
-                # Cap very long cell text to keep memory reasonable
-                def truncate_cell(val: Any) -> str:
-                    s = str(val)
-                    return (s[:500] + "…") if len(s) > 500 else s
-
-                limited_df = chunk_df.applymap(truncate_cell)
-                # Include headers
-                header = list(limited_df.columns)
-                rows = [header] + limited_df.astype(str).values.tolist()
-
-                # Build markdown-like table
-                def row_to_pipe(r: List[str]) -> str:
-                    return "| " + " | ".join(r) + " |"
-
-                table_lines = []
-                if header:
-                    table_lines.append(row_to_pipe([str(h) for h in header]))
-                    table_lines.append("| " + " | ".join(["---"] * len(header)) + " |")
-                    for r in limited_df.astype(str).values.tolist():
-                        table_lines.append(row_to_pipe([str(c) for c in r]))
-                else:
-                    # No headers
-                    for r in rows:
-                        table_lines.append(row_to_pipe([str(c) for c in r]))
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet_name in workbook.sheetnames:
+                sheet = workbook[sheet_name]
+                if not hasattr(sheet, "iter_rows"):
+                    continue  # chartsheet
+
+                rows = sheet.iter_rows(values_only=True)
+                header: Optional[List[str]] = None
+                chunks: List[tuple] = []  # (first row, last row, pipe lines)
+                pending: List[tuple] = []
+                total_rows = 0
+
+                for values in rows:
+                    if header is None:
+                        if any(value is not None for value in values):
+                            header = [
+                                excel_cell_text(value) or f"Unnamed: {i}" for i, value in enumerate(values)
+                            ]
+                        continue
+                    if not any(value is not None and value != "" for value in values):
+                        continue
+                    pending.append(values)
+                    total_rows += 1
+                    if len(pending) == max_rows_per_chunk:
+                        chunks.append((total_rows - len(pending) + 1, total_rows, _pipe_rows(pending, len(header))))
+                        pending = []
+                if pending:
+                    chunks.append((total_rows - len(pending) + 1, total_rows, _pipe_rows(pending, len(header))))
+
+                if header is None or total_rows == 0:
+                    yield [{
+                        "type": ContentType.TABLE,
+                        "table_body": f"Sheet: {sheet_name}\n(Empty sheet)",
+                        "table_caption": [f"Sheet {sheet_name}"],
+                        "table_footnote": [],
+                        "page_idx": 0
+                    }]
+                    continue
 
-                table_body = (
-                    f"Sheet: {sheet_name} (rows {start + 1}-{end} of {total_rows})\n" +
-                    "\n".join(table_lines)
+                header_lines = (
+                    "| " + " | ".join(header) + " |\n"
+                    + "| " + " | ".join(["---"] * len(header)) + " |\n"
                 )
-
-                content_list.append({
+                yield [{
                     "type": ContentType.TABLE,
-                    "table_body": table_body,
+                    "table_body": f"Sheet: {sheet_name} (rows {first}-{last} of {total_rows})\n" + header_lines + lines,
                     "table_caption": [f"Sheet {sheet_name}"],
                     "table_footnote": [],
                     "page_idx": 0
-                })
+                } for first, last, lines in chunks]
+        finally:
+            workbook.close()
 
-        return content_list
-    
     def _process_content_list(self, content_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process and validate content list (same as MineruParser)"""
         processed_content = []
@@ -440,7 +546,8 @@ class DoclingParser(BaseParser):
                 elif content_type == ContentType.EQUATION and self.config["enable_equations"]:
                     processed_content.append(
                         EquationContent(
-                            equation=item.get("equation", ""),
+                            latex=item.get("latex", ""),
+                            text=item.get("text", ""),
                             page_idx=item.get("page_idx", 0)
                         ).dict()
                     )
@@ -451,6 +558,160 @@ class DoclingParser(BaseParser):
         
         return processed_content
 
+class XlsxParser(BaseParser):
+    """Native .xlsx parser: streams cells with openpyxl read-only mode, no PDF conversion"""
+
+    def cache_settings(self) -> Dict[str, Any]:
+        return {
+            **super().cache_settings(),
+            "version": package_version("openpyxl"),
+            "chunk_rows": config.XLSX_CHUNK_ROWS,
+            "max_cell_chars": config.XLSX_MAX_CELL_CHARS,
+            "extract_media": config.XLSX_EXTRACT_MEDIA,
+        }
+
+    async def parse_document(self, file_path: str) -> List[Dict[str, Any]]:
+        """Parse workbook sheets into text/table items plus embedded images and charts"""
+        return await asyncio.to_thread(self._parse_workbook, file_path)
+
+    def _parse_workbook(self, file_path: str) -> List[Dict[str, Any]]:
+        from openpyxl import load_workbook
+        from .xlsx_package import read_package_drawings
+
+        drawings = {}
+        if config.XLSX_EXTRACT_MEDIA:
+            try:
+                drawings = read_package_drawings(file_path)
+            except Exception as e:
+                logger.warning(f"[XLSX] Failed to read drawings from {file_path}: {str(e)}")
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        content_list: List[Dict[str, Any]] = []
+        try:
+            # Each sheet is treated as a page so context lookups stay within a sheet
+            for sheet_idx, sheet_name in enumerate(workbook.sheetnames):
+                sheet = workbook[sheet_name]
+                if hasattr(sheet, "iter_rows"):
+                    content_list.extend(self._parse_sheet(sheet, sheet_name, sheet_idx))
+                content_list.extend(
+                    self._drawing_items(file_path, sheet_name, sheet_idx, drawings.get(sheet_name, []))
+                )
+        finally:
+            workbook.close()
+
+        logger.info(f"[XLSX] Parsed {len(workbook.sheetnames)} sheet(s) into {len(content_list)} item(s): {file_path}")
+        return content_list
+
+    def _parse_sheet(self, sheet, sheet_name: str, sheet_idx: int) -> List[Dict[str, Any]]:
+        """Split a sheet into regions separated by blank rows, streaming row by row"""
+        items: List[Dict[str, Any]] = []
+        region: List[tuple] = []  # (row number, cell texts)
+
+        for row_number, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+            cells = [excel_cell_text(value) for value in values]
+            if any(cells):
+                region.append((row_number, cells))
+            elif region:
+                items.extend(self._region_items(region, sheet_name, sheet_idx))
+                region = []
+        if region:
+            items.extend(self._region_items(region, sheet_name, sheet_idx))
+
+        return items
+
+    def _region_items(self, region: List[tuple], sheet_name: str, sheet_idx: int) -> List[Dict[str, Any]]:
+        """One region becomes text (titles, notes) or one or more table items"""
+        from openpyxl.utils import get_column_letter
+
+        first_col = min(next(i for i, cell in enumerate(cells) if cell) for _, cells in region)
+        last_col = max(max(i for i, cell in enumerate(cells) if cell) for _, cells in region)
+        rows = [cells[first_col:last_col + 1] + [""] * (last_col + 1 - len(cells)) for _, cells in region]
+
+        if len(rows) == 1 or first_col == last_col:
+            text = "\n".join(" ".join(cell for cell in row if cell) for row in rows)
+            return [TextContent(text=text.replace("\\|", "|"), text_level=0, page_idx=sheet_idx).dict()]
+
+        cell_range = f"{get_column_letter(first_col + 1)}{region[0][0]}:{get_column_letter(last_col + 1)}{region[-1][0]}"
+        header = [cell or f"Column {get_column_letter(first_col + 1 + i)}" for i, cell in enumerate(rows[0])]
+        data_rows = rows[1:]
+        total_rows = len(data_rows)
+        chunk_rows = config.XLSX_CHUNK_ROWS
+
+        items = []
+        for start in range(0, total_rows, chunk_rows):
+            end = min(start + chunk_rows, total_rows)
+            table_lines = [
+                "| " + " | ".join(header) + " |",
+                "| " + " | ".join(["---"] * len(header)) + " |",
+            ] + ["| " + " | ".join(row) + " |" for row in data_rows[start:end]]
+            items.append(TableContent(
+                table_body=f"Sheet: {sheet_name} (rows {start + 1}-{end} of {total_rows})\n" + "\n".join(table_lines),
+                table_caption=[f"Sheet {sheet_name} {cell_range}"],
+                table_footnote=[],
+                page_idx=sheet_idx
+            ).dict())
+        return items
+
+    def _drawing_items(self, file_path: str, sheet_name: str, sheet_idx: int, objects: List[Any]) -> List[Dict[str, Any]]:
+        """Persist embedded images and turn chart caches into table items"""
+        from openpyxl.utils import get_column_letter
+        import zipfile
+
+        items: List[Dict[str, Any]] = []
+        if not objects:
+            return items
+
+        with zipfile.ZipFile(file_path) as zf:
+            for obj in objects:
+                anchor = f"Sheet {sheet_name}, cell {get_column_letter(obj.col + 1)}{obj.row + 1}"
+                if obj.kind == "image":
+                    if not self.config["enable_images"]:
+                        continue
+                    try:
+                        target = store_asset_bytes(zf.read(obj.part), Path(obj.part).suffix)
+                    except Exception as e:
+                        logger.warning(f"[XLSX] Failed to extract image {obj.part}: {str(e)}")
+                        continue
+                    items.append(ImageContent(
+                        img_path=str(target),
+                        image_caption=[obj.description or obj.name] if (obj.description or obj.name) else [],
+                        image_footnote=[anchor],
+                        page_idx=sheet_idx
+                    ).dict())
+                else:
+                    items.append(self._chart_item(obj, anchor, sheet_idx))
+        return items
+
+    def _chart_item(self, obj: Any, anchor: str, sheet_idx: int) -> Dict[str, Any]:
+        """A chart's cached series as a table, or a text note if it has no cached data"""
+        chart = obj.chart or {}
+        title = chart.get("title") or obj.name or "Untitled chart"
+        chart_type = chart.get("chart_type") or "chart"
+        series = [s for s in chart.get("series", []) if s["values"]]
+        if not series or not self.config["enable_tables"]:
+            return TextContent(
+                text=f"Chart: {title} ({chart_type}) on {anchor}", text_level=0, page_idx=sheet_idx
+            ).dict()
+
+        categories = chart.get("categories") or []
+        length = max(len(categories), *(len(s["values"]) for s in series))
+        header = ["Category"] + [s["name"] for s in series]
+        table_lines = [
+            "| " + " | ".join(header) + " |",
+            "| " + " | ".join(["---"] * len(header)) + " |",
+        ]
+        for i in range(length):
+            row = [categories[i] if i < len(categories) else str(i + 1)]
+            row += [s["values"][i] if i < len(s["values"]) else "" for s in series]
+            table_lines.append("| " + " | ".join(row) + " |")
+
+        return TableContent(
+            table_body="\n".join(table_lines),
+            table_caption=[f"Chart: {title} ({chart_type})"],
+            table_footnote=[anchor],
+            page_idx=sheet_idx
+        ).dict()
+
 class ParserFactory:
     @staticmethod
     def get_parser(parser_type: Optional[str] = None) -> BaseParser:
@@ -461,9 +722,18 @@ class ParserFactory:
             return MineruParser()
         elif parser_type.lower() == "docling":
             return DoclingParser()
+        elif parser_type.lower() == "xlsx":
+            return XlsxParser()
         else:
             raise ValueError(f"Unsupported parser type: {parser_type}")
 
+    @staticmethod
+    def native_parser_for(file_path: str, parser_type: Optional[str] = None) -> Optional[str]:
+        """Parser configured for this file type in FILE_TYPE_PARSERS, unless a parser was requested"""
+        if parser_type and parser_type.lower() != "auto":
+            return None
+        return config.FILE_TYPE_PARSERS.get(Path(file_path).suffix.lower())
+
     @staticmethod
     async def parse_document(file_path: str, parser_type: Optional[str] = None, ingest_summary: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Parse document using appropriate parser"""
@@ -472,9 +742,13 @@ class ParserFactory:
         # Auto-select parser based on file type (following RAG-Anything template)
         file_ext = Path(file_path).suffix.lower()
 
+        # File types with a native parser skip conversion and layout analysis
+        native_parser = ParserFactory.native_parser_for(file_path, parser_type)
+        if native_parser:
+            parser_type = native_parser
         # For Office documents (Excel, Word, PowerPoint), prefer MinerU
         # MinerU handles Office documents natively with full content extraction
-        if file_ext in ['.xlsx', '.xls', '.docx', '.doc', '.pptx', '.ppt']:
+        elif file_ext in ['.xlsx', '.xls', '.docx', '.doc', '.pptx', '.ppt']:
             if not parser_type or parser_type.lower() == "auto":
                 parser_type = "mineru"  # MinerU is better for Office docs
         elif file_ext in ['.pdf']:
@@ -487,6 +761,40 @@ class ParserFactory:
 
         # Get the appropriate parser
         parser = ParserFactory.get_parser(parser_type)
+
+        # Reuse an earlier parse of the same file with the same parser settings
+        cache = get_parse_cache()
+        cache_key = None
+        if cache is not None:
+            try:
+                cache_key = await cached_parse_key(file_path, parser.cache_settings())
+                cached = await asyncio.to_thread(cache.get, cache_key)
+            except Exception as e:
+                logger.warning(f"Parse cache lookup failed for {file_path}: {str(e)}")
+                cached = None
+            if cached is not None:
+                logger.info(f"Parse cache hit for {file_path} ({cached.parser_used}, {len(cached.content_list)} items)")
+                if ingest_summary is not None:
+                    ingest_summary['parser_used'] = cached.parser_used
+                    ingest_summary['parse_cache'] = 'hit'
+                return cached.content_list
+
+        summary = ingest_summary if ingest_summary is not None else {}
+        result = await ParserFactory._parse_with_fallback(parser, file_path, summary)
+        # Only cache what the keyed parser produced: a fallback after a transient failure
+        # (MinerU timeout, pool crash) must not stop later ingests from retrying it
+        primary_parser = parser.__class__.__name__.replace('Parser', '').lower()
+        if cache_key and result and summary.get('parser_used') == primary_parser:
+            try:
+                await asyncio.to_thread(cache.put, cache_key, result, summary['parser_used'])
+                summary['parse_cache'] = 'stored'
+            except Exception as e:
+                logger.warning(f"Failed to store parse result for {file_path}: {str(e)}")
+        return result
+
+    @staticmethod
+    async def _parse_with_fallback(parser: BaseParser, file_path: str, ingest_summary: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Run the primary parser, then the alternative parser, then basic text extraction"""
         actual_parser_used = parser.__class__.__name__.replace('Parser', '').lower()
 
         # Track parser usage in summary if provided
@@ -497,6 +805,8 @@ class ParserFactory:
         try:
             result = await parser.parse_document(file_path)
             if result:  # If we got meaningful content, return it
+                if parser.degraded and ingest_summary is not None:
+                    ingest_summary['parser_used'] = 'fallback text extraction'
                 return result
         except Exception as e:
             logger.warning(f"Primary parser {parser.__class__.__name__} failed for {file_path}: {str(e)}")
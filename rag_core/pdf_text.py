@@ -0,0 +1,183 @@
+from typing import Dict, Any, List, NamedTuple, Optional
+import logging
+import asyncio
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .config import config
+from .schemas import ContentType
+
+logger = logging.getLogger(__name__)
+
+PYMUPDF_AVAILABLE = importlib.util.find_spec("fitz") is not None
+
+class PageScan(NamedTuple):
+    page_idx: int
+    text_layer: bool  # Usable text layer: extract directly instead of OCR
+    reason: str  # Why the page needs OCR/layout analysis, empty for text pages
+    items: List[Dict[str, Any]]
+
+class PdfScan(NamedTuple):
+    page_count: int
+    text_items: List[Dict[str, Any]]  # Items extracted from text-layer pages, in page order
+    ocr_pages: List[int]  # Pages to send to MinerU
+
+def scan_settings() -> Dict[str, Any]:
+    """Page classification thresholds (also part of the parse cache key)"""
+    return {
+        "min_chars": config.PDF_TEXT_MIN_CHARS,
+        "max_image_coverage": config.PDF_TEXT_MAX_IMAGE_COVERAGE,
+        "min_figure_area": config.PDF_TEXT_MIN_FIGURE_AREA,
+        "max_table_rows": config.PDF_TEXT_MAX_TABLE_ROWS,
+        "max_drawings": config.PDF_TEXT_MAX_DRAWINGS,
+        "max_garbled_ratio": config.PDF_TEXT_MAX_GARBLED_RATIO,
+    }
+
+def _garbled_ratio(text: str) -> float:
+    """Share of replacement/control characters, high for broken font encodings"""
+    if not text:
+        return 0.0
+    bad = sum(1 for ch in text if ch == "�" or (ord(ch) < 32 and ch not in "\n\t\r"))
+    return bad / len(text)
+
+def _page_blocks(text_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Text blocks in reading order with their largest font size"""
+    blocks = []
+    for block in text_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        lines, sizes = [], []
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if spans:
+                lines.append("".join(span["text"] for span in line["spans"]).strip())
+                sizes.extend((span["size"], len(span["text"])) for span in spans)
+        if lines:
+            blocks.append({"text": "\n".join(lines), "sizes": sizes})
+    return blocks
+
+def _body_font_size(blocks: List[Dict[str, Any]]) -> float:
+    """Font size covering the most characters on the page"""
+    counts: Dict[float, int] = {}
+    for block in blocks:
+        for size, chars in block["sizes"]:
+            counts[round(size, 1)] = counts.get(round(size, 1), 0) + chars
+    return max(counts, key=counts.get) if counts else 0.0
+
+def _table_rows(text_dict: Dict[str, Any]) -> int:
+    """Rows where three or more separate text segments share a line: column-aligned (borderless) tables"""
+    rows: Dict[int, int] = {}
+    for block in text_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            # Wide gaps inside one line also separate cells
+            segments = 1 + sum(
+                1 for left, right in zip(spans, spans[1:])
+                if right["bbox"][0] - left["bbox"][2] > 2 * left["size"]
+            )
+            row = round(line["bbox"][3] / 2)
+            rows[row] = rows.get(row, 0) + segments
+    return sum(1 for segments in rows.values() if segments >= 3)
+
+def scan_page(page, page_idx: int, settings: Dict[str, Any], classify: bool = True) -> PageScan:
+    """Decide whether a page has a usable text layer and extract its text blocks if so.
+
+    Pages with figures or tables go to MinerU so those become IMAGE/TABLE items.
+    """
+    text_dict = page.get_text("dict", sort=True)
+    blocks = _page_blocks(text_dict)
+    text = "\n".join(block["text"] for block in blocks)
+
+    if classify:
+        page_area = abs(page.rect) or 1.0
+        image_areas = [abs(page.rect & info["bbox"]) for info in page.get_image_info()]
+        if len(text.strip()) < settings["min_chars"]:
+            return PageScan(page_idx, False, "no text layer", [])
+        if sum(image_areas) / page_area > settings["max_image_coverage"]:
+            return PageScan(page_idx, False, "images", [])
+        # A single embedded figure needs layout analysis and vision, however small its share
+        if any(area / page_area >= settings["min_figure_area"] for area in image_areas):
+            return PageScan(page_idx, False, "figure", [])
+        if _garbled_ratio(text) > settings["max_garbled_ratio"]:
+            return PageScan(page_idx, False, "garbled text", [])
+        # Many vector paths usually mean ruled tables, charts or diagrams
+        if len(page.get_drawings()) > settings["max_drawings"]:
+            return PageScan(page_idx, False, "vector graphics", [])
+        if _table_rows(text_dict) > settings["max_table_rows"]:
+            return PageScan(page_idx, False, "table layout", [])
+
+    body_size = _body_font_size(blocks)
+    items = []
+    for block in blocks:
+        block_size = max(size for size, _ in block["sizes"])
+        is_heading = body_size and block_size >= body_size * 1.25 and len(block["text"]) <= 200
+        items.append({
+            "type": ContentType.TEXT,
+            "text": block["text"],
+            "text_level": 1 if is_heading else 0,
+            "page_idx": page_idx,
+        })
+    return PageScan(page_idx, True, "", items)
+
+def scan_pages(pdf_path: str, start: int, end: int, settings: Dict[str, Any], classify: bool = True) -> List[PageScan]:
+    """Scan pages [start, end) of a PDF (runs in a worker process)"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return [scan_page(doc.load_page(page_idx), page_idx, settings, classify) for page_idx in range(start, end)]
+
+def page_count(pdf_path: str) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=config.PDF_TEXT_WORKERS or config.get_cpu_share(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+async def scan_pdf(pdf_path: str, classify: bool = True) -> PdfScan:
+    """Classify every page and extract text-layer pages, in a process pool for large PDFs"""
+    count = await asyncio.to_thread(page_count, pdf_path)
+    settings = scan_settings()
+
+    if count < config.PDF_TEXT_POOL_MIN_PAGES:
+        pages = await asyncio.to_thread(scan_pages, pdf_path, 0, count, settings, classify)
+    else:
+        workers = config.PDF_TEXT_WORKERS or config.get_cpu_share()
+        batch = max(8, -(-count // (workers * 2)))
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(*(
+            loop.run_in_executor(_get_executor(), scan_pages, pdf_path, start, min(start + batch, count), settings, classify)
+            for start in range(0, count, batch)
+        ))
+        pages = [page for pages_batch in batches for page in pages_batch]
+
+    reasons: Dict[str, int] = {}
+    for page in pages:
+        if not page.text_layer:
+            reasons[page.reason] = reasons.get(page.reason, 0) + 1
+    ocr_pages = [page.page_idx for page in pages if not page.text_layer]
+    logger.info(
+        f"[PDF TEXT] {pdf_path}: {count - len(ocr_pages)}/{count} page(s) with a text layer"
+        + (f", OCR needed for {reasons}" if reasons else "")
+    )
+    return PdfScan(count, [item for page in pages for item in page.items], ocr_pages)
+
+def shutdown_pdf_text_pool():
+    """Stop the page-scan worker processes"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
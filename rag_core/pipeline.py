@@ -1,24 +1,37 @@
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 import logging
 import asyncio
 from pathlib import Path
 import time
 import json
 import hashlib
-import base64
+import shutil
+import copy
 from lightrag.lightrag import LightRAG
 from .config import config
 from .parsers import ParserFactory
+from .conversion.excel_to_pdf import convert_excel_to_pdf, needs_conversion
 from .processors import ContentSeparator
-from .llm_unified import UnifiedLLM
+from .context_extractor import ContextIndex
+from .llm_unified import UnifiedLLM, llm_usage_scope, make_lightrag_model_func, bind_usage_scope, is_transient_llm_error
 from .schemas import ProcessingStatus, DocumentMetadata
 from .utils import VectorIndex, ChunkManager, DocumentRegistry
 from .storage import StorageManager
+from .index_writer import IndexWriter
+from .image_hashing import ImageDedupIndex, image_fingerprint
+from .image_prep import image_preparer
+from .table_profile import build_table_prompt
+from .table_store import TableStore
+from .checkpoints import StageCheckpoints
+from .parse_cache import file_sha256
 
 logger = logging.getLogger(__name__)
 
 class RAGPipeline:
-    def __init__(self):
+    # Set by the ingest worker to mirror progress into the job queue
+    status_callback: Optional[Callable[[ProcessingStatus], Awaitable[None]]] = None
+
+    def __init__(self, index_writer=None):
         self.config = config
         self.llm = UnifiedLLM()
         self.lightrag = None
@@ -30,8 +43,12 @@ class RAGPipeline:
                     "LightRAG initialization failed, falling back to legacy pipeline",
                     exc_info=exc,
                 )
+        # All LightRAG writes go through here; worker processes pass a RemoteIndexWriter
+        self.index_writer = None
+        if self.lightrag:
+            self.index_writer = index_writer or IndexWriter(self.lightrag)
         self.content_separator = ContentSeparator()
-        self.storage_manager = StorageManager(self.lightrag)
+        self.storage_manager = StorageManager(self.lightrag, self.index_writer)
 
         # Create working directories
         self.working_dir = config.get_working_dir()
@@ -42,6 +59,20 @@ class RAGPipeline:
         for dir_path in [self.chunks_dir, self.vectors_dir, self.kv_dir]:
             dir_path.mkdir(parents=True, exist_ok=True)
 
+        # Cross-document perceptual hash index for reusing image analyses
+        self.image_dedup: Optional[ImageDedupIndex] = None
+        if self.config.IMAGE_DEDUP_ENABLED:
+            self.image_dedup = ImageDedupIndex(
+                self.kv_dir / "image_hashes.json",
+                self.config.IMAGE_DEDUP_MAX_DISTANCE,
+                self.config.IMAGE_DEDUP_MAX_ENTRIES
+            )
+
+        # Typed table data for answering aggregate questions without the LLM
+        self.table_store: Optional[TableStore] = None
+        if self.config.TABLE_STORE_ENABLED:
+            self.table_store = TableStore(self.kv_dir / "tables.sqlite")
+
         # Initialize storage components
         self.vector_index: Optional[VectorIndex] = None
         if not self.lightrag:
@@ -74,8 +105,7 @@ class RAGPipeline:
             # Set the API key in environment for LightRAG
             os.environ["OPENAI_API_KEY"] = self.config.OPENAI_API_KEY
 
-            # Import LightRAG's OpenAI functions and utilities
-            from lightrag.llm.openai import gpt_4o_mini_complete
+            # Import LightRAG utilities
             from lightrag.utils import EmbeddingFunc
 
             # Create a proper EmbeddingFunc instance with our fixed implementation
@@ -112,12 +142,16 @@ class RAGPipeline:
                 working_dir=str(working_dir),
                 chunk_token_size=processing_config["chunk_size"],
                 chunk_overlap_token_size=processing_config["chunk_overlap"],
-                llm_model_func=gpt_4o_mini_complete,
-                llm_model_name=model_config["llm_model"],
+                # Indexing-time entity extraction runs on the extract tier;
+                # queries override this with the answer tier via QueryParam.model_func
+                llm_model_func=make_lightrag_model_func("extract"),
+                llm_model_name=self.config.get_llm_task_config("extract")["model"],
                 tiktoken_model_name=model_config["embedding_model"],
                 embedding_func=embedding_func,
                 **lr_config,
             )
+            # Charge indexing calls to the document that made them (ingest_summary['llm_usage'])
+            lightrag.llm_model_func = bind_usage_scope(lightrag.llm_model_func)
 
             # Initialize storages in a new event loop to avoid conflicts
             import threading
@@ -151,10 +185,25 @@ class RAGPipeline:
         self,
         file_path: str,
         task_id: str,
-        parser_type: Optional[str] = None
+        parser_type: Optional[str] = None,
+        file_hash: Optional[str] = None
     ) -> ProcessingStatus:
         """Process document through the complete pipeline"""
 
+        # Scope LLM usage counters to this document
+        with llm_usage_scope() as llm_usage:
+            return await self._process_document(file_path, task_id, parser_type, llm_usage, file_hash)
+
+    async def _process_document(
+        self,
+        file_path: str,
+        task_id: str,
+        parser_type: Optional[str],
+        llm_usage,
+        file_hash: Optional[str] = None
+    ) -> ProcessingStatus:
+        """Run the pipeline stages for a single document"""
+
         # Initialize ingest summary for tracking
         ingest_summary = {
             'parser_used': None,
@@ -163,6 +212,8 @@ class RAGPipeline:
             'warnings': {}
         }
 
+        converted_path: Optional[Path] = None
+        checkpoints: Optional[StageCheckpoints] = None
         try:
             # Update status
             status = ProcessingStatus(
@@ -170,117 +221,229 @@ class RAGPipeline:
                 status="processing",
                 progress=0.0
             )
+
+            # Resume after the stages a previous attempt completed
+            if self.config.CHECKPOINTS_ENABLED:
+                checkpoints = StageCheckpoints(task_id, file_hash or await asyncio.to_thread(file_sha256, file_path))
+                status.stages_done = checkpoints.completed()
+                if status.stages_done:
+                    logger.info(f"Resuming task_id={task_id} after stages: {', '.join(status.stages_done)}")
+                    ingest_summary.update(checkpoints.last_ingest_summary() or {})
+                    ingest_summary['resumed_after'] = status.stages_done[-1]
             await self._update_status(status)
 
+            # Per-stage wall time; text indexing and multimodal analysis overlap, so the
+            # document takes about max() of the two rather than their sum
+            stage_timings = ingest_summary.setdefault('stage_timings', {})
+            stage_started: Dict[str, float] = {}
+            running: List[str] = []
+
+            async def start_stage(stage: str):
+                stage_started[stage] = time.time()
+                running.append(stage)
+                status.stage = "+".join(running)
+                await self._update_status(status)
+
+            async def complete_stage(stage: str, data: Any = None):
+                stage_timings[stage] = round(time.time() - stage_started.pop(stage), 3)
+                running.remove(stage)
+                status.stage = "+".join(running) or None
+                if checkpoints is not None:
+                    # Snapshot on the loop: the concurrent stage keeps updating ingest_summary
+                    await asyncio.to_thread(checkpoints.save, stage, data, copy.deepcopy(ingest_summary))
+                    status.stages_done = checkpoints.completed()
+
+            # 0. Convert Office documents without a native parser to PDF
+            if needs_conversion(file_path) and not ParserFactory.native_parser_for(file_path, parser_type):
+                if checkpoints is not None and checkpoints.done("convert") and Path(checkpoints.load("convert")).exists():
+                    file_path = checkpoints.load("convert")
+                else:
+                    await start_stage("convert")
+                    file_path = await self._convert_document(file_path, ingest_summary)
+                    if checkpoints is not None:
+                        # Keep the PDF with the checkpoints so a retry can skip conversion
+                        kept_path = checkpoints.path(Path(file_path).name)
+                        shutil.move(file_path, kept_path)
+                        file_path = str(kept_path)
+                    else:
+                        converted_path = Path(file_path)
+                    await complete_stage("convert", file_path)
+
             # 1. Parse document
-            logger.info(f"Parsing document: {file_path}")
-            content_list = await ParserFactory.parse_document(file_path, parser_type, ingest_summary)
+            if checkpoints is not None and checkpoints.done("parse"):
+                content_list = await asyncio.to_thread(checkpoints.load, "parse")
+            else:
+                await start_stage("parse")
+                logger.info(f"Parsing document: {file_path}")
+                content_list = await ParserFactory.parse_document(file_path, parser_type, ingest_summary)
+                await complete_stage("parse", content_list)
             status.progress = 0.2
             await self._update_status(status)
             
             # 2. Separate content
-            logger.info("Separating content")
-            full_text, multimodal_items, summary = await self.content_separator.process_document_content(
-                content_list, task_id
-            )
+            if checkpoints is not None and checkpoints.done("separate"):
+                full_text, multimodal_items, summary = await asyncio.to_thread(checkpoints.load, "separate")
+            else:
+                await start_stage("separate")
+                logger.info("Separating content")
+                full_text, multimodal_items, summary = await self.content_separator.process_document_content(
+                    content_list, task_id
+                )
+                ingest_summary['image_triage'] = summary.get('image_triage', {})
+                await self._hash_images(multimodal_items, ingest_summary)
+                await self._store_tables(multimodal_items, task_id, ingest_summary)
+                await complete_stage("separate", [full_text, multimodal_items, summary])
+            # Page index over the full content list, built once for all multimodal items
+            context_index = self.content_separator.processor.context_extractor.build_index(content_list)
             status.progress = 0.4
             await self._update_status(status)
             
             # 3. Process text with LightRAG
-            logger.info("Processing text content")
-            text_chunks_created, text_entities_found = await self._process_text_content(
-                full_text,
-                task_id,
-                file_path,
-                ingest_summary
-            )
-            status.progress = 0.6
-            await self._update_status(status)
-            
-            # 4. Process multimodal content
-            logger.info("Processing multimodal content")
-            if self.lightrag:
-                multimodal_chunks_created, multimodal_entities_found = await self._process_multimodal_content_lightrag(
-                    multimodal_items,
-                    task_id,
-                    file_path,
-                    ingest_summary
-                )
-            else:
-                multimodal_chunks_created, multimodal_entities_found = await self._process_multimodal_content(
-                    multimodal_items,
+            async def index_text() -> Tuple[int, int]:
+                if checkpoints is not None and checkpoints.done("text_index"):
+                    return tuple(checkpoints.load("text_index"))
+                await start_stage("text_index")
+                logger.info("Processing text content")
+                counts = await self._process_text_content(
+                    full_text,
                     task_id,
                     file_path,
                     ingest_summary
                 )
+                await complete_stage("text_index", list(counts))
+                # Multimodal items move progress 0.6 -> 0.8 as they finish
+                status.progress = max(status.progress, 0.6)
+                await self._update_status(status)
+                return counts
+
+            # 4. Process multimodal content (per-item results are checkpointed as they finish)
+            async def analyze_multimodal() -> Tuple[int, int]:
+                if checkpoints is not None and checkpoints.done("multimodal"):
+                    return tuple(checkpoints.load("multimodal"))
+                await start_stage("multimodal")
+                logger.info("Processing multimodal content")
+                try:
+                    if self.lightrag:
+                        counts = await self._process_multimodal_content_lightrag(
+                            multimodal_items,
+                            task_id,
+                            file_path,
+                            ingest_summary,
+                            status,
+                            context_index,
+                            checkpoints
+                        )
+                    else:
+                        counts = await self._process_multimodal_content(
+                            multimodal_items,
+                            task_id,
+                            file_path,
+                            ingest_summary,
+                            status,
+                            context_index,
+                            checkpoints
+                        )
+                finally:
+                    # Analyses of the items that did finish are reusable either way
+                    if self.image_dedup:
+                        self.image_dedup.save()
+                await complete_stage("multimodal", list(counts))
+                return counts
+
+            # Both are dominated by network waits, so run them concurrently. Let both finish
+            # (and checkpoint) even if one fails, so a retry only redoes the failed one
+            overlap_start = time.time()
+            text_result, multimodal_result = await asyncio.gather(
+                index_text(), analyze_multimodal(), return_exceptions=True
+            )
+            for result in (text_result, multimodal_result):
+                if isinstance(result, BaseException):
+                    raise result
+            text_chunks_created, text_entities_found = text_result
+            multimodal_chunks_created, multimodal_entities_found = multimodal_result
+            stage_timings['text_and_multimodal'] = round(time.time() - overlap_start, 3)
             status.progress = 0.8
             await self._update_status(status)
             
-            # 5. Create document metadata
-            metadata = DocumentMetadata(
-                doc_id=task_id,
-                file_path=str(file_path),
-                file_type=Path(file_path).suffix,
-                total_pages=summary["structure"]["total_pages"],
-                processed_at=time.time(),
-                chunks_count=await self._count_chunks(task_id),
-                entities_count=await self._count_entities_lightrag(task_id) if self.lightrag else len(await self._get_entities(task_id))
-            )
-            await self._save_metadata(metadata)
-
-            # 6. Store document in graph database
-            try:
-                await self.storage_manager.store_document(
+            if checkpoints is not None and checkpoints.done("graph"):
+                metadata = DocumentMetadata(**checkpoints.load("graph"))
+            else:
+                await start_stage("graph")
+                # 5. Create document metadata
+                metadata = DocumentMetadata(
                     doc_id=task_id,
                     file_path=str(file_path),
-                    metadata={
-                        "file_type": Path(file_path).suffix,
-                        "total_pages": summary["structure"]["total_pages"],
-                        "chunks_count": await self._count_chunks(task_id),
-                        "entities_count": await self._count_entities_lightrag(task_id) if self.lightrag else len(await self._get_entities(task_id)),
-                        "processed_at": time.time()
-                    }
+                    file_type=Path(file_path).suffix,
+                    total_pages=summary["structure"]["total_pages"],
+                    processed_at=time.time(),
+                    chunks_count=await self._count_chunks(task_id),
+                    entities_count=await self._count_entities_lightrag(task_id) if self.lightrag else len(await self._get_entities(task_id))
                 )
-            except Exception as e:
-                error_msg = f"Graph database storage failed: {str(e)}"
-                logger.warning(error_msg)
-                ingest_summary['storage_issues'].append(error_msg)
-                if 'errors' not in ingest_summary:
-                    ingest_summary['errors'] = {}
-                ingest_summary['errors']['Graph database storage failed'] = ingest_summary['errors'].get('Graph database storage failed', 0) + 1
+                await self._save_metadata(metadata)
 
-            # 7. Find and create relationships between entities
-            logger.info("Creating entity relationships")
-            try:
-                if self.lightrag:
-                    await self._build_cross_modal_relationships_lightrag(task_id, ingest_summary)
-                else:
-                    await self.storage_manager.find_entity_relationships(task_id)
-            except Exception as e:
-                error_msg = f"Entity relationship creation failed: {str(e)}"
-                logger.warning(error_msg)
-                ingest_summary['storage_issues'].append(error_msg)
-                if 'errors' not in ingest_summary:
-                    ingest_summary['errors'] = {}
-                ingest_summary['errors']['Entity relationship creation failed'] = ingest_summary['errors'].get('Entity relationship creation failed', 0) + 1
+                # 6. Store document in graph database
+                try:
+                    await self.storage_manager.store_document(
+                        doc_id=task_id,
+                        file_path=str(file_path),
+                        metadata={
+                            "file_type": Path(file_path).suffix,
+                            "total_pages": summary["structure"]["total_pages"],
+                            "chunks_count": await self._count_chunks(task_id),
+                            "entities_count": await self._count_entities_lightrag(task_id) if self.lightrag else len(await self._get_entities(task_id)),
+                            "processed_at": time.time()
+                        }
+                    )
+                except Exception as e:
+                    error_msg = f"Graph database storage failed: {str(e)}"
+                    logger.warning(error_msg)
+                    ingest_summary['storage_issues'].append(error_msg)
+                    if 'errors' not in ingest_summary:
+                        ingest_summary['errors'] = {}
+                    ingest_summary['errors']['Graph database storage failed'] = ingest_summary['errors'].get('Graph database storage failed', 0) + 1
+
+                # 7. Find and create relationships between entities
+                logger.info("Creating entity relationships")
+                try:
+                    if self.lightrag:
+                        await self._build_cross_modal_relationships_lightrag(task_id, ingest_summary)
+                    else:
+                        await self.storage_manager.find_entity_relationships(task_id)
+                except Exception as e:
+                    error_msg = f"Entity relationship creation failed: {str(e)}"
+                    logger.warning(error_msg)
+                    ingest_summary['storage_issues'].append(error_msg)
+                    if 'errors' not in ingest_summary:
+                        ingest_summary['errors'] = {}
+                    ingest_summary['errors']['Entity relationship creation failed'] = ingest_summary['errors'].get('Entity relationship creation failed', 0) + 1
+                await complete_stage("graph", metadata.dict())
 
             # 8. Register document in document registry for API access
+            await start_stage("register")
             await self._register_document(metadata)
+            await complete_stage("register")
 
             # Update final status
             status.status = "completed"
+            status.stage = None
             status.progress = 1.0
             status.doc_id = task_id
             status.chunks_created = metadata.chunks_count
             status.entities_found = await self._count_entities_lightrag(task_id) if self.lightrag else len(await self._get_entities(task_id))
             await self._update_status(status)
 
+            ingest_summary['llm_usage'] = llm_usage.snapshot()
+
             # Log final ingest summary
             self._log_ingest_summary(ingest_summary, task_id, file_path, status)
 
             # Attach summary to status for access by caller
             status.ingest_summary = ingest_summary
 
+            # Nothing left to resume
+            if checkpoints is not None:
+                await asyncio.to_thread(checkpoints.clear)
+
             return status
             
         except Exception as e:
@@ -289,6 +452,27 @@ class RAGPipeline:
             status.error = str(e)
             await self._update_status(status)
             raise
+        finally:
+            # The converted PDF is an intermediate; the worker removes the upload itself
+            if converted_path is not None:
+                converted_path.unlink(missing_ok=True)
+
+    async def _convert_document(self, file_path: str, ingest_summary: Dict[str, Any]) -> str:
+        """Convert an Office document to PDF off the event loop (LOOL retries and soffice runs block)"""
+        logger.info(f"Converting document to PDF: {file_path}")
+        conversion_start = time.time()
+        try:
+            pdf_path, debug_dir, _ = await asyncio.to_thread(convert_excel_to_pdf, file_path)
+        except Exception as e:
+            raise RuntimeError(f"Document conversion failed: {str(e)}") from e
+        ingest_summary['conversion'] = {
+            'source': str(file_path),
+            'pdf_path': pdf_path,
+            'seconds': round(time.time() - conversion_start, 2),
+            'debug_artifacts_dir': debug_dir
+        }
+        logger.info(f"Conversion completed in {ingest_summary['conversion']['seconds']}s: {pdf_path}")
+        return pdf_path
     
     async def _process_text_content(
         self,
@@ -413,44 +597,246 @@ class RAGPipeline:
                 ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
             return 0, 0
     
+    async def _hash_images(self, items: List[Dict[str, Any]], ingest_summary: Dict[str, Any]):
+        """Compute perceptual and content hashes for image items ahead of vision analysis"""
+        if not self.image_dedup:
+            return
+
+        images = [
+            item for item in items
+            if str(item.get("type", "")).lower() == "image"
+            and item.get("image_triage", "full") == "full"
+            and item.get("img_path") and Path(item["img_path"]).exists()
+        ]
+        if not images:
+            return
+
+        # separate_content already hashed the file for image_metadata
+        fingerprints = await asyncio.gather(*(
+            asyncio.to_thread(image_fingerprint, item["img_path"], item.get("image_metadata", {}).get("sha256"))
+            for item in images
+        ))
+        for item, (image_hash, content_hash) in zip(images, fingerprints):
+            if image_hash is not None:
+                item["image_hash"] = f"{image_hash:016x}"
+                item["image_sha256"] = content_hash
+
+        ingest_summary['image_dedup'] = {
+            'images_hashed': sum(1 for image_hash, _ in fingerprints if image_hash is not None),
+            'vision_calls': 0,
+            'reused_within_document': 0,
+            'reused_across_documents': 0,
+            'vision_calls_saved': 0
+        }
+
+    async def _store_tables(self, items: List[Dict[str, Any]], doc_id: str, ingest_summary: Dict[str, Any]):
+        """Persist table items as typed data in the table store"""
+        if not self.table_store:
+            return
+
+        tables = [item for item in items if str(item.get("type", "")).lower() == "table" and item.get("table_body")]
+        if not tables:
+            return
+
+        try:
+            ingest_summary['table_store'] = await asyncio.to_thread(
+                self.table_store.add_document_tables, doc_id, tables
+            )
+        except Exception as e:
+            logger.error(f"Failed to store tables for {doc_id}: {str(e)}")
+            error_key = "Table store write failed"
+            ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
+
+    async def _analyze_image_item(
+        self,
+        item: Dict[str, Any],
+        context: str,
+        doc_id: str,
+        ingest_summary: Dict[str, Any] = None
+    ) -> str:
+        """Run vision analysis for an image, reusing results for near-duplicates"""
+        img_path = item["img_path"]
+
+        # Triage marked this image as decorative/low-detail: describe it without a vision call
+        if item.get("image_triage") == "caption_only":
+            metadata = item.get("image_metadata", {})
+            captions = (item.get("image_caption") or []) + (item.get("image_footnote") or [])
+            description = "; ".join(captions) if captions else "No caption"
+            return (
+                f"Small or decorative image ({metadata.get('width', '?')}x{metadata.get('height', '?')}). "
+                f"Caption: {description}"
+            )
+
+        async def analyze() -> str:
+            # Downsize and re-encode off the event loop
+            prepared = await image_preparer.prepare(img_path)
+
+            prompt = f"""
+            Analyze this image considering the surrounding context:
+
+            Context: {context}
+
+            Provide a detailed description and identify key elements.
+            """
+
+            return await self.llm.analyze_image(
+                image_data=prepared.data,
+                prompt=prompt,
+                system_prompt="You are an expert image analyst...",
+                mime_type=prepared.mime_type
+            )
+
+        if not self.image_dedup or "image_sha256" not in item:
+            return await analyze()
+
+        analysis, source = await self.image_dedup.analyze(
+            int(item["image_hash"], 16), item["image_sha256"], img_path, doc_id, analyze
+        )
+
+        dedup_summary = (ingest_summary or {}).get('image_dedup')
+        if dedup_summary is not None:
+            if source is None:
+                dedup_summary['vision_calls'] += 1
+            else:
+                if source in ("inflight", doc_id):
+                    dedup_summary['reused_within_document'] += 1
+                else:
+                    dedup_summary['reused_across_documents'] += 1
+                dedup_summary['vision_calls_saved'] += 1
+        if source is not None:
+            logger.debug(f"Reused image analysis for {img_path} (source: {source})")
+
+        return analysis
+
+    async def _run_multimodal_items(
+        self,
+        items: List[Dict[str, Any]],
+        worker,
+        status: Optional[ProcessingStatus] = None,
+        checkpoints: Optional[StageCheckpoints] = None,
+        ingest_summary: Dict[str, Any] = None
+    ) -> List[Any]:
+        """Run worker over items with bounded concurrency, preserving input order.
+
+        With checkpoints, each result is recorded as it finishes and items a previous
+        attempt already finished are not run again. A failed item is None, so the stage
+        fails and a retry runs it again, unless it is given up on: after
+        MULTIMODAL_ITEM_MAX_ATTEMPTS, or at once if the error is about the item itself
+        rather than the provider. Skipped items are left out of the results.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.config.MULTIMODAL_CONCURRENCY))
+        total = len(items)
+        finished = checkpoints.load_items("multimodal") if checkpoints is not None else {}
+        failures = checkpoints.load_item_failures("multimodal") if checkpoints is not None else {}
+        skipped = {index for index, failure in failures.items() if failure["skipped"]}
+        errors: Dict[int, Exception] = {}
+        done = len(finished) + len(skipped)
+
+        if status is not None:
+            status.multimodal_total = total
+            status.multimodal_done = done
+
+        async def run(index: int, item: Dict[str, Any]):
+            nonlocal done
+            if index in finished or index in skipped:
+                return finished.get(index)
+            async with semaphore:
+                try:
+                    result = await worker(item)
+                    # None marks a failed item, which a retry should run again
+                    if checkpoints is not None and result is not None:
+                        checkpoints.save_item("multimodal", index, result)
+                    return result
+                except Exception as e:
+                    error_msg = f"Failed to process multimodal item: {str(e)}"
+                    logger.warning(error_msg)
+                    if ingest_summary is not None:
+                        ingest_summary['storage_issues'].append(error_msg)
+                        if 'errors' not in ingest_summary:
+                            ingest_summary['errors'] = {}
+                        error_key = "Multimodal item processing failed"
+                        ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
+                    errors[index] = e
+                    return None
+                finally:
+                    done += 1
+                    if status is not None:
+                        # Multimodal stage spans progress 0.6 -> 0.8
+                        status.multimodal_done = done
+                        status.progress = 0.6 + 0.2 * done / total
+                        await self._update_status(status)
+
+        results = await asyncio.gather(*(run(index, item) for index, item in enumerate(items)))
+
+        # Every item that ran failed: likely the provider, whatever the errors look like
+        ran = total - len(finished) - len(skipped)
+        provider_wide = ran > 1 and len(errors) == ran
+        for index, error in errors.items():
+            attempts = failures.get(index, {}).get("attempts", 0) + 1
+            give_up = attempts >= self.config.MULTIMODAL_ITEM_MAX_ATTEMPTS or (
+                not provider_wide and not is_transient_llm_error(error)
+            )
+            if checkpoints is not None:
+                checkpoints.save_item_failure("multimodal", index, str(error), skipped=give_up)
+            if give_up:
+                skipped.add(index)
+                failures[index] = {"attempts": attempts, "error": str(error), "skipped": True}
+
+        # Report every skipped item, including ones given up on by an earlier attempt
+        for index in sorted(skipped):
+            failure = failures[index]
+            error_msg = f"Skipped multimodal item {index} after {failure['attempts']} attempt(s): {failure['error']}"
+            logger.warning(error_msg)
+            if ingest_summary is not None:
+                ingest_summary['storage_issues'].append(error_msg)
+                if 'errors' not in ingest_summary:
+                    ingest_summary['errors'] = {}
+                error_key = "Multimodal item skipped"
+                ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
+
+        return [result for index, result in enumerate(results) if index not in skipped]
+
+    def _raise_for_failed_items(self, results: List[Any]):
+        """Fail the multimodal stage if any item failed in a way a retry can fix (e.g. a provider outage).
+
+        Finished items are checkpointed, so /ingest/retry runs only the failed ones again
+        instead of the document being registered without them.
+        """
+        failed = sum(1 for result in results if result is None)
+        if failed:
+            raise RuntimeError(f"{failed} of {len(results)} multimodal item(s) failed; retry the job to process them")
+
     async def _process_multimodal_content(
         self,
         items: List[Dict[str, Any]],
         doc_id: str,
         file_path: str,
-        ingest_summary: Dict[str, Any] = None
+        ingest_summary: Dict[str, Any] = None,
+        status: Optional[ProcessingStatus] = None,
+        context_index: Optional[ContextIndex] = None,
+        checkpoints: Optional[StageCheckpoints] = None
     ):
         """Process multimodal content items"""
-        total_chunks = 0
-        total_entities = 0
+        if context_index is None:
+            context_index = self.content_separator.processor.context_extractor.build_index(items)
+
+        async def process_item(item: Dict[str, Any]) -> Tuple[int, int]:
+            # Get context for the item (O(window) lookup in the page index)
+            context = context_index.get_context(item)
+
+            # Process based on type (failures are recorded by _run_multimodal_items)
+            if item["type"] in ("image", "image".upper(), "IMAGE"):
+                return await self._process_image(item, context, doc_id, file_path, ingest_summary)
+            elif item["type"] in ("table", "TABLE"):
+                return await self._process_table(item, context, doc_id, file_path, ingest_summary)
+            elif item["type"] in ("equation", "EQUATION"):
+                return await self._process_equation(item, context, doc_id, file_path, ingest_summary)
+            return 0, 0
 
-        for item in items:
-            try:
-                # Get context for the item
-                context = self.content_separator.processor.context_extractor.extract_context(
-                    items, item
-                )
-                
-                # Process based on type
-                chunks, entities = (0, 0)
-                if item["type"] in ("image", "image".upper(), "IMAGE"):
-                    chunks, entities = await self._process_image(item, context, doc_id, file_path, ingest_summary)
-                elif item["type"] in ("table", "TABLE"):
-                    chunks, entities = await self._process_table(item, context, doc_id, file_path, ingest_summary)
-                elif item["type"] in ("equation", "EQUATION"):
-                    chunks, entities = await self._process_equation(item, context, doc_id, file_path, ingest_summary)
-                total_chunks += chunks
-                total_entities += entities
-            except Exception as e:
-                error_msg = f"Failed to process multimodal item: {str(e)}"
-                logger.warning(error_msg)
-                if ingest_summary is not None:
-                    ingest_summary['storage_issues'].append(error_msg)
-                    if 'errors' not in ingest_summary:
-                        ingest_summary['errors'] = {}
-                    error_key = "Multimodal item processing failed"
-                    ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
-                continue
+        results = await self._run_multimodal_items(items, process_item, status, checkpoints, ingest_summary)
+        self._raise_for_failed_items(results)
+        total_chunks = sum(chunks for chunks, _ in results)
+        total_entities = sum(entities for _, entities in results)
 
         return total_chunks, total_entities
     
@@ -468,24 +854,8 @@ class RAGPipeline:
         if not img_path or not Path(img_path).exists():
             return 0, 0
         
-        # Read image and convert to base64
-        with open(img_path, "rb") as f:
-            image_data = base64.b64encode(f.read()).decode()
-        
-        # Analyze image
-        prompt = f"""
-        Analyze this image considering the surrounding context:
-        
-        Context: {context}
-        
-        Provide a detailed description and identify key elements.
-        """
-        
-        analysis = await self.llm.analyze_image(
-            image_data=image_data,
-            prompt=prompt,
-            system_prompt="You are an expert image analyst..."
-        )
+        # Analyze image (shared across near-identical images)
+        analysis = await self._analyze_image_item(item, context, doc_id, ingest_summary)
         
         # Create chunk for the image analysis
         chunk_content = f"""
@@ -523,20 +893,21 @@ class RAGPipeline:
         if not table_body:
             return 0, 0
         
-        # Analyze table
+        # Analyze table (large tables are summarized locally; the chunk keeps the full body)
         prompt = f"""
         Analyze this table data considering the context:
         
         Context: {context}
         Table:
-        {table_body}
+        {self._table_prompt(table_body, ingest_summary)}
         
         Provide a detailed analysis including key insights and patterns.
         """
         
         analysis = await self.llm.generate_text(
             prompt=prompt,
-            system_prompt="You are an expert data analyst..."
+            system_prompt="You are an expert data analyst...",
+            task="summarize"
         )
         
         # Create chunk for the table analysis
@@ -560,6 +931,19 @@ class RAGPipeline:
             ingest_summary=ingest_summary
         )
     
+    def _table_prompt(self, table_body: str, ingest_summary: Dict[str, Any] = None) -> str:
+        """Table text for an analysis prompt, tracking how much profiling saved"""
+        table_prompt = build_table_prompt(table_body)
+        if ingest_summary is not None:
+            stats = ingest_summary.setdefault(
+                'table_prompts', {'tables': 0, 'profiled': 0, 'table_chars': 0, 'prompt_chars': 0}
+            )
+            stats['tables'] += 1
+            stats['profiled'] += int(table_prompt.profiled)
+            stats['table_chars'] += table_prompt.table_chars
+            stats['prompt_chars'] += len(table_prompt.text)
+        return table_prompt.text
+
     async def _process_equation(
         self,
         item: Dict[str, Any],
@@ -589,7 +973,8 @@ class RAGPipeline:
         
         explanation = await self.llm.generate_text(
             prompt=prompt,
-            system_prompt="You are an expert mathematician..."
+            system_prompt="You are an expert mathematician...",
+            task="summarize"
         )
         
         # Create chunk for the equation analysis
@@ -743,7 +1128,7 @@ class RAGPipeline:
                 return 0
 
             # Use LightRAG's ainsert method
-            track_id = await self.lightrag.ainsert(
+            track_id = await self.index_writer.ainsert(
                 input=full_text,
                 ids=[doc_id],
                 file_paths=[file_path],
@@ -765,148 +1150,181 @@ class RAGPipeline:
                 ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
             raise
 
-    async def _process_multimodal_content_lightrag(
+    async def _build_lightrag_multimodal_item(
         self,
-        items: List[Dict[str, Any]],
+        context_index: ContextIndex,
+        item: Dict[str, Any],
         doc_id: str,
-        file_path: str,
         ingest_summary: Dict[str, Any] = None
-    ):
-        """Process multimodal content using LightRAG"""
-        if not self.lightrag:
-            logger.warning("LightRAG not initialized, skipping multimodal content processing")
-            return 0, 0
+    ) -> Dict[str, Any]:
+        """Analyze a single multimodal item and convert it to LightRAG format"""
+        item_type = item.get("type", "").lower()
+        lightrag_item = {
+            "type": item_type,
+            "content": {}
+        }
 
-        try:
-            # Convert multimodal items to LightRAG format
-            multimodal_content = []
-
-            for item in items:
-                item_type = item.get("type", "").lower()
-                lightrag_item = {
-                    "type": item_type,
-                    "content": {}
+        if item_type == "image":
+            # Process image content
+            img_path = item.get("img_path")
+            if img_path and Path(img_path).exists():
+                # Get context for the image
+                context = context_index.get_context(item)
+
+                # Analyze image with vision model (shared across near-identical images)
+                analysis = await self._analyze_image_item(item, context, doc_id, ingest_summary)
+
+                lightrag_item["content"] = {
+                    "image_path": img_path,
+                    "analysis": analysis,
+                    "caption": item.get("image_caption", []),
+                    "page": item.get("page_idx", 0)
                 }
 
-                if item_type == "image":
-                    # Process image content
-                    img_path = item.get("img_path")
-                    if img_path and Path(img_path).exists():
-                        # Get context for the image
-                        context = self.content_separator.processor.context_extractor.extract_context(
-                            items, item
-                        )
-
-                        # Analyze image with vision model
-                        with open(img_path, "rb") as f:
-                            image_data = base64.b64encode(f.read()).decode()
+        elif item_type == "table":
+            # Process table content
+            table_body = item.get("table_body", "")
+            captions = item.get("table_caption", [])
 
-                        prompt = f"""
-                        Analyze this image considering the surrounding context:
+            if table_body:
+                # Get context for the table
+                context = context_index.get_context(item)
 
-                        Context: {context}
+                # Analyze table (large tables are summarized locally; table_data keeps the full body)
+                prompt = f"""
+                Analyze this table data considering the context:
 
-                        Provide a detailed description and identify key elements.
-                        """
+                Context: {context}
+                Table:
+                {self._table_prompt(table_body, ingest_summary)}
 
-                        analysis = await self.llm.analyze_image(
-                            image_data=image_data,
-                            prompt=prompt,
-                            system_prompt="You are an expert image analyst..."
-                        )
-
-                        lightrag_item["content"] = {
-                            "image_path": img_path,
-                            "analysis": analysis,
-                            "caption": item.get("image_caption", []),
-                            "page": item.get("page_idx", 0)
-                        }
+                Provide a detailed analysis including key insights and patterns.
+                """
 
-                elif item_type == "table":
-                    # Process table content
-                    table_body = item.get("table_body", "")
-                    captions = item.get("table_caption", [])
-
-                    if table_body:
-                        # Get context for the table
-                        context = self.content_separator.processor.context_extractor.extract_context(
-                            items, item
-                        )
+                analysis = await self.llm.generate_text(
+                    prompt=prompt,
+                    system_prompt="You are an expert data analyst...",
+                    task="summarize"
+                )
 
-                        # Analyze table
-                        prompt = f"""
-                        Analyze this table data considering the context:
+                lightrag_item["content"] = {
+                    "table_data": table_body,
+                    "analysis": analysis,
+                    "caption": captions,
+                    "page": item.get("page_idx", 0)
+                }
 
-                        Context: {context}
-                        Table:
-                        {table_body}
+        elif item_type == "equation":
+            # Process equation content
+            latex = item.get("latex", "")
+            text = item.get("text", "")
 
-                        Provide a detailed analysis including key insights and patterns.
-                        """
+            if latex:
+                # Get context for the equation
+                context = context_index.get_context(item)
 
-                        analysis = await self.llm.generate_text(
-                            prompt=prompt,
-                            system_prompt="You are an expert data analyst..."
-                        )
+                # Analyze equation
+                prompt = f"""
+                Explain this mathematical equation in context:
 
-                        lightrag_item["content"] = {
-                            "table_data": table_body,
-                            "analysis": analysis,
-                            "caption": captions,
-                            "page": item.get("page_idx", 0)
-                        }
+                Context: {context}
+                Equation (LaTeX): {latex}
+                Description: {text}
 
-                elif item_type == "equation":
-                    # Process equation content
-                    latex = item.get("latex", "")
-                    text = item.get("text", "")
+                Provide a detailed explanation of the equation's meaning and significance.
+                """
 
-                    if latex:
-                        # Get context for the equation
-                        context = self.content_separator.processor.context_extractor.extract_context(
-                            items, item
-                        )
+                explanation = await self.llm.generate_text(
+                    prompt=prompt,
+                    system_prompt="You are an expert mathematician...",
+                    task="summarize"
+                )
 
-                        # Analyze equation
-                        prompt = f"""
-                        Explain this mathematical equation in context:
+                lightrag_item["content"] = {
+                    "latex": latex,
+                    "text": text,
+                    "explanation": explanation,
+                    "page": item.get("page_idx", 0)
+                }
 
-                        Context: {context}
-                        Equation (LaTeX): {latex}
-                        Description: {text}
+        return lightrag_item
+
+    def _lightrag_item_text(self, lightrag_item: Dict[str, Any]) -> str:
+        """Text for an analyzed multimodal item, in the same layout as the non-LightRAG chunks"""
+        content = lightrag_item.get("content") or {}
+        item_type = lightrag_item.get("type")
+        if item_type == "image" and content:
+            lines = [
+                "Image Analysis:",
+                f"Path: {content['image_path']}",
+                f"Page: {content['page']}",
+                f"Caption: {', '.join(content['caption'])}",
+                f"Analysis: {content['analysis']}"
+            ]
+        elif item_type == "table" and content:
+            lines = [
+                "Table Analysis:",
+                f"Page: {content['page']}",
+                f"Caption: {', '.join(content['caption'])}",
+                "Content:",
+                content["table_data"],
+                f"Analysis: {content['analysis']}"
+            ]
+        elif item_type == "equation" and content:
+            lines = [
+                "Equation Analysis:",
+                f"Page: {content['page']}",
+                f"LaTeX: {content['latex']}",
+                f"Description: {content['text']}",
+                f"Explanation: {content['explanation']}"
+            ]
+        else:
+            return ""
+        return "\n".join(lines)
 
-                        Provide a detailed explanation of the equation's meaning and significance.
-                        """
+    async def _process_multimodal_content_lightrag(
+        self,
+        items: List[Dict[str, Any]],
+        doc_id: str,
+        file_path: str,
+        ingest_summary: Dict[str, Any] = None,
+        status: Optional[ProcessingStatus] = None,
+        context_index: Optional[ContextIndex] = None,
+        checkpoints: Optional[StageCheckpoints] = None
+    ):
+        """Process multimodal content using LightRAG"""
+        if not self.lightrag:
+            logger.warning("LightRAG not initialized, skipping multimodal content processing")
+            return 0, 0
 
-                        explanation = await self.llm.generate_text(
-                            prompt=prompt,
-                            system_prompt="You are an expert mathematician..."
-                        )
+        if context_index is None:
+            context_index = self.content_separator.processor.context_extractor.build_index(items)
 
-                        lightrag_item["content"] = {
-                            "latex": latex,
-                            "text": text,
-                            "explanation": explanation,
-                            "page": item.get("page_idx", 0)
-                        }
+        async def process_item(item: Dict[str, Any]) -> Dict[str, Any]:
+            return await self._build_lightrag_multimodal_item(context_index, item, doc_id, ingest_summary)
 
-                multimodal_content.append(lightrag_item)
+        # Convert multimodal items to LightRAG format (analysis runs concurrently, order preserved).
+        # Nothing is inserted until every item succeeded or was skipped: a retry inserts under
+        # the same id, which LightRAG would skip as a duplicate
+        multimodal_content = await self._run_multimodal_items(
+            items, process_item, status, checkpoints, ingest_summary
+        )
+        self._raise_for_failed_items(multimodal_content)
 
-            # Use LightRAG's ainsert with multimodal content
-            if multimodal_content:
-                # Create a minimal text description to avoid empty input error
-                text_description = f"Multimodal content from document {doc_id}: {len(multimodal_content)} items"
-                
-                track_id = await self.lightrag.ainsert(
-                    input=text_description,  # Provide minimal text to avoid empty input error
-                    multimodal_content=multimodal_content,
+        try:
+            # LightRAG indexes text only: insert the analyses as one text document, so they are
+            # chunked, embedded and entity-extracted like the document's own text
+            sections = [text for text in map(self._lightrag_item_text, multimodal_content) if text]
+            if sections:
+                track_id = await self.index_writer.ainsert(
+                    input="\n\n".join(sections),
                     ids=[f"{doc_id}_multimodal"],
                     file_paths=[file_path],
                 )
 
                 logger.info(f"LightRAG multimodal insertion completed with track_id: {track_id}")
 
-            return len(multimodal_content), 0
+            return len(sections), 0
 
         except Exception as e:
             error_msg = f"LightRAG multimodal processing failed: {str(e)}"
@@ -917,8 +1335,8 @@ class RAGPipeline:
                     ingest_summary['errors'] = {}
                 error_key = "LightRAG multimodal processing failed"
                 ingest_summary['errors'][error_key] = ingest_summary['errors'].get(error_key, 0) + 1
-            # Don't raise - multimodal processing is supplementary
-            return 0, 0
+            # Fail the stage so a retry inserts the (checkpointed) items again
+            raise
 
     async def _count_entities_lightrag(self, doc_id: str) -> int:
         """Count entities for a document using LightRAG"""
@@ -967,6 +1385,11 @@ class RAGPipeline:
         status_path.parent.mkdir(exist_ok=True)
         with open(status_path, "w") as f:
             f.write(status.json())
+        if self.status_callback:
+            try:
+                await self.status_callback(status)
+            except Exception as e:
+                logger.warning(f"Status callback failed for task_id={status.task_id}: {str(e)}")
 
     def _log_ingest_summary(self, ingest_summary: Dict[str, Any], task_id: str, file_path: str, status: ProcessingStatus):
         """Log comprehensive ingest summary"""
@@ -974,6 +1397,17 @@ class RAGPipeline:
         logger.info(f"[INGEST SUMMARY] Document processing completed for task_id={task_id}")
         logger.info(f"[INGEST SUMMARY] File: {file_path}")
         logger.info(f"[INGEST SUMMARY] Parser used: {ingest_summary.get('parser_used', 'unknown')}")
+        if ingest_summary.get('parse_cache'):
+            logger.info(f"[INGEST SUMMARY] Parse cache: {ingest_summary['parse_cache']}")
+        conversion = ingest_summary.get('conversion')
+        if conversion:
+            logger.info(f"[INGEST SUMMARY] Converted to PDF in {conversion['seconds']}s: {conversion['pdf_path']}")
+        stage_timings = ingest_summary.get('stage_timings')
+        if stage_timings:
+            logger.info(
+                "[INGEST SUMMARY] Stage timings: "
+                + ", ".join(f"{stage}={seconds}s" for stage, seconds in stage_timings.items())
+            )
 
         # Log storage issues
         storage_issues = ingest_summary.get('storage_issues', [])
@@ -1002,6 +1436,54 @@ class RAGPipeline:
         else:
             logger.info("[INGEST SUMMARY] No warnings encountered")
 
+        # Log image triage decisions
+        image_triage = ingest_summary.get('image_triage')
+        if image_triage:
+            logger.info(
+                f"[INGEST SUMMARY] Image triage: {image_triage.get('full', 0)} full analysis, "
+                f"{image_triage.get('caption_only', 0)} caption-only, {image_triage.get('skip', 0)} skipped"
+            )
+
+        # Log image deduplication savings
+        image_dedup = ingest_summary.get('image_dedup')
+        if image_dedup:
+            logger.info(
+                f"[INGEST SUMMARY] Image dedup: {image_dedup['images_hashed']} image(s) hashed, "
+                f"{image_dedup['vision_calls']} vision call(s), {image_dedup['vision_calls_saved']} saved "
+                f"({image_dedup['reused_within_document']} within document, "
+                f"{image_dedup['reused_across_documents']} across documents)"
+            )
+
+        # Log table prompt profiling savings
+        table_prompts = ingest_summary.get('table_prompts')
+        if table_prompts:
+            logger.info(
+                f"[INGEST SUMMARY] Table prompts: {table_prompts['tables']} table(s), "
+                f"{table_prompts['profiled']} profiled, {table_prompts['table_chars']} -> "
+                f"{table_prompts['prompt_chars']} characters"
+            )
+
+        # Log structured table storage
+        table_store = ingest_summary.get('table_store')
+        if table_store:
+            logger.info(
+                f"[INGEST SUMMARY] Table store: {table_store['tables']} table(s), {table_store['rows']} row(s) stored, "
+                f"{table_store['skipped']} unparseable"
+            )
+
+        # Log LLM usage per task tier
+        for task, usage in ingest_summary.get('llm_usage', {}).items():
+            logger.info(
+                f"[INGEST SUMMARY] LLM {task}: {usage['calls']} call(s), {usage['errors']} error(s), "
+                f"{usage['prompt_tokens']}+{usage['completion_tokens']} tokens, "
+                f"avg {usage['avg_latency']}s ({', '.join(usage['models'])})"
+            )
+            if usage.get('json_failures'):
+                logger.warning(
+                    f"[INGEST SUMMARY] LLM {task}: {usage['json_failures']} unparseable structured response(s), "
+                    f"{usage['json_repaired']} repaired, {usage['json_wasted']} wasted"
+                )
+
         # Log final statistics
         logger.info(f"[INGEST SUMMARY] Final statistics:")
         logger.info(f"[INGEST SUMMARY]   - Chunks created: {status.chunks_created}")
@@ -1,10 +1,14 @@
 from typing import List, Dict, Any, Tuple, Optional
+import asyncio
 import logging
 from pathlib import Path
 import json
-import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from PIL import Image
 import io
+import numpy as np
 
 from .config import config
 from .schemas import ContentType
@@ -12,25 +16,81 @@ from .context_extractor import ContextExtractor
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=512)
+def _render_image_preview(image_path: str, mtime_ns: int, max_size: int) -> bytes:
+    """Render a JPEG preview; mtime_ns is part of the cache key so edited files re-render"""
+    with Image.open(image_path) as img:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        
+        # Convert to RGB if needed
+        if img.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+
+def get_image_preview(image_path: str, max_size: int = 300) -> bytes:
+    """On-demand, cached JPEG preview of an image"""
+    path = Path(image_path)
+    return _render_image_preview(str(path.resolve()), path.stat().st_mtime_ns, max_size)
+
 class ContentProcessor:
     def __init__(self):
         self.config = config
         self.context_extractor = ContextExtractor()
+        self._image_executor: Optional[ThreadPoolExecutor] = None
+    
+    def _get_image_executor(self) -> ThreadPoolExecutor:
+        """Worker pool for per-image metadata (PIL decoding, hashing, triage)"""
+        if self._image_executor is None:
+            self._image_executor = ThreadPoolExecutor(
+                max_workers=self.config.IMAGE_PREP_WORKERS,
+                thread_name_prefix="image-metadata"
+            )
+        return self._image_executor
     
     def separate_content(
         self,
-        content_list: List[Dict[str, Any]]
+        content_list: List[Dict[str, Any]],
+        triage_summary: Optional[Dict[str, int]] = None
     ) -> Tuple[str, List[Dict[str, Any]]]:
         """Separate text and multimodal content"""
         
         text_parts = []
         multimodal_items = []
+        if triage_summary is None:
+            triage_summary = {}
+        
+        # Image metadata is I/O and decode bound: compute it for all images in the worker pool
+        image_indices = [
+            index for index, item in enumerate(content_list)
+            if self._content_type(item) == ContentType.IMAGE.value
+        ]
+        image_results = {}
+        if image_indices:
+            item_triage = [{} for _ in image_indices]
+            enhanced = self._get_image_executor().map(
+                self._enhance_image_item,
+                [content_list[index] for index in image_indices],
+                item_triage
+            )
+            image_results = dict(zip(image_indices, enhanced))
+            for counts in item_triage:
+                for decision, count in counts.items():
+                    triage_summary[decision] = triage_summary.get(decision, 0) + count
         
-        for item in content_list:
-            raw_type = item.get("type", "text")
-            content_type = raw_type.value if hasattr(raw_type, "value") else str(raw_type)
+        for index, item in enumerate(content_list):
+            content_type = self._content_type(item)
             
-            if content_type == ContentType.TEXT.value:
+            if index in image_results:
+                if image_results[index]:
+                    multimodal_items.append(image_results[index])
+            elif content_type == ContentType.TEXT.value:
                 text_content = item.get("text", "").strip()
                 if text_content:
                     # Add heading markers for structure
@@ -41,7 +101,7 @@ class ContentProcessor:
                     text_parts.append(text_content)
             else:
                 # Process and enhance multimodal content
-                enhanced_item = self._enhance_multimodal_item(item)
+                enhanced_item = self._enhance_multimodal_item(item, triage_summary)
                 if enhanced_item:
                     multimodal_items.append(enhanced_item)
         
@@ -59,17 +119,21 @@ class ContentProcessor:
         
         return full_text, multimodal_items
     
+    def _content_type(self, item: Dict[str, Any]) -> str:
+        raw_type = item.get("type", "text")
+        return raw_type.value if hasattr(raw_type, "value") else str(raw_type)
+    
     def _enhance_multimodal_item(
         self,
-        item: Dict[str, Any]
+        item: Dict[str, Any],
+        triage_summary: Optional[Dict[str, int]] = None
     ) -> Optional[Dict[str, Any]]:
         """Enhance multimodal content with additional context and metadata"""
         
-        raw_type = item.get("type")
-        content_type = raw_type.value if hasattr(raw_type, "value") else str(raw_type)
+        content_type = self._content_type(item)
         
         if content_type == ContentType.IMAGE.value:
-            return self._enhance_image_item(item)
+            return self._enhance_image_item(item, triage_summary)
         elif content_type == ContentType.TABLE.value:
             return self._enhance_table_item(item)
         elif content_type == ContentType.EQUATION.value:
@@ -77,7 +141,11 @@ class ContentProcessor:
         
         return item
     
-    def _enhance_image_item(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _enhance_image_item(
+        self,
+        item: Dict[str, Any],
+        triage_summary: Optional[Dict[str, int]] = None
+    ) -> Optional[Dict[str, Any]]:
         """Enhance image content with additional metadata"""
         
         img_path = item.get("img_path")
@@ -85,34 +153,100 @@ class ContentProcessor:
             return None
         
         try:
+            # Read once: the bytes feed both the content hash and PIL
+            with open(img_path, "rb") as f:
+                raw = f.read()
+            
             # Get image metadata
-            with Image.open(img_path) as img:
+            with Image.open(io.BytesIO(raw)) as img:
                 width, height = img.size
                 format = img.format
                 mode = img.mode
+                triage, triage_stats = self._triage_image(img, item)
+            
+            if triage_summary is not None:
+                triage_summary[triage] = triage_summary.get(triage, 0) + 1
+            if triage == "skip":
+                logger.debug(f"Skipping decorative image {img_path}: {triage_stats}")
+                return None
             
             # Add metadata to item
             enhanced_item = item.copy()
+            enhanced_item["image_triage"] = triage
+            enhanced_item["image_stats"] = triage_stats
             enhanced_item.update({
                 "image_metadata": {
                     "width": width,
                     "height": height,
                     "format": format,
                     "mode": mode,
-                    "aspect_ratio": width / height
+                    "aspect_ratio": width / height,
+                    "file_size": len(raw),
+                    "sha256": hashlib.sha256(raw).hexdigest()
                 }
             })
             
-            # Add base64 preview for small images
-            if width * height < 1000000:  # Less than 1MP
-                enhanced_item["image_preview"] = self._get_image_preview(img_path)
-            
+            # Previews are rendered on demand (get_image_preview / /assets/preview), not stored in the item
             return enhanced_item
             
         except Exception as e:
             logger.warning(f"Failed to enhance image {img_path}: {str(e)}")
             return item
     
+    def _triage_image(self, img: Image.Image, item: Dict[str, Any]) -> Tuple[str, Dict[str, float]]:
+        """Classify an image as skip, caption_only or full from cheap pixel statistics"""
+        
+        width, height = img.size
+        if not self.config.IMAGE_TRIAGE_ENABLED:
+            return "full", {}
+        
+        # Statistics come from a thumbnail so cost is independent of image size; 256px keeps
+        # thin chart lines and table rules visible
+        thumb = img.copy()
+        thumb.thumbnail((256, 256))
+        pixels = np.asarray(thumb.convert("RGB"), dtype=np.float32)
+        gray = pixels.mean(axis=2)
+        
+        histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+        probabilities = histogram[histogram > 0] / histogram.sum()
+        entropy = float(-(probabilities * np.log2(probabilities)).sum())
+        # Share of pixels on a visible edge: charts and tables on white score high despite low entropy
+        gradient = np.abs(np.diff(gray, axis=1))[:-1, :] + np.abs(np.diff(gray, axis=0))[:, :-1]
+        edge_density = float((gradient > 32).mean()) if gradient.size else 0.0
+        color_std = float(pixels.reshape(-1, 3).std(axis=0).mean())
+        aspect_ratio = max(width, height) / max(1, min(width, height))
+        
+        stats = {
+            "entropy": round(entropy, 3),
+            "edge_density": round(edge_density, 4),
+            "color_std": round(color_std, 3),
+            "aspect_ratio": round(aspect_ratio, 3)
+        }
+        has_caption = bool(item.get("image_caption") or item.get("image_footnote"))
+        
+        # Bullets, blank renders and hairline separators carry no information
+        is_tiny = max(width, height) < self.config.IMAGE_TRIAGE_MIN_SIDE
+        is_blank = color_std < self.config.IMAGE_TRIAGE_BLANK_STD
+        # A wide strip can still be a table row; only a thin one is a separator
+        is_separator = (
+            aspect_ratio > self.config.IMAGE_TRIAGE_MAX_ASPECT
+            and min(width, height) < self.config.IMAGE_TRIAGE_MIN_SIDE
+        )
+        if is_tiny or is_blank or is_separator:
+            # Keep captioned images so their caption still reaches the index
+            return ("caption_only" if has_caption else "skip"), stats
+        
+        # Small or low-detail images (icons, logos, flat shapes) are described from captions alone
+        is_small = max(width, height) < self.config.IMAGE_TRIAGE_SMALL_SIDE
+        is_low_detail = (
+            edge_density < self.config.IMAGE_TRIAGE_MIN_EDGE_DENSITY
+            and entropy < self.config.IMAGE_TRIAGE_MIN_ENTROPY
+        )
+        if is_small or is_low_detail:
+            return "caption_only", stats
+        
+        return "full", stats
+    
     def _enhance_table_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """Enhance table content with additional metadata"""
         
@@ -144,34 +278,6 @@ class ContentProcessor:
         
         return enhanced_item
     
-    def _get_image_preview(self, image_path: str, max_size: int = 300) -> str:
-        """Create base64 preview of image"""
-        
-        try:
-            with Image.open(image_path) as img:
-                # Resize if needed
-                if img.width > max_size or img.height > max_size:
-                    ratio = min(max_size / img.width, max_size / img.height)
-                    new_size = (int(img.width * ratio), int(img.height * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-                
-                # Convert to RGB if needed
-                if img.mode in ('RGBA', 'LA'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[-1])
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Convert to base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=85)
-                return base64.b64encode(buffer.getvalue()).decode()
-                
-        except Exception as e:
-            logger.warning(f"Failed to create image preview: {str(e)}")
-            return ""
-    
     def _estimate_equation_complexity(self, latex: str) -> int:
         """Estimate equation complexity based on LaTeX content"""
         
@@ -209,15 +315,19 @@ class ContentSeparator:
     ) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
         """Process and separate document content"""
         
-        # Extract document structure
+        # Structure analysis, image metadata/triage and the reference sweep all scale with the
+        # document: run them in threads so the event loop (API, other jobs) keeps running
         context_extractor = ContextExtractor()
-        doc_structure = context_extractor.analyze_document_structure(content_list)
+        doc_structure = await asyncio.to_thread(context_extractor.analyze_document_structure, content_list)
         
-        # Separate content
-        full_text, multimodal_items = self.processor.separate_content(content_list)
+        # Separate content (image triage decisions are counted per document)
+        image_triage = {}
+        full_text, multimodal_items = await asyncio.to_thread(
+            self.processor.separate_content, content_list, image_triage
+        )
         
         # Extract references between items
-        references = context_extractor.extract_references(content_list)
+        references = await asyncio.to_thread(context_extractor.extract_references, content_list)
         
         # Create processing summary
         summary = {
@@ -225,6 +335,7 @@ class ContentSeparator:
             "structure": doc_structure,
             "text_length": len(full_text),
             "multimodal_count": len(multimodal_items),
+            "image_triage": image_triage,
             "references": references
         }
         
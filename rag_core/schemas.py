@@ -38,10 +38,14 @@ class ProcessingStatus(BaseModel):
     task_id: str
     status: str  # "processing", "completed", "failed"
     progress: float = 0.0
+    stage: Optional[str] = None  # Pipeline stage currently running, e.g. "convert", "parse"
+    stages_done: Optional[List[str]] = None  # Checkpointed stages a retry will skip
     error: Optional[str] = None
     doc_id: Optional[str] = None
     chunks_created: Optional[int] = None
     entities_found: Optional[int] = None
+    multimodal_total: Optional[int] = None
+    multimodal_done: Optional[int] = None
     ingest_summary: Optional[Dict[str, Any]] = None
 
 class DocumentMetadata(BaseModel):
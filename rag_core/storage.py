@@ -10,11 +10,36 @@ if TYPE_CHECKING:
 
 from .config import config
 from .schemas import EntityNode, EntityRelation
+from .index_writer import IndexWriter
 from lightrag import operate as lightrag_operate
 from lightrag.base import TextChunkSchema
 
 logger = logging.getLogger(__name__)
 
+ENTITY_TYPES = ["person", "organization", "location", "product", "concept", "technical_term", "visual_element"]
+
+ENTITY_EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "entities": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "type": {"type": "string", "enum": ENTITY_TYPES},
+                    "description": {"type": "string"},
+                    "confidence": {"type": "number"}
+                },
+                "required": ["name", "type", "description", "confidence"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["entities"],
+    "additionalProperties": False
+}
+
 # Optional imports - handle gracefully if not available
 try:
     from neo4j import GraphDatabase
@@ -502,8 +527,10 @@ class RedisCache:
         self.client.delete(key)
 
 class StorageManager:
-    def __init__(self, lightrag=None):
+    def __init__(self, lightrag=None, index_writer=None):
         self.lightrag = lightrag
+        # LightRAG storage has a single writer; see index_writer.py
+        self.index_writer = index_writer or (IndexWriter(lightrag) if lightrag else None)
         self.graph = Neo4jGraph()
         self.vectors = QdrantVectorStore()
         self.cache = RedisCache()
@@ -672,7 +699,7 @@ class StorageManager:
             }
 
             # Insert into LightRAG's chunks VDB
-            await self.lightrag.chunks_vdb.upsert(chunk_data)
+            await self.index_writer.upsert("chunks_vdb", chunk_data)
 
         except Exception as e:
             logger.warning(f"Failed to store chunk via LightRAG: {e}")
@@ -700,7 +727,7 @@ class StorageManager:
             }
 
             # Insert into LightRAG's entities VDB
-            await self.lightrag.entities_vdb.upsert(entity_data)
+            await self.index_writer.upsert("entities_vdb", entity_data)
 
         except Exception as e:
             logger.warning(f"Failed to store entity via LightRAG: {e}")
@@ -729,7 +756,7 @@ class StorageManager:
             }
 
             # Insert into LightRAG's relationships VDB
-            await self.lightrag.relationships_vdb.upsert(relation_data)
+            await self.index_writer.upsert("relationships_vdb", relation_data)
 
         except Exception as e:
             logger.warning(f"Failed to store relation via LightRAG: {e}")
@@ -904,35 +931,21 @@ class StorageManager:
             Content:
             {content}
 
-            Return a JSON array of entities with the following structure:
-            [
-                {{
-                    "name": "Entity Name",
-                    "type": "person|organization|location|product|concept|technical_term|visual_element",
-                    "description": "Brief description of what this entity represents",
-                    "confidence": 0.8
-                }}
-            ]
+            Return an "entities" list where each entity has a name, a type
+            (person|organization|location|product|concept|technical_term|visual_element),
+            a brief description of what it represents and a confidence between 0 and 1.
 
             Only extract entities that are clearly identifiable and relevant.
             """
 
-            response = await llm.generate_text(
+            response = await llm.generate_json(
                 prompt=prompt,
-                system_prompt="You are an expert at extracting structured information from documents."
+                schema=ENTITY_EXTRACTION_SCHEMA,
+                schema_name="entity_extraction",
+                system_prompt="You are an expert at extracting structured information from documents.",
+                task="extract"
             )
-
-            # Parse the response to extract entities
-            import json
-            import re
-
-            # Try to extract JSON from response
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                entities_data = json.loads(json_match.group())
-            else:
-                # Fallback: try to parse the whole response
-                entities_data = json.loads(response)
+            entities_data = response["entities"]
 
             # Create and store entities
             stored_entities = []
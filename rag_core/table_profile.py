@@ -0,0 +1,323 @@
+from typing import Dict, Any, List, NamedTuple, Optional
+import logging
+import re
+import warnings
+from html.parser import HTMLParser
+import numpy as np
+import pandas as pd
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Thousands separators, currency and percent signs stripped before numeric parsing
+_NUMERIC_NOISE = r"[,\s$€£¥%]"
+_PIPE_SPLIT = re.compile(r"(?<!\\)\|")
+_SEPARATOR_ROW = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+# Share of non-empty cells that must parse for a column to count as numeric/date
+_TYPE_THRESHOLD = 0.8
+# Longest column name / top value rendered in a profile
+_MAX_VALUE_CHARS = 40
+
+class TablePrompt(NamedTuple):
+    text: str  # What goes into the LLM prompt
+    profiled: bool
+    table_chars: int
+    profile: Optional[Dict[str, Any]]
+
+class _HTMLTableParser(HTMLParser):
+    """Collects the cells of the first <table>, expanding rowspan/colspan"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[str]] = []
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+        self._span = (1, 1)
+        self._pending: Dict[int, List] = {}  # column -> [remaining rows, text]
+        self._depth = 0
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == "table":
+            self._depth += 1
+        elif self._depth != 1:
+            return
+        elif tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            attrs = dict(attrs)
+            self._cell = []
+            self._span = (_span(attrs.get("rowspan")), _span(attrs.get("colspan")))
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        if tag == "table":
+            self._depth -= 1
+            if self._depth == 0:
+                self._done = True
+        elif self._depth != 1:
+            return
+        elif tag in ("td", "th") and self._cell is not None:
+            self._add_cell(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self._fill_pending()
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None and self._depth == 1:
+            self._cell.append(data)
+
+    def _fill_pending(self):
+        """Insert cells carried down from rowspans above"""
+        while len(self._row) in self._pending:
+            column = len(self._row)
+            remaining, text = self._pending[column]
+            self._row.append(text)
+            if remaining <= 1:
+                del self._pending[column]
+            else:
+                self._pending[column][0] = remaining - 1
+
+    def _add_cell(self, text: str):
+        rowspan, colspan = self._span
+        for _ in range(colspan):
+            self._fill_pending()
+            if rowspan > 1:
+                self._pending[len(self._row)] = [rowspan - 1, text]
+            self._row.append(text)
+
+def _span(value: Optional[str]) -> int:
+    try:
+        return max(1, min(int(value), 1000))
+    except (TypeError, ValueError):
+        return 1
+
+def _rows_to_frame(rows: List[List[str]]) -> Optional[pd.DataFrame]:
+    """First row is the header; ragged rows are padded and headers made unique"""
+    rows = [row for row in rows if any(cell for cell in row)]
+    if len(rows) < 2:
+        return None
+
+    width = max(len(row) for row in rows)
+    header, seen = [], {}
+    for i, name in enumerate(rows[0] + [""] * (width - len(rows[0]))):
+        name = name or f"column_{i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        header.append(name)
+
+    data = [row + [""] * (width - len(row)) for row in rows[1:]]
+    return pd.DataFrame(data, columns=header, dtype=object)
+
+def parse_table_body(table_body: str) -> Optional[pd.DataFrame]:
+    """Parse an HTML (MinerU) or pipe-delimited (markdown/Excel) table into a string DataFrame"""
+    if not table_body:
+        return None
+
+    if "<table" in table_body.lower():
+        parser = _HTMLTableParser()
+        try:
+            parser.feed(table_body)
+            parser.close()
+        except Exception as e:
+            logger.warning(f"Failed to parse HTML table: {str(e)}")
+            return None
+        return _rows_to_frame(parser.rows)
+
+    rows = []
+    for line in table_body.splitlines():
+        line = line.strip()
+        # Skip captions such as "Sheet: X (rows a-b of N)" and header separators
+        if not line.startswith("|") or _SEPARATOR_ROW.match(line):
+            continue
+        cells = _PIPE_SPLIT.split(line[1:-1] if line.endswith("|") and not line.endswith("\\|") else line[1:])
+        rows.append([cell.strip().replace("\\|", "|") for cell in cells])
+    return _rows_to_frame(rows)
+
+def _format_number(value: float) -> str:
+    if not np.isfinite(value):
+        return str(value)
+    if float(value).is_integer() and abs(value) < 1e15:
+        return f"{int(value):,}"
+    return f"{value:,.4g}" if abs(value) < 1e-2 or abs(value) >= 1e6 else f"{value:,.2f}"
+
+def _numeric_frame(cells: pd.DataFrame) -> pd.DataFrame:
+    """Parse every column as numbers at once; "(1,234)" is an accounting negative"""
+    cleaned = cells.apply(lambda col: col.str.strip()
+                          .str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+                          .str.replace(_NUMERIC_NOISE, "", regex=True))
+    return cleaned.apply(pd.to_numeric, errors="coerce")
+
+def profile_table(df: pd.DataFrame, top_values: Optional[int] = None) -> Dict[str, Any]:
+    """Column types, ranges, aggregates and top values computed column-wise with pandas"""
+    top_values = top_values or config.TABLE_PROFILE_TOP_VALUES
+    cells = df.fillna("").astype(str).apply(lambda col: col.str.strip())
+    non_empty = cells.ne("")
+    non_empty_counts = non_empty.sum()
+
+    numeric = _numeric_frame(cells)
+    numeric_share = numeric.notna().sum() / non_empty_counts.replace(0, np.nan)
+    numeric_columns = [col for col, share in numeric_share.items() if share >= _TYPE_THRESHOLD]
+
+    aggregates = numeric[numeric_columns].agg(["min", "max", "mean", "sum"]) if numeric_columns else None
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        column = {"name": str(name), "non_empty": int(non_empty_counts.iloc[position])}
+        if name in numeric_columns:
+            column["type"] = "numeric"
+            column.update({stat: float(aggregates.at[stat, name]) for stat in ("min", "max", "mean", "sum")})
+        else:
+            values = cells.iloc[:, position][non_empty.iloc[:, position]]
+            dates = _parse_dates(values)
+            if dates is not None:
+                column.update({"type": "date", "min": str(dates.min().date()), "max": str(dates.max().date())})
+            else:
+                column["type"] = "text"
+            counts = values.value_counts()
+            column["distinct"] = int(len(counts))
+            column["top_values"] = [[str(value), int(count)] for value, count in counts.head(top_values).items()]
+        columns.append(column)
+
+    return {
+        "rows": int(len(df)),
+        "columns": int(len(df.columns)),
+        "column_profiles": columns,
+        "numeric_columns": [str(col) for col in numeric_columns]
+    }
+
+def typed_frame(df: pd.DataFrame, profile: Dict[str, Any]) -> pd.DataFrame:
+    """Convert profiled numeric columns to floats and date columns to ISO dates"""
+    cells = df.fillna("").astype(str).apply(lambda col: col.str.strip())
+    typed = cells.replace("", None)
+    numeric_columns = profile["numeric_columns"]
+    if numeric_columns:
+        typed[numeric_columns] = _numeric_frame(cells[numeric_columns])
+    for column in profile["column_profiles"]:
+        if column["type"] == "date":
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                dates = pd.to_datetime(cells[column["name"]], errors="coerce", format="mixed")
+            typed[column["name"]] = dates.dt.strftime("%Y-%m-%d").where(dates.notna(), None)
+    return typed
+
+def _parse_dates(values: pd.Series) -> Optional[pd.Series]:
+    """Parse a column as dates when most values look like dates"""
+    if values.empty or not values.str.contains(r"\d").all():
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        # Check a sample first so free text doesn't pay for a full parse
+        sample = pd.to_datetime(values.head(50), errors="coerce", format="mixed")
+        if sample.notna().mean() < _TYPE_THRESHOLD:
+            return None
+        dates = pd.to_datetime(values, errors="coerce", format="mixed")
+    dates = dates.dropna()
+    return dates if len(dates) >= _TYPE_THRESHOLD * len(values) else None
+
+def _clip(value: Any, limit: int = _MAX_VALUE_CHARS) -> str:
+    text = str(value)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def _column_line(column: Dict[str, Any]) -> str:
+    prefix = f"- {_clip(column['name'])} ({column['type']}, {column['non_empty']} non-empty)"
+    if column["type"] == "numeric":
+        return (
+            f"{prefix}: min {_format_number(column['min'])}, max {_format_number(column['max'])}, "
+            f"mean {_format_number(column['mean'])}, sum {_format_number(column['sum'])}"
+        )
+    details = f"{column['distinct']} distinct"
+    if column["type"] == "date":
+        details = f"{column['min']} to {column['max']}, {details}"
+    if column["top_values"]:
+        details += "; top " + ", ".join(f'"{_clip(value)}" ({count})' for value, count in column["top_values"])
+    return f"{prefix}: {details}"
+
+def format_profile(profile: Dict[str, Any], max_chars: Optional[int] = None) -> str:
+    """Render a profile as compact prompt text, dropping trailing columns beyond max_chars"""
+    lines = [f"Table profile ({profile['rows']} rows x {profile['columns']} columns):"]
+    used = len(lines[0])
+    columns = profile["column_profiles"]
+    for position, column in enumerate(columns):
+        line = _column_line(column)
+        # Leave room for the "more columns" note
+        if max_chars and used + len(line) + 1 > max_chars - 40:
+            lines.append(f"- ... {len(columns) - position} more column(s) not profiled")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+def sample_rows(df: pd.DataFrame, profile: Dict[str, Any], limit: Optional[int] = None) -> List[int]:
+    """Pick representative row positions: head, tail, numeric extremes, then evenly spaced rows"""
+    limit = limit or config.TABLE_PROMPT_SAMPLE_ROWS
+    total = len(df)
+    if total <= limit:
+        return list(range(total))
+
+    chosen = dict.fromkeys([0, 1, 2, total - 1])
+    if profile["numeric_columns"]:
+        cells = df[profile["numeric_columns"]].fillna("").astype(str)
+        numeric = _numeric_frame(cells).to_numpy(dtype=float)
+        valid = ~np.isnan(numeric).all(axis=0)
+        if valid.any():
+            for position in np.concatenate([
+                np.nanargmax(numeric[:, valid], axis=0), np.nanargmin(numeric[:, valid], axis=0)
+            ]):
+                chosen[int(position)] = None
+    for position in np.linspace(0, total - 1, limit, dtype=int):
+        chosen[int(position)] = None
+
+    return sorted(list(chosen)[:limit])
+
+def _markdown_rows(df: pd.DataFrame, positions: List[int]) -> str:
+    header = "| " + " | ".join(str(col) for col in df.columns) + " |"
+    separator = "| " + " | ".join("---" for _ in df.columns) + " |"
+    rows = ["| " + " | ".join(str(cell) for cell in df.iloc[position]) + " |" for position in positions]
+    return "\n".join([header, separator] + rows)
+
+def build_table_prompt(
+    table_body: str,
+    max_chars: Optional[int] = None,
+    sample_limit: Optional[int] = None
+) -> TablePrompt:
+    """Small tables pass through verbatim; large ones become a profile plus a bounded excerpt"""
+    max_chars = max_chars or config.TABLE_PROMPT_MAX_CHARS
+    if not config.TABLE_PROFILE_ENABLED or len(table_body) <= max_chars:
+        return TablePrompt(table_body, False, len(table_body), None)
+
+    try:
+        df = parse_table_body(table_body)
+        profile = profile_table(df) if df is not None else None
+    except Exception as e:
+        logger.warning(f"Table profiling failed: {str(e)}")
+        df, profile = None, None
+
+    if profile is None:
+        # Unparseable: send the head of the table rather than all of it
+        return TablePrompt(
+            f"{table_body[:max_chars]}\n[... truncated, {len(table_body)} characters total]",
+            False, len(table_body), None
+        )
+
+    # The profile gets at most half the budget, the row excerpt the rest
+    profile_text = format_profile(profile, max_chars // 2)
+    positions = sample_rows(df, profile, sample_limit)
+    excerpt = _markdown_rows(df, positions)
+    excerpt_budget = max_chars - len(profile_text) - 60
+    if len(excerpt) > excerpt_budget:
+        excerpt = f"{excerpt[:excerpt_budget]}\n[... excerpt truncated]"
+
+    text = (
+        f"{profile_text}\n\n"
+        f"Representative rows ({len(positions)} of {profile['rows']}):\n{excerpt}"
+    )
+    return TablePrompt(text, True, len(table_body), profile)
@@ -0,0 +1,368 @@
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import logging
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from .config import config
+from .table_profile import parse_table_body, profile_table, typed_frame
+
+logger = logging.getLogger(__name__)
+
+_SHEET_HEADER = re.compile(r"^Sheet:\s*(.+?)(?:\s*\(rows \d+-\d+ of \d+\))?\s*$")
+
+# Aggregate intent, checked in order
+_AGGREGATE_PATTERNS = [
+    ("AVG", re.compile(r"\b(average|avg|mean)\b")),
+    ("COUNT", re.compile(r"\b(how many|count|number of)\b")),
+    ("SUM", re.compile(r"\b(total|sum|combined|overall)\b")),
+    ("MAX", re.compile(r"\b(max|maximum|highest|largest|biggest|most)\b")),
+    ("MIN", re.compile(r"\b(min|minimum|lowest|smallest|least|fewest)\b")),
+]
+_GROUP_PATTERN = re.compile(r"\b(?:by|per|for each|each|across)\s+(\w+(?:\s+\w+)?)")
+# Tokens that only signal aggregate intent; they must not also match a column ("Total", "Count")
+_TRIGGER_TOKENS = {"average", "avg", "mean", "how", "many", "count", "number", "total", "sum", "combined",
+                   "overall", "max", "maximum", "highest", "largest", "biggest", "most", "min", "minimum",
+                   "lowest", "smallest", "least", "fewest"}
+# Text columns with more distinct values than this are not used for filter matching
+_MAX_FILTER_VALUES = 200
+
+class AggregateResult(NamedTuple):
+    table: Dict[str, Any]  # Catalog entry
+    function: str
+    measure: Optional[str]
+    group_by: Optional[str]
+    filters: Dict[str, str]
+    rows: List[Tuple]
+    sql: str
+
+def table_sheet_name(table_body: str) -> Optional[str]:
+    """Sheet name from an Excel chunk header line, if any"""
+    first_line = table_body.lstrip().split("\n", 1)[0].strip()
+    match = _SHEET_HEADER.match(first_line)
+    return match.group(1) if match else None
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _tokens(text: str) -> List[str]:
+    """Lowercase word tokens with a light plural strip"""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(token) > 3 and token.endswith("es") and not token.endswith("ses"):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+def _column_score(column_name: str, query_tokens: set) -> float:
+    """Share of a column name's tokens that appear in the query"""
+    name_tokens = _tokens(column_name)
+    if not name_tokens:
+        return 0.0
+    return sum(1 for token in name_tokens if token in query_tokens) / len(name_tokens)
+
+class TableStore:
+    """SQLite store of typed table data keyed by document, sheet and page"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # table_name -> ((created_at, row_count), {column: distinct values})
+        self._values_cache: Dict[str, Tuple[Tuple[float, int], Dict[str, List[Any]]]] = {}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS table_catalog (
+                    table_name TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    sheet TEXT,
+                    page_idx INTEGER,
+                    caption TEXT,
+                    columns TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_table_catalog_doc ON table_catalog (doc_id, sheet)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def add_document_tables(self, doc_id: str, items: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Replace a document's stored tables with the given table items.
+
+        Excel chunks of the same sheet with the same columns are merged into one table. New
+        tables are written under staging names first (pandas commits as it writes) and swapped
+        in with the catalog in one transaction, so a crash never leaves the catalog pointing
+        at missing or partial tables.
+        """
+        stats = {"tables": 0, "rows": 0, "skipped": 0}
+        with self._lock, self._connect() as conn:
+            sheet_tables: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+            # Final table name -> catalog row; the data sits in "stage_<table name>" until the swap
+            catalog: Dict[str, List[Any]] = {}
+            try:
+                for position, item in enumerate(items):
+                    table_body = item.get("table_body") or ""
+                    df = parse_table_body(table_body)
+                    if df is None or df.empty:
+                        stats["skipped"] += 1
+                        continue
+
+                    profile = profile_table(df)
+                    typed = typed_frame(df, profile)
+                    sheet = table_sheet_name(table_body)
+                    key = (sheet, tuple(typed.columns))
+
+                    if sheet and key in sheet_tables:
+                        table_name = sheet_tables[key]
+                        typed.to_sql(f"stage_{table_name}", conn, if_exists="append", index=False)
+                        catalog[table_name][6] += len(typed)
+                    else:
+                        table_name = "tbl_" + hashlib.md5(f"{doc_id}:{position}".encode()).hexdigest()[:16]
+                        catalog[table_name] = [
+                            table_name, doc_id, sheet, item.get("page_idx", 0),
+                            "; ".join(item.get("table_caption") or []),
+                            json.dumps(self._catalog_columns(profile)), len(typed), time.time()
+                        ]
+                        typed.to_sql(f"stage_{table_name}", conn, if_exists="replace", index=False)
+                        if sheet:
+                            sheet_tables[key] = table_name
+                        stats["tables"] += 1
+                    stats["rows"] += len(typed)
+
+                conn.execute("BEGIN IMMEDIATE")
+                self._delete_document(conn, doc_id)
+                for table_name in catalog:
+                    conn.execute(f"ALTER TABLE {_quote('stage_' + table_name)} RENAME TO {_quote(table_name)}")
+                    self._values_cache.pop(table_name, None)
+                conn.executemany("INSERT OR REPLACE INTO table_catalog VALUES (?, ?, ?, ?, ?, ?, ?, ?)", catalog.values())
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                for table_name in catalog:
+                    conn.execute(f"DROP TABLE IF EXISTS {_quote('stage_' + table_name)}")
+                conn.commit()
+                raise
+
+        return stats
+
+    def _catalog_columns(self, profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Column names and types, marking low-cardinality text columns usable as filters"""
+        columns = []
+        for column in profile["column_profiles"]:
+            columns.append({
+                "name": column["name"],
+                "type": column["type"],
+                "filterable": column["type"] != "numeric" and column["distinct"] <= _MAX_FILTER_VALUES
+            })
+        return columns
+
+    def _delete_document(self, conn: sqlite3.Connection, doc_id: str):
+        for (table_name,) in conn.execute("SELECT table_name FROM table_catalog WHERE doc_id = ?", (doc_id,)).fetchall():
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+            self._values_cache.pop(table_name, None)
+        conn.execute("DELETE FROM table_catalog WHERE doc_id = ?", (doc_id,))
+
+    def delete_document(self, doc_id: str):
+        """Remove all stored tables for a document"""
+        with self._lock, self._connect() as conn:
+            self._delete_document(conn, doc_id)
+
+    def list_tables(self, doc_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Catalog entries, optionally for one document"""
+        query = "SELECT table_name, doc_id, sheet, page_idx, caption, columns, row_count, created_at FROM table_catalog"
+        params: Tuple = ()
+        if doc_id:
+            query += " WHERE doc_id = ?"
+            params = (doc_id,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created_at DESC", params).fetchall()
+            tables = []
+            for table_name, row_doc_id, sheet, page_idx, caption, columns, row_count, created_at in rows:
+                columns = json.loads(columns)
+                values = self._filter_values(conn, table_name, (created_at, row_count), columns)
+                for column in columns:
+                    column["values"] = values.get(column["name"])
+                tables.append({
+                    "table_name": table_name, "doc_id": row_doc_id, "sheet": sheet, "page_idx": page_idx,
+                    "caption": caption, "columns": columns, "row_count": row_count
+                })
+        return tables
+
+    def _filter_values(
+        self,
+        conn: sqlite3.Connection,
+        table_name: str,
+        version: Tuple[float, int],
+        columns: List[Dict[str, Any]]
+    ) -> Dict[str, List[Any]]:
+        """Distinct values of a table's filterable columns, cached until the table is rewritten or grows"""
+        with self._lock:
+            cached = self._values_cache.get(table_name)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        values = {}
+        for column in columns:
+            if column["filterable"]:
+                values[column["name"]] = [
+                    value for (value,) in conn.execute(
+                        f"SELECT DISTINCT {_quote(column['name'])} FROM {_quote(table_name)} "
+                        f"WHERE {_quote(column['name'])} IS NOT NULL LIMIT {_MAX_FILTER_VALUES + 1}"
+                    )
+                ]
+        with self._lock:
+            self._values_cache[table_name] = (version, values)
+        return values
+
+    def answer_aggregate(self, query: str, doc_ids: Optional[List[str]] = None) -> Optional[AggregateResult]:
+        """Recognize an aggregate question and compute it over the table it confidently targets"""
+        lowered = query.lower()
+        function = next((name for name, pattern in _AGGREGATE_PATTERNS if pattern.search(lowered)), None)
+        if function is None:
+            return None
+
+        tables = [table for table in self.list_tables() if not doc_ids or table["doc_id"] in doc_ids]
+        plans = [plan for plan in (self._plan(table, function, lowered) for table in tables) if plan]
+        if not plans:
+            return None
+
+        # Highest score wins; list_tables is newest first so ties favour recent documents
+        _, table, function, measure, group_by, filters = max(plans, key=lambda plan: plan[0])
+        return self._execute(table, function, measure, group_by, filters)
+
+    def _plan(self, table: Dict[str, Any], function: str, lowered_query: str):
+        """Pick measure, group-by and filter columns for a table, None if it doesn't fit.
+
+        A table fits when the question names it (sheet, caption or table name) or hits both a
+        measure and a group-by/filter column; a lone keyword like "total" matching a column is
+        not enough.
+        """
+        query_tokens = set(_tokens(lowered_query)) - _TRIGGER_TOKENS
+        columns = table["columns"]
+
+        measure, measure_score = None, 0.0
+        for column in columns:
+            if column["type"] == "numeric":
+                score = _column_score(column["name"], query_tokens)
+                if score > measure_score:
+                    measure, measure_score = column["name"], score
+        # "How many units..." names a numeric column: that's a sum, not a row count
+        if function == "COUNT" and measure_score == 1.0:
+            function = "SUM"
+        elif function == "COUNT":
+            measure, measure_score = None, 0.0
+        if measure is None and function != "COUNT":
+            return None
+
+        group_by, group_score = None, 0.0
+        group_phrases = [set(_tokens(phrase)) for phrase in _GROUP_PATTERN.findall(lowered_query)]
+        for column in columns:
+            if column["name"] == measure:
+                continue
+            for phrase_tokens in group_phrases:
+                score = _column_score(column["name"], phrase_tokens)
+                if score > group_score:
+                    group_by, group_score = column["name"], score
+
+        filters: Dict[str, str] = {}
+        for column in columns:
+            if column["name"] in (measure, group_by) or not column["values"]:
+                continue
+            if len(column["values"]) > _MAX_FILTER_VALUES:
+                continue
+            for value in column["values"]:
+                value_text = str(value).strip()
+                if len(value_text) > 1 and re.search(r"(?<!\w)" + re.escape(value_text.lower()) + r"(?!\w)", lowered_query):
+                    filters[column["name"]] = value_text
+                    break
+
+        referenced = self._referenced(table, query_tokens, lowered_query)
+        if function == "COUNT":
+            matched = group_score > 0 and bool(filters)
+        else:
+            matched = measure_score > 0 and (group_score > 0 or bool(filters))
+        if not (referenced or matched):
+            return None
+
+        score = measure_score + group_score + len(filters) + int(referenced)
+        return score, table, function, measure, group_by, filters
+
+    def _referenced(self, table: Dict[str, Any], query_tokens: set, lowered_query: str) -> bool:
+        """Whether the question names this table by sheet, caption or table name"""
+        if table["table_name"] in lowered_query:
+            return True
+        if table["sheet"] and _column_score(table["sheet"], query_tokens) == 1.0:
+            return True
+        return bool(table["caption"]) and _column_score(table["caption"], query_tokens) >= 0.5
+
+    def _execute(
+        self,
+        table: Dict[str, Any],
+        function: str,
+        measure: Optional[str],
+        group_by: Optional[str],
+        filters: Dict[str, str]
+    ) -> AggregateResult:
+        aggregate = f"{function}({_quote(measure) if measure else '*'})"
+        select = f"{_quote(group_by)}, {aggregate}" if group_by else aggregate
+        sql = f"SELECT {select} FROM {_quote(table['table_name'])}"
+        if filters:
+            sql += " WHERE " + " AND ".join(f"{_quote(column)} = ? COLLATE NOCASE" for column in filters)
+        if group_by:
+            sql += f" GROUP BY {_quote(group_by)} ORDER BY 2 DESC LIMIT {config.TABLE_QUERY_MAX_GROUPS}"
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, tuple(filters.values())).fetchall()
+        return AggregateResult(table, function, measure, group_by, filters, rows, sql)
+
+def format_aggregate_result(result: AggregateResult) -> str:
+    """Render a computed aggregate as answer-prompt context"""
+    table = result.table
+    source = f"document {table['doc_id']}, page {table['page_idx']}"
+    if table["sheet"]:
+        source += f", sheet {table['sheet']}"
+    if table["caption"]:
+        source += f", caption \"{table['caption']}\""
+
+    label = f"{result.function}({result.measure or '*'})"
+    description = label
+    if result.group_by:
+        description += f" grouped by {result.group_by}"
+    if result.filters:
+        description += " where " + " and ".join(f"{column} = {value}" for column, value in result.filters.items())
+
+    lines = [
+        f"Computed from table {table['table_name']} ({source}, {table['row_count']} rows):",
+        description
+    ]
+    if result.group_by:
+        lines.append(f"| {result.group_by} | {label} |")
+        lines.append("| --- | --- |")
+        lines.extend(f"| {group} | {_format_value(value)} |" for group, value in result.rows)
+    else:
+        lines.append(f"Result: {_format_value(result.rows[0][0] if result.rows else None)}")
+    return "\n".join(lines)
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return "no matching rows"
+    if isinstance(value, float):
+        return f"{int(value):,}" if value.is_integer() else f"{value:,.4f}".rstrip("0").rstrip(".")
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
@@ -4,6 +4,8 @@ import json
 import hashlib
 import base64
 import time
+import fcntl
+from contextlib import contextmanager
 from pathlib import Path
 import numpy as np
 from .config import config
@@ -29,15 +31,29 @@ def encode_image_to_base64(image_path: str) -> str:
         return base64.b64encode(f.read()).decode()
 
 def save_json(data: Any, file_path: Path):
-    """Save data as JSON"""
-    with open(file_path, "w") as f:
+    """Save data as JSON (atomically, so readers never see a partial file)"""
+    tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=2)
+    tmp_path.replace(file_path)
 
 def load_json(file_path: Path) -> Any:
     """Load data from JSON"""
     with open(file_path) as f:
         return json.load(f)
 
+@contextmanager
+def file_lock(file_path: Path):
+    """Exclusive lock on `<file_path>.lock` shared by all ingest worker processes"""
+    lock_path = file_path.with_suffix(file_path.suffix + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
 class VectorIndex:
     def __init__(self, vectors_dir: Path):
         self.vectors_dir = vectors_dir
@@ -175,16 +191,24 @@ class DocumentRegistry:
         self.registry_dir = registry_dir
         self.registry_file = registry_dir / "document_registry.json"
         self.registry = {}
+        self._version = None
         self._load_registry()
     
     def _load_registry(self):
-        """Load document registry from disk"""
-        if self.registry_file.exists():
+        """Load document registry from disk if another process changed it"""
+        if not self.registry_file.exists():
+            return
+        stat = self.registry_file.stat()
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version != self._version:
             self.registry = load_json(self.registry_file)
+            self._version = version
     
     def _save_registry(self):
         """Save document registry to disk"""
         save_json(self.registry, self.registry_file)
+        stat = self.registry_file.stat()
+        self._version = (stat.st_ino, stat.st_mtime_ns)
     
     def register_document(
         self,
@@ -193,19 +217,24 @@ class DocumentRegistry:
         metadata: Dict[str, Any]
     ):
         """Register a document"""
-        self.registry[doc_id] = {
-            "file_path": file_path,
-            "registered_at": time.time(),
-            **metadata
-        }
-        self._save_registry()
+        # Read-modify-write under the lock so concurrent workers don't drop entries
+        with file_lock(self.registry_file):
+            self._load_registry()
+            self.registry[doc_id] = {
+                "file_path": file_path,
+                "registered_at": time.time(),
+                **metadata
+            }
+            self._save_registry()
     
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """Get document metadata"""
+        self._load_registry()
         return self.registry.get(doc_id)
     
     def list_documents(self) -> List[Dict[str, Any]]:
         """List all registered documents"""
+        self._load_registry()
         return [
             {"doc_id": doc_id, **metadata}
             for doc_id, metadata in self.registry.items()
@@ -213,6 +242,8 @@ class DocumentRegistry:
     
     def remove_document(self, doc_id: str):
         """Remove document from registry"""
-        if doc_id in self.registry:
-            del self.registry[doc_id]
-            self._save_registry()
\ No newline at end of file
+        with file_lock(self.registry_file):
+            self._load_registry()
+            if doc_id in self.registry:
+                del self.registry[doc_id]
+                self._save_registry()
\ No newline at end of file
@@ -0,0 +1,161 @@
+from typing import Dict, Any, List, NamedTuple, Optional
+import logging
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "c": "http://schemas.openxmlformats.org/drawingml/2006/chart",
+}
+_R_ID = f"{{{NS['r']}}}id"
+_R_EMBED = f"{{{NS['r']}}}embed"
+
+class DrawingObject(NamedTuple):
+    kind: str  # "image" or "chart"
+    row: int  # 0-based anchor row
+    col: int  # 0-based anchor column
+    name: str
+    description: str
+    part: str  # Media or chart part inside the package
+    chart: Optional[Dict[str, Any]]
+
+def _relationships(zf: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    """Relationship id -> resolved target part for a package part"""
+    rels_part = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    try:
+        root = ET.fromstring(zf.read(rels_part))
+    except KeyError:
+        return {}
+
+    relationships = {}
+    for rel in root.findall("rel:Relationship", NS):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            continue
+        if target.startswith("/"):
+            resolved = target.lstrip("/")
+        else:
+            resolved = posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+        relationships[rel.get("Id")] = resolved
+    return relationships
+
+def sheet_parts(zf: zipfile.ZipFile) -> List[tuple]:
+    """(sheet name, part) for every sheet and chartsheet in workbook order"""
+    workbook_part = "xl/workbook.xml"
+    relationships = _relationships(zf, workbook_part)
+    root = ET.fromstring(zf.read(workbook_part))
+    return [
+        (sheet.get("name"), relationships.get(sheet.get(_R_ID)))
+        for sheet in root.findall("main:sheets/main:sheet", NS)
+        if relationships.get(sheet.get(_R_ID))
+    ]
+
+def _anchor_position(anchor: ET.Element) -> tuple:
+    start = anchor.find("xdr:from", NS)
+    if start is None:
+        return 0, 0
+    return int(start.findtext("xdr:row", "0", NS)), int(start.findtext("xdr:col", "0", NS))
+
+def sheet_drawings(zf: zipfile.ZipFile, sheet_part: str) -> List[DrawingObject]:
+    """Images and charts anchored on a sheet, in anchor order"""
+    objects = []
+    for drawing_part in _relationships(zf, sheet_part).values():
+        if not drawing_part.startswith("xl/drawings/") or not drawing_part.endswith(".xml"):
+            continue
+        drawing_rels = _relationships(zf, drawing_part)
+        root = ET.fromstring(zf.read(drawing_part))
+
+        for anchor in list(root):
+            row, col = _anchor_position(anchor)
+            for picture in anchor.iter(f"{{{NS['xdr']}}}pic"):
+                properties = picture.find("xdr:nvPicPr/xdr:cNvPr", NS)
+                blip = picture.find(".//a:blip", NS)
+                media_part = drawing_rels.get(blip.get(_R_EMBED)) if blip is not None else None
+                if media_part:
+                    objects.append(DrawingObject(
+                        "image", row, col,
+                        properties.get("name", "") if properties is not None else "",
+                        properties.get("descr", "") if properties is not None else "",
+                        media_part, None
+                    ))
+            for frame in anchor.iter(f"{{{NS['xdr']}}}graphicFrame"):
+                properties = frame.find("xdr:nvGraphicFramePr/xdr:cNvPr", NS)
+                chart_ref = frame.find(".//c:chart", NS)
+                chart_part = drawing_rels.get(chart_ref.get(_R_ID)) if chart_ref is not None else None
+                if chart_part:
+                    objects.append(DrawingObject(
+                        "chart", row, col,
+                        properties.get("name", "") if properties is not None else "",
+                        properties.get("descr", "") if properties is not None else "",
+                        chart_part, parse_chart(zf, chart_part)
+                    ))
+
+    return sorted(objects, key=lambda obj: (obj.row, obj.col))
+
+def _cached_points(element: Optional[ET.Element]) -> List[str]:
+    """Values from a chart numCache/strCache, positioned by point index"""
+    if element is None:
+        return []
+    points = {}
+    for point in element.iter(f"{{{NS['c']}}}pt"):
+        points[int(point.get("idx", "0"))] = point.findtext("c:v", "", NS)
+    if not points:
+        return []
+    return [points.get(i, "") for i in range(max(points) + 1)]
+
+def _find_first(element: ET.Element, *paths: str) -> Optional[ET.Element]:
+    for path in paths:
+        found = element.find(path, NS)
+        if found is not None:
+            return found
+    return None
+
+def parse_chart(zf: zipfile.ZipFile, chart_part: str) -> Dict[str, Any]:
+    """Title, type and cached series data of a chart part"""
+    try:
+        root = ET.fromstring(zf.read(chart_part))
+    except (KeyError, ET.ParseError) as e:
+        logger.warning(f"Failed to read chart {chart_part}: {str(e)}")
+        return {"title": "", "chart_type": "", "categories": [], "series": []}
+
+    chart = root.find("c:chart", NS)
+    title_element = chart.find("c:title", NS) if chart is not None else None
+    title = "".join(text.text or "" for text in title_element.iter(f"{{{NS['a']}}}t")) if title_element is not None else ""
+
+    chart_type, categories, series = "", [], []
+    plot_area = chart.find("c:plotArea", NS) if chart is not None else None
+    if plot_area is not None:
+        for plot in plot_area:
+            tag = plot.tag.split("}")[-1]
+            if not tag.endswith("Chart"):
+                continue
+            chart_type = chart_type or tag
+            for ser in plot.findall("c:ser", NS):
+                name = "".join(value.text or "" for value in ser.iterfind("c:tx//c:v", NS))
+                values = _cached_points(_find_first(ser, "c:val", "c:yVal"))
+                if not categories:
+                    categories = _cached_points(_find_first(ser, "c:cat", "c:xVal"))
+                series.append({"name": name or f"Series {len(series) + 1}", "values": values})
+
+    return {"title": title, "chart_type": chart_type, "categories": categories, "series": series}
+
+def read_package_drawings(file_path: str) -> Dict[str, List[DrawingObject]]:
+    """Sheet name -> anchored images and charts for an .xlsx package"""
+    drawings: Dict[str, List[DrawingObject]] = {}
+    with zipfile.ZipFile(file_path) as zf:
+        for sheet_name, part in sheet_parts(zf):
+            try:
+                objects = sheet_drawings(zf, part)
+            except (KeyError, ET.ParseError) as e:
+                logger.warning(f"Failed to read drawings for sheet {sheet_name}: {str(e)}")
+                continue
+            if objects:
+                drawings[sheet_name] = objects
+    return drawings
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming Excel fallback against the previous pandas implementation
+
+Usage: python workspace_test/bench_excel_fallback.py [rows] [sheets]
+"""
+
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from openpyxl import Workbook
+
+def build_workbook(path: Path, rows: int, sheets: int):
+    """Write a synthetic workbook with mixed text, numeric and date columns"""
+    workbook = Workbook(write_only=True)
+    for sheet_idx in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{sheet_idx + 1}")
+        sheet.append(["Branch", "Product", "Date", "Quantity", "Amount", "Notes"])
+        for i in range(rows // sheets):
+            sheet.append([
+                f"Branch {i % 17}", f"Product {i % 251}", f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                i % 97, round(i * 1.37, 2), "note " * (i % 5)
+            ])
+    workbook.save(path)
+
+def pandas_parse(file_path: str) -> int:
+    """The previous implementation: read every sheet into memory, then format per cell"""
+    import pandas as pd
+
+    content_list = []
+    sheets = pd.read_excel(file_path, sheet_name=None, engine="openpyxl")
+    for sheet_name, df in sheets.items():
+        safe_df = df.copy()
+        safe_df = safe_df.where(pd.notnull(safe_df), "")
+        total_rows = len(safe_df)
+        for start in range(0, total_rows, 200):
+            end = min(start + 200, total_rows)
+            chunk_df = safe_df.iloc[start:end]
+            limited_df = chunk_df.map(lambda val: (str(val)[:500] + "…") if len(str(val)) > 500 else str(val))
+            header = list(limited_df.columns)
+            rows = [header] + limited_df.astype(str).values.tolist()
+            table_lines = ["| " + " | ".join(str(h) for h in header) + " |",
+                           "| " + " | ".join(["---"] * len(header)) + " |"]
+            for r in limited_df.astype(str).values.tolist():
+                table_lines.append("| " + " | ".join(str(c) for c in r) + " |")
+            content_list.append(f"Sheet: {sheet_name} (rows {start + 1}-{end} of {total_rows})\n" + "\n".join(table_lines))
+    return len(content_list)
+
+def streaming_parse(file_path: str) -> int:
+    import asyncio
+    from rag_core.parsers import DoclingParser
+
+    return len(asyncio.run(DoclingParser()._parse_excel_file(file_path)))
+
+def _run(name: str, file_path: str, results):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    items = {"pandas": pandas_parse, "streaming": streaming_parse}[name](file_path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results[name] = (items, elapsed, (peak - baseline) / 1024)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.xlsx"
+        start = time.perf_counter()
+        build_workbook(path, rows, sheets)
+        print(f"workbook: {rows} rows in {sheets} sheet(s), {path.stat().st_size / 1e6:.1f} MB "
+              f"(built in {time.perf_counter() - start:.1f}s)")
+
+        # Each variant runs in a fresh process so peak RSS is measured independently
+        results = multiprocessing.Manager().dict()
+        for name in ("streaming", "pandas"):
+            process = multiprocessing.Process(target=_run, args=(name, str(path), results))
+            process.start()
+            process.join()
+            items, elapsed, peak_mb = results[name]
+            print(f"{name:9}: {items} table items in {elapsed:.1f}s, peak RSS +{peak_mb:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Benchmark extract_references on a synthetic 50k-item content list
+
+Usage: python workspace_test/bench_extract_references.py [items] [pairwise_items]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.context_extractor import ContextExtractor
+from test_extract_references import pairwise_references, synthetic_content
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    pairwise_items = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    extractor = ContextExtractor()
+
+    # ~12 items per page, page-ordered like parser output
+    content = sorted(
+        synthetic_content(items, pages=max(1, items // 12)),
+        key=lambda item: item.get("page_idx", 0)
+    )
+
+    start = time.perf_counter()
+    references = extractor.extract_references(content)
+    indexed_time = time.perf_counter() - start
+    print(f"indexed:  {items} items -> {len(references)} references in {indexed_time:.2f}s")
+
+    # The pairwise version is quadratic; time it on a prefix and extrapolate
+    sample = content[:pairwise_items]
+    start = time.perf_counter()
+    expected = pairwise_references(extractor, sample)
+    pairwise_time = time.perf_counter() - start
+    assert extractor.extract_references(sample) == expected
+    estimated = pairwise_time * (items / pairwise_items) ** 2
+    print(f"pairwise: {pairwise_items} items in {pairwise_time:.2f}s "
+          f"(~{estimated:.0f}s estimated for {items} items, {estimated / indexed_time:.0f}x slower)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed asset store (dedup, hardlinks, hardlinked output trees)
+"""
+
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.asset_store import asset_store_root, link_or_copy, staging_dir, store_asset, store_asset_bytes
+from rag_core.config import config
+
+def test_identical_images_stored_once():
+    original = config.WORKING_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        config.WORKING_DIR = str(Path(tmp) / "storage")
+        try:
+            scratch = staging_dir()
+            first, second = scratch / "a.PNG", scratch / "b.png"
+            first.write_bytes(b"same pixels")
+            second.write_bytes(b"same pixels")
+
+            stored = store_asset(first)
+            assert stored == store_asset(second) == store_asset_bytes(b"same pixels", ".png")
+            assert stored.parent.parent == asset_store_root() and stored.suffix == ".png"
+            # Same filesystem: the stored file is the staged file, not a copy
+            assert stored.stat().st_ino == first.stat().st_ino
+            assert len(list(asset_store_root().rglob("*.png"))) == 1
+        finally:
+            config.WORKING_DIR = original
+
+def test_copytree_with_hardlinks():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "mineru" / "auto" / "images"
+        source.mkdir(parents=True)
+        (source / "fig.jpg").write_bytes(b"jpeg")
+        target = Path(tmp) / "output"
+        shutil.copytree(source.parent.parent, target, dirs_exist_ok=True, copy_function=link_or_copy)
+        shutil.copytree(source.parent.parent, target, dirs_exist_ok=True, copy_function=link_or_copy)
+        copied = target / "auto" / "images" / "fig.jpg"
+        assert copied.read_bytes() == b"jpeg" and copied.stat().st_ino == (source / "fig.jpg").stat().st_ino
+
+if __name__ == "__main__":
+    test_identical_images_stored_once()
+    test_copytree_with_hardlinks()
+    print("✅ Asset store tests passed")
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Test checkpointed ingest stages (resume after the last completed stage / item)
+"""
+
+import sys
+import asyncio
+import inspect
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.checkpoints import StageCheckpoints, purge_checkpoints
+from rag_core.config import config
+from rag_core.parsers import ParserFactory
+from rag_core.pipeline import RAGPipeline
+from rag_core.schemas import ProcessingStatus
+
+def test_stages_resume_for_same_content():
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = StageCheckpoints("task", "hash-1", root=Path(tmp))
+        assert checkpoints.completed() == []
+        checkpoints.save("parse", [{"type": "text", "text": "Hello", "page_idx": 0}], {"parser_used": "mineru"})
+        checkpoints.save("convert", "/tmp/doc.pdf", {"parser_used": None})
+        checkpoints.save("separate", ["Hello", [], {"structure": {"total_pages": 1}}], {"parser_used": "mineru", "image_triage": {}})
+
+        # A retry (new process) sees the stages in pipeline order with their outputs
+        resumed = StageCheckpoints("task", "hash-1", root=Path(tmp))
+        assert resumed.completed() == ["convert", "parse", "separate"]
+        assert resumed.load("parse")[0]["text"] == "Hello"
+        assert resumed.last_ingest_summary() == {"parser_used": "mineru", "image_triage": {}}
+
+        # Different content under the same task id starts over
+        changed = StageCheckpoints("task", "hash-2", root=Path(tmp))
+        assert changed.completed() == [] and not (Path(tmp) / "task" / "parse.json").exists()
+
+        changed.save("parse", [], None)
+        os.utime(Path(tmp) / "task" / "manifest.json", (time.time() - 7200, time.time() - 7200))
+        original = config.CHECKPOINT_DIR
+        config.CHECKPOINT_DIR = tmp
+        try:
+            assert purge_checkpoints(older_than_seconds=3600) == 1
+        finally:
+            config.CHECKPOINT_DIR = original
+        assert not (Path(tmp) / "task").exists()
+
+def test_multimodal_items_resume():
+    """Finished items are not analyzed again; failed ones (None) are"""
+    calls = []
+    fail = {2}
+
+    async def worker(item):
+        calls.append(item["n"])
+        await asyncio.sleep(0)
+        return None if item["n"] in fail else {"n": item["n"], "analysis": f"item {item['n']}"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = RAGPipeline.__new__(RAGPipeline)
+        pipeline.config = config
+        pipeline.kv_dir = Path(tmp)
+        items = [{"n": n} for n in range(5)]
+
+        checkpoints = StageCheckpoints("mm", "hash", root=Path(tmp) / "checkpoints")
+        first = asyncio.run(pipeline._run_multimodal_items(items, worker, None, checkpoints))
+        assert first[2] is None and sorted(calls) == [0, 1, 2, 3, 4]
+
+        # The provider recovers: only the failed item runs on the retry
+        calls.clear()
+        fail.clear()
+        status = ProcessingStatus(task_id="mm", status="processing", progress=0.6)
+        retried = StageCheckpoints("mm", "hash", root=Path(tmp) / "checkpoints")
+        second = asyncio.run(pipeline._run_multimodal_items(items, worker, status, retried))
+        assert calls == [2]
+        assert [result["n"] for result in second] == [0, 1, 2, 3, 4]
+        assert status.multimodal_done == 5
+
+def _throttled():
+    """A Bedrock throttling error, wrapped the way BedrockLLM raises it"""
+    from botocore.exceptions import ClientError
+
+    try:
+        raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeModel")
+    except ClientError as e:
+        try:
+            raise RuntimeError("Bedrock invoke_model failed: ThrottlingException: Rate exceeded") from e
+        except RuntimeError as wrapped:
+            return wrapped
+
+def test_failing_items_are_skipped_not_retried_forever():
+    """A bad item is skipped at once, a throttled one after the attempt limit; an all-items failure is retried"""
+    errors = {1: ValueError("unsupported image format"), 2: _throttled()}
+
+    async def worker(item):
+        if item["n"] in errors:
+            raise errors[item["n"]]
+        return {"n": item["n"]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = RAGPipeline.__new__(RAGPipeline)
+        pipeline.config = config
+        pipeline.kv_dir = Path(tmp)
+        items = [{"n": n} for n in range(4)]
+
+        attempts = []
+        for _ in range(config.MULTIMODAL_ITEM_MAX_ATTEMPTS):
+            summary = {"storage_issues": [], "errors": {}}
+            checkpoints = StageCheckpoints("skip", "hash", root=Path(tmp) / "checkpoints")
+            attempts.append(asyncio.run(pipeline._run_multimodal_items(items, worker, None, checkpoints, summary)))
+        # Item 1 never holds up the stage; item 2 does until its last attempt
+        assert attempts[0] == [{"n": 0}, None, {"n": 3}]
+        assert attempts[-2] == [{"n": 0}, None, {"n": 3}]
+        assert attempts[-1] == [{"n": 0}, {"n": 3}]
+        assert summary["errors"]["Multimodal item skipped"] == 2
+        assert any("item 1 after 1 attempt(s): unsupported image format" in issue for issue in summary["storage_issues"])
+
+        # When every item fails the provider is the likely cause, so nothing is skipped
+        errors = {n: ValueError("invalid api key") for n in range(3)}
+        checkpoints = StageCheckpoints("all", "hash", root=Path(tmp) / "checkpoints")
+        assert asyncio.run(pipeline._run_multimodal_items(items[:3], worker, None, checkpoints, summary)) == [None] * 3
+
+class _Images:
+    """Content separator returning three images, and a page index for their context"""
+
+    def __init__(self, image_dir: Path):
+        self.items = []
+        for n in range(3):
+            path = image_dir / f"figure{n}.png"
+            path.write_bytes(b"png")
+            self.items.append({"type": "image", "img_path": str(path), "page_idx": n})
+
+    @property
+    def processor(self):
+        return self
+
+    @property
+    def context_extractor(self):
+        return self
+
+    def build_index(self, content_list):
+        return self
+
+    def get_context(self, item):
+        return "Quarterly report"
+
+    async def process_document_content(self, content_list, task_id):
+        return "Quarterly revenue grew.", self.items, {"structure": {"total_pages": 3}}
+
+class _Stub:
+    def register_document(self, **kwargs):
+        pass
+
+    async def store_document(self, **kwargs):
+        pass
+
+class _Writer:
+    def __init__(self):
+        self.inserts = []
+
+    async def ainsert(self, **kwargs):
+        from lightrag.lightrag import LightRAG
+
+        # Accept only what the installed LightRAG.ainsert accepts
+        inspect.signature(LightRAG.ainsert).bind(None, **kwargs)
+        self.inserts.append(kwargs)
+        return "track"
+
+async def _parse(file_path, parser_type=None, ingest_summary=None):
+    ingest_summary["parser_used"] = "test"
+    return [{"type": "text", "text": "Quarterly revenue grew.", "page_idx": 0}]
+
+def test_vision_outage_fails_job_and_retry_resumes():
+    """Items that failed during an outage fail the job; the retry analyzes only those and inserts them all"""
+    analyzed = []
+    outage = {"figure1.png"}
+
+    async def analyze(item, context, doc_id, ingest_summary):
+        name = Path(item["img_path"]).name
+        analyzed.append(name)
+        if name in outage:
+            raise TimeoutError("vision provider timed out")
+        return f"analysis of {name}"
+
+    async def process_text(*args):
+        return 1, 0
+
+    async def count_chunks(doc_id):
+        return 1
+
+    original_parse, original_dir = ParserFactory.parse_document, config.CHECKPOINT_DIR
+    ParserFactory.parse_document = staticmethod(_parse)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.CHECKPOINT_DIR = str(Path(tmp) / "checkpoints")
+            source = Path(tmp) / "report.pdf"
+            source.write_bytes(b"%PDF-1.4")
+
+            pipeline = RAGPipeline.__new__(RAGPipeline)
+            pipeline.config = config
+            pipeline.kv_dir = Path(tmp)
+            pipeline.lightrag = object()
+            pipeline.index_writer = _Writer()
+            pipeline.image_dedup = None
+            pipeline.table_store = None
+            pipeline.content_separator = _Images(Path(tmp))
+            pipeline.doc_registry = pipeline.storage_manager = _Stub()
+            pipeline._analyze_image_item = analyze
+            pipeline._process_text_content = process_text
+            pipeline._count_chunks = count_chunks
+
+            try:
+                asyncio.run(pipeline.process_document(str(source), "outage"))
+                assert False, "expected the multimodal stage to fail"
+            except RuntimeError as e:
+                assert "1 of 3 multimodal item(s) failed" in str(e)
+            # Nothing half-inserted; finished work is kept for the retry
+            assert pipeline.index_writer.inserts == []
+            kept = json.loads((Path(config.CHECKPOINT_DIR) / "outage" / "manifest.json").read_text())
+            assert "text_index" in kept["stages"] and "multimodal" not in kept["stages"]
+
+            # The provider recovers
+            analyzed.clear()
+            outage.clear()
+            status = asyncio.run(pipeline.process_document(str(source), "outage"))
+            assert status.status == "completed"
+            assert analyzed == ["figure1.png"]
+            [insert] = pipeline.index_writer.inserts
+            assert insert["ids"] == ["outage_multimodal"]
+            sections = insert["input"].split("\n\n")
+            assert [section.splitlines()[-1] for section in sections] == [
+                "Analysis: analysis of figure0.png", "Analysis: analysis of figure1.png", "Analysis: analysis of figure2.png"
+            ]
+    finally:
+        ParserFactory.parse_document = original_parse
+        config.CHECKPOINT_DIR = original_dir
+
+if __name__ == "__main__":
+    test_stages_resume_for_same_content()
+    test_multimodal_items_resume()
+    test_failing_items_are_skipped_not_retried_forever()
+    test_vision_outage_fails_job_and_retry_resumes()
+    print("✅ Checkpoint tests passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test page-indexed context extraction
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.context_extractor import ContextExtractor, count_tokens
+
+def _content_list(pages: int = 30, paragraphs: int = 3):
+    content = []
+    for page in range(pages):
+        for n in range(paragraphs):
+            content.append({"type": "text", "text": f"Paragraph {n} on page {page}.", "page_idx": page})
+        content.append({"type": "image", "img_path": f"img_{page}.png", "image_caption": [f"Figure {page}"], "page_idx": page})
+        content.append({"type": "table", "table_body": "|a|", "table_caption": [], "page_idx": page})
+    return content
+
+def _full_scan_context(extractor, content_source, current_item):
+    """Reference implementation: scan every item in the document"""
+    current_page = current_item.get("page_idx", 0)
+    start_page = max(0, current_page - extractor.context_window)
+    end_page = current_page + extractor.context_window + 1
+    parts = []
+    for item in content_source:
+        item_page = item.get("page_idx", 0)
+        if start_page <= item_page < end_page:
+            text_content = extractor._extract_text_from_item(item)
+            if text_content:
+                parts.append(text_content if item_page == current_page else f"[Page {item_page}] {text_content}")
+    return "\n".join(parts)
+
+def test_index_matches_full_scan_within_budget():
+    """With a generous budget the index returns exactly what a full scan would"""
+    extractor = ContextExtractor({"context_window": 2, "max_context_tokens": 100000})
+    content = _content_list()
+    index = extractor.build_index(content)
+
+    for item in content:
+        if item["type"] != "text":
+            assert index.get_context(item) == _full_scan_context(extractor, content, item)
+
+    assert index.get_context({"page_idx": 500}) == ""
+
+def test_context_honors_token_budget():
+    """Truncated context stays within max_context_tokens and keeps the current page"""
+    extractor = ContextExtractor({"context_window": 2, "max_context_tokens": 40})
+    content = _content_list()
+    index = extractor.build_index(content)
+
+    context = index.get_context({"type": "image", "page_idx": 10})
+    assert count_tokens(context) <= 40
+    assert "Paragraph 0 on page 10." in context
+    assert "[Page 12]" not in context
+
+    # A single oversized line on the current page is cut to the budget
+    long_doc = [{"type": "text", "text": "word " * 2000, "page_idx": 0}]
+    long_context = extractor.build_index(long_doc).get_context({"page_idx": 0})
+    assert 0 < count_tokens(long_context) <= 40
+
+if __name__ == "__main__":
+    test_index_matches_full_scan_within_budget()
+    test_context_honors_token_budget()
+    print("✅ Context index tests passed")
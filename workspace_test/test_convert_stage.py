@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test that Office→PDF conversion runs as a pipeline stage without blocking the event loop
+"""
+
+import sys
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import rag_core.pipeline as pipeline_module
+import rag_core.conversion.excel_to_pdf as excel_to_pdf
+from rag_core.pipeline import RAGPipeline
+
+def _slow_conversion(file_path: str):
+    # Stands in for LOOL retries / a long soffice run, both synchronous
+    time.sleep(0.3)
+    return str(Path(file_path).with_suffix(".pdf")), f"/debug/{Path(file_path).stem}", None
+
+def test_conversion_runs_off_the_event_loop():
+    async def run():
+        pipeline = RAGPipeline.__new__(RAGPipeline)
+        ingest_summary = {"errors": {}, "warnings": {}}
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        beat = asyncio.create_task(heartbeat())
+        pdf_path = await pipeline._convert_document("/uploads/report.xlsx", ingest_summary)
+        beat.cancel()
+        return pdf_path, ingest_summary, ticks
+
+    original = pipeline_module.convert_excel_to_pdf
+    pipeline_module.convert_excel_to_pdf = _slow_conversion
+    try:
+        pdf_path, ingest_summary, ticks = asyncio.run(run())
+    finally:
+        pipeline_module.convert_excel_to_pdf = original
+
+    assert pdf_path == "/uploads/report.pdf"
+    # Other coroutines (API requests) kept running during the conversion
+    assert ticks >= 10
+    conversion = ingest_summary["conversion"]
+    assert conversion["source"] == "/uploads/report.xlsx" and conversion["seconds"] >= 0.3
+    # Artifacts come from this conversion, not whichever ran last in the process
+    assert conversion["debug_artifacts_dir"] == "/debug/report"
+
+def test_soffice_runs_use_private_profiles():
+    """Concurrent soffice runs must not share (and lock) one user profile"""
+    commands = []
+
+    def fake_run(cmd, timeout=600):
+        commands.append(cmd)
+        outdir = Path(cmd[cmd.index("--outdir") + 1])
+        (outdir / (Path(cmd[-1]).stem + ".pdf")).write_bytes(b"%PDF-1.4")
+
+    original = excel_to_pdf._run
+    excel_to_pdf._run = fake_run
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "slides.pptx"
+            source.write_bytes(b"pptx")
+            for _ in range(2):
+                excel_to_pdf._convert_with_soffice(source, Path(tmp) / "out", "pdf")
+    finally:
+        excel_to_pdf._run = original
+
+    profiles = [arg for cmd in commands for arg in cmd if arg.startswith("-env:UserInstallation=file://")]
+    assert len(profiles) == 2 and profiles[0] != profiles[1]
+
+if __name__ == "__main__":
+    test_conversion_runs_off_the_event_loop()
+    test_soffice_runs_use_private_profiles()
+    print("✅ Conversion stage tests passed")
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test the in-process Docling parser (item mapping and fallback without Docling)
+"""
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.docling_convert import DOCLING_AVAILABLE, get_document_converter
+from rag_core.parsers import DoclingParser
+
+def test_equation_items_keep_latex():
+    items = DoclingParser()._process_content_list([
+        {"type": "text", "text": "Energy", "text_level": 1, "page_idx": 0},
+        {"type": "equation", "latex": "E = mc^2", "text": "E = mc^2", "page_idx": 0},
+    ])
+    assert [item["type"] for item in items] == ["text", "equation"]
+    assert items[1]["latex"] == "E = mc^2"
+
+def test_converter_reused_or_fallback():
+    """One converter serves every document; without Docling the text fallback is used"""
+    if DOCLING_AVAILABLE:
+        assert get_document_converter() is get_document_converter()
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "notes.md"
+        path.write_text("# Notes\n\nFirst paragraph.")
+        items = asyncio.run(DoclingParser().parse_document(str(path)))
+    assert [(item["text"], item["text_level"]) for item in items] == [("Notes", 1), ("First paragraph.", 0)]
+
+if __name__ == "__main__":
+    test_equation_items_keep_latex()
+    test_converter_reused_or_fallback()
+    print("✅ Docling parser tests passed")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test that indexed extract_references matches the pairwise reference implementation
+"""
+
+import sys
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.context_extractor import ContextExtractor
+
+def pairwise_references(extractor, content_list):
+    """Original O(n^2) implementation, kept as the reference"""
+    references = []
+    for i, item1 in enumerate(content_list):
+        for j, item2 in enumerate(content_list[i+1:], i+1):
+            if abs(item1.get("page_idx", 0) - item2.get("page_idx", 0)) <= extractor.context_window:
+                if extractor._items_are_related(item1, item2):
+                    references.append({
+                        "source": extractor._get_item_identifier(item1),
+                        "target": extractor._get_item_identifier(item2),
+                        "type": "contextual",
+                        "confidence": 0.8
+                    })
+    return references
+
+CAPTIONS = [[], ["Figure 3: revenue"], ["See table below"], ["Image of the plant", "Table 2"], ["logo"]]
+
+def synthetic_content(count, pages, seed=0):
+    """Random mix of text, images, tables and equations with shuffled page order"""
+    rng = random.Random(seed)
+    content = []
+    for n in range(count):
+        kind = rng.choice(["text", "text", "image", "table", "equation"])
+        item = {"type": kind}
+        # Some items have no page_idx at all, which differs from an explicit 0
+        if rng.random() > 0.05:
+            item["page_idx"] = rng.randrange(pages)
+        if kind == "text":
+            item["text"] = f"paragraph {n}"
+        elif kind == "image":
+            item["img_path"] = f"/tmp/img_{n}.png"
+            item["image_caption"] = rng.choice(CAPTIONS)
+        elif kind == "table":
+            item["table_body"] = "|a|b|"
+            item["table_caption"] = [f"Table {n}"]
+        else:
+            item["latex"] = "x^2"
+        content.append(item)
+    return content
+
+def test_indexed_references_match_pairwise():
+    """Same references in the same order across windows and page layouts"""
+    for window in (0, 1, 2, 3):
+        extractor = ContextExtractor()
+        extractor.context_window = window
+        for seed in range(3):
+            content = synthetic_content(400, pages=60, seed=seed)
+            assert extractor.extract_references(content) == pairwise_references(extractor, content)
+
+    # Page-ordered documents, as parsers produce them
+    extractor = ContextExtractor()
+    content = sorted(synthetic_content(600, pages=40, seed=9), key=lambda item: item.get("page_idx", 0))
+    assert extractor.extract_references(content) == pairwise_references(extractor, content)
+
+if __name__ == "__main__":
+    test_indexed_references_match_pairwise()
+    print("✅ extract_references equivalence test passed")
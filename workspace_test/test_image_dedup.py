@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test perceptual-hash image deduplication
+"""
+
+import sys
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.image_hashing import ImageDedupIndex, dhash, hamming_distances, image_fingerprint
+
+def _gradient_image(path: Path, size=(120, 80), flip=False, noise=0):
+    """Write a horizontal gradient, optionally mirrored or with light noise"""
+    gradient = np.tile(np.linspace(0, 255, size[0]), (size[1], 1))
+    if flip:
+        gradient = gradient[:, ::-1]
+    if noise:
+        gradient = gradient + np.random.default_rng(0).integers(-noise, noise, gradient.shape)
+    Image.fromarray(np.clip(gradient, 0, 255).astype(np.uint8)).save(path)
+    return str(path)
+
+def test_dhash_groups_near_duplicates():
+    """Resized/noisy copies hash close together, different images do not"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        original = dhash(_gradient_image(tmp / "a.png"))
+        resized = dhash(_gradient_image(tmp / "b.png", size=(240, 160)))
+        noisy = dhash(_gradient_image(tmp / "c.png", noise=3))
+        mirrored = dhash(_gradient_image(tmp / "d.png", flip=True))
+
+        distances = hamming_distances(np.array([resized, noisy, mirrored], dtype=np.uint64), original)
+        assert distances[0] <= 4
+        assert distances[1] <= 4
+        assert distances[2] > 32
+        assert dhash(str(tmp / "missing.png")) is None
+
+        # A sha256 computed earlier (image_metadata) is used instead of hashing the file again
+        path = str(tmp / "a.png")
+        assert image_fingerprint(path) == (original, hashlib.sha256(Path(path).read_bytes()).hexdigest())
+        assert image_fingerprint(path, "known-sha256") == (original, "known-sha256")
+
+def test_index_reuses_analysis_within_and_across_documents():
+    """One vision call per group, concurrent duplicates share the in-flight call"""
+    calls = []
+
+    async def fake_analysis(name):
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        return f"analysis of {name}"
+
+    async def run(index):
+        return await asyncio.gather(
+            index.analyze(0xFFFF0000FFFF0000, "sha-logo1", "logo1.png", "doc1", lambda: fake_analysis("logo1")),
+            index.analyze(0xFFFF0000FFFF0001, "sha-logo2", "logo2.png", "doc1", lambda: fake_analysis("logo2")),
+            index.analyze(0x0123456789ABCDEF, "sha-chart", "chart.png", "doc1", lambda: fake_analysis("chart")),
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "image_hashes.json"
+        results = asyncio.run(run(ImageDedupIndex(index_path, max_distance=4)))
+
+        assert calls == ["logo1", "chart"]
+        assert results[0] == ("analysis of logo1", None)
+        assert results[1] == ("analysis of logo1", "inflight")
+        assert results[2] == ("analysis of chart", None)
+
+        # Nothing is written until save(); a fresh index then sees the stored hashes
+        assert not index_path.exists()
+        index = ImageDedupIndex(index_path, max_distance=4)
+        asyncio.run(index.analyze(0x1, "sha-x", "x.png", "doc1", lambda: fake_analysis("x")))
+        index.save()
+
+        reloaded = ImageDedupIndex(index_path, max_distance=4)
+        analysis, source = asyncio.run(
+            reloaded.analyze(0x1, "sha-x", "x_copy.png", "doc2", lambda: fake_analysis("x_copy"))
+        )
+        assert (analysis, source) == ("analysis of x", "doc1")
+        assert "x_copy" not in calls
+
+def test_near_duplicates_are_not_shared_across_documents():
+    """Same layout, different bytes: another document gets its own analysis"""
+    calls = []
+
+    async def fake_analysis(name):
+        calls.append(name)
+        return f"analysis of {name}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "image_hashes.json"
+        index = ImageDedupIndex(index_path, max_distance=4)
+        asyncio.run(index.analyze(0x1, "sha-q1", "q1_chart.png", "doc1", lambda: fake_analysis("q1")))
+        analysis, source = asyncio.run(
+            index.analyze(0x3, "sha-q2", "q2_chart.png", "doc2", lambda: fake_analysis("q2"))
+        )
+        assert (analysis, source) == ("analysis of q2", None)
+        index.save()
+
+        # Deleting a document (API process) drops its analyses, also from a worker's loaded index
+        assert ImageDedupIndex(index_path).remove_document("doc1") == 1
+        assert index.find(0x1, "sha-q1", "doc3") is None
+        assert index.find(0x3, "sha-q2", "doc3")["doc_id"] == "doc2"
+
+        # The index is capped, keeping the newest entries
+        capped = ImageDedupIndex(index_path, max_entries=2)
+        for n in range(3):
+            capped.add(0x10 + n, f"sha-{n}", f"a{n}", f"{n}.png", "doc4")
+        capped.save()
+        assert len(ImageDedupIndex(index_path)._entries) == 2
+
+if __name__ == "__main__":
+    test_dhash_groups_near_duplicates()
+    test_index_reuses_analysis_within_and_across_documents()
+    test_near_duplicates_are_not_shared_across_documents()
+    print("✅ Image dedup tests passed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test image preparation (downsizing, format choice, content-hash cache)
+"""
+
+import sys
+import asyncio
+import base64
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.image_prep import ImagePreparer
+
+def test_prepare_downsizes_and_picks_format():
+    """Large photos become bounded JPEGs, flat graphics stay PNG, alpha is preserved"""
+    rng = np.random.default_rng(7)
+    preparer = ImagePreparer(max_side=512, jpeg_quality=80, prefer_webp=False, cache_size=8, max_workers=2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        photo = tmp / "photo.png"
+        Image.fromarray(rng.integers(0, 255, (1500, 2000, 3), dtype=np.uint8)).save(photo)
+
+        chart = tmp / "chart.bmp"
+        chart_pixels = np.full((1200, 1600, 3), 255, dtype=np.uint8)
+        chart_pixels[200:1000, 300:400] = (30, 90, 200)
+        Image.fromarray(chart_pixels).save(chart)
+
+        overlay = tmp / "overlay.png"
+        Image.fromarray(rng.integers(0, 255, (900, 900, 4), dtype=np.uint8), mode="RGBA").save(overlay)
+
+        prepared_photo = asyncio.run(preparer.prepare(str(photo)))
+        assert prepared_photo.mime_type == "image/jpeg"
+        assert max(prepared_photo.width, prepared_photo.height) == 512
+        assert prepared_photo.encoded_bytes < prepared_photo.original_bytes
+        decoded = Image.open(io.BytesIO(base64.b64decode(prepared_photo.data)))
+        assert decoded.format == "JPEG" and decoded.size == (512, 384)
+
+        prepared_chart = preparer.prepare_sync(str(chart))
+        assert prepared_chart.mime_type == "image/png"
+        assert prepared_chart.encoded_bytes < prepared_chart.original_bytes
+
+        prepared_overlay = preparer.prepare_sync(str(overlay))
+        assert prepared_overlay.mime_type == "image/png"
+        assert Image.open(io.BytesIO(base64.b64decode(prepared_overlay.data))).mode == "RGBA"
+
+def test_prepare_caches_by_content_hash():
+    """Identical bytes under different paths are encoded once"""
+    preparer = ImagePreparer(max_side=256, cache_size=2, max_workers=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pixels = np.random.default_rng(1).integers(0, 255, (600, 600, 3), dtype=np.uint8)
+        for name in ("a.png", "b.png"):
+            Image.fromarray(pixels).save(tmp / name)
+
+        first = preparer.prepare_sync(str(tmp / "a.png"))
+        second = preparer.prepare_sync(str(tmp / "b.png"))
+        assert first == second
+        assert preparer.get_stats()["prepared"] == 1
+        assert preparer.get_stats()["cache_hits"] == 1
+
+if __name__ == "__main__":
+    test_prepare_downsizes_and_picks_format()
+    test_prepare_caches_by_content_hash()
+    print("✅ Image preparation tests passed")
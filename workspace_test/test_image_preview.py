@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test lazy image previews and eager lightweight image metadata
+"""
+
+import sys
+import asyncio
+import hashlib
+import threading
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.processors import ContentProcessor, ContentSeparator, get_image_preview, _render_image_preview
+
+def test_metadata_is_eager_and_preview_is_lazy():
+    """Items carry size/format/hash but no preview; previews render once and are cached"""
+    rng = np.random.default_rng(3)
+    processor = ContentProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(6):
+            path = Path(tmp) / f"photo_{n}.png"
+            Image.fromarray(rng.integers(0, 255, (200 + n, 300, 3), dtype=np.uint8)).save(path)
+            paths.append(str(path))
+
+        content_list = [{"type": "text", "text": "intro", "page_idx": 0}]
+        content_list += [{"type": "image", "img_path": path, "page_idx": 0} for path in paths]
+        _, items = processor.separate_content(content_list)
+
+        # Order is preserved even though metadata is computed in the worker pool
+        assert [item["img_path"] for item in items] == paths
+        for item in items:
+            assert "image_preview" not in item
+            metadata = item["image_metadata"]
+            assert metadata["format"] == "PNG"
+            assert metadata["sha256"] == hashlib.sha256(Path(item["img_path"]).read_bytes()).hexdigest()
+            assert metadata["file_size"] == Path(item["img_path"]).stat().st_size
+
+        _render_image_preview.cache_clear()
+        preview = get_image_preview(paths[0], max_size=100)
+        assert Image.open(io.BytesIO(preview)).size == (100, 67)
+        assert get_image_preview(paths[0], max_size=100) == preview
+        assert _render_image_preview.cache_info().hits == 1
+
+def test_separation_runs_off_the_event_loop():
+    """Metadata and the reference sweep run in threads while other tasks keep running"""
+    separator = ContentSeparator()
+    loop_thread = threading.get_ident()
+    calls = []
+    separate_content = separator.processor.separate_content
+
+    def blocking_separate(content_list, triage_summary=None):
+        # Slow separation: count how often the loop ran the ticker meanwhile
+        ticks_before = len(ticks)
+        for _ in range(100):
+            if len(ticks) >= ticks_before + 3:
+                break
+            threading.Event().wait(0.01)
+        calls.append((threading.get_ident(), len(ticks) - ticks_before))
+        return separate_content(content_list, triage_summary)
+
+    separator.processor.separate_content = blocking_separate
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.005)
+
+    async def run():
+        task = asyncio.create_task(ticker())
+        try:
+            content_list = [{"type": "text", "text": "Figure 1 shows revenue", "page_idx": 0}]
+            return await separator.process_document_content(content_list, "doc")
+        finally:
+            task.cancel()
+
+    full_text, items, summary = asyncio.run(run())
+    [(thread, ticks_during)] = calls
+    assert thread != loop_thread and ticks_during >= 3
+    assert "Figure 1 shows revenue" in full_text and items == [] and summary["doc_id"] == "doc"
+
+if __name__ == "__main__":
+    test_metadata_is_eager_and_preview_is_lazy()
+    test_separation_runs_off_the_event_loop()
+    print("✅ Image preview tests passed")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test local image triage (skip / caption-only / full analysis)
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.processors import ContentProcessor
+
+def _save(path: Path, array: np.ndarray) -> str:
+    Image.fromarray(array.astype(np.uint8)).save(path)
+    return str(path)
+
+def _line_chart(path: Path) -> str:
+    """Sparse line chart on white: low histogram entropy, but real content"""
+    img = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(img)
+    draw.line([(60, 540), (780, 540)], fill="black", width=2)
+    draw.line([(60, 20), (60, 540)], fill="black", width=2)
+    draw.line([(60 + i * 60, 300 + int(150 * np.sin(i / 2))) for i in range(13)], fill=(30, 90, 200), width=3)
+    img.save(path)
+    return str(path)
+
+def _table_strip(path: Path) -> str:
+    """One-row table rendered as a wide strip"""
+    img = Image.new("RGB", (1200, 90), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, 1199, 89], outline="black")
+    for i in range(8):
+        draw.line([(i * 150, 0), (i * 150, 89)], fill="black")
+        draw.text((i * 150 + 10, 40), f"Q{i} 1,234", fill="black")
+    img.save(path)
+    return str(path)
+
+def test_triage_classifies_images():
+    """Bullets, blanks and separators are skipped; icons are caption-only; photos get full analysis"""
+    rng = np.random.default_rng(42)
+    processor = ContentProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        images = {
+            "bullet": _save(tmp / "bullet.png", rng.integers(0, 255, (16, 16, 3))),
+            "blank": _save(tmp / "blank.png", np.full((400, 400, 3), 255)),
+            "separator": _save(tmp / "separator.png", rng.integers(0, 255, (4, 800, 3))),
+            "icon": _save(tmp / "icon.png", rng.integers(0, 255, (64, 64, 3))),
+            "photo": _save(tmp / "photo.png", rng.integers(0, 255, (300, 400, 3))),
+            "chart": _line_chart(tmp / "chart.png"),
+            "table_strip": _table_strip(tmp / "table_strip.png"),
+        }
+
+        content_list = [{"type": "image", "img_path": path, "page_idx": 0} for path in images.values()]
+        content_list.append({
+            "type": "image", "img_path": images["blank"], "page_idx": 1, "image_caption": ["Figure 2"]
+        })
+
+        triage_summary = {}
+        _, items = processor.separate_content(content_list, triage_summary)
+
+        decisions = {Path(item["img_path"]).stem: item["image_triage"] for item in items}
+        assert "bullet" not in decisions
+        assert "separator" not in decisions
+        assert decisions["icon"] == "caption_only"
+        assert decisions["photo"] == "full"
+        assert decisions["chart"] == "full"
+        assert decisions["table_strip"] == "full"
+        # The uncaptioned blank is dropped, the captioned one keeps its caption
+        assert decisions["blank"] == "caption_only"
+        assert triage_summary == {"skip": 3, "caption_only": 2, "full": 3}
+
+if __name__ == "__main__":
+    test_triage_classifies_images()
+    print("✅ Image triage test passed")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test that worker processes indexing through the single LightRAG writer keep each other's documents
+"""
+
+import sys
+import asyncio
+import json
+import multiprocessing
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.index_writer import IndexWriter, RemoteIndexWriter, serve_index_writer
+
+async def _embed(texts, **kwargs):
+    return np.array([[float(len(text) % 7 + 1), 1.0, 0.5, 0.25] for text in texts])
+
+class _CharTokenizer:
+    """Offline stand-in for tiktoken"""
+
+    def encode(self, content):
+        return [ord(char) for char in content]
+
+    def decode(self, tokens):
+        return "".join(chr(token) for token in tokens)
+
+async def _complete(prompt, **kwargs):
+    # No entities: only chunks (and their vectors) are written
+    return ""
+
+async def _fail(prompt, **kwargs):
+    raise RuntimeError("extraction model unavailable")
+
+def _lightrag(working_dir: str, llm_model_func=_complete):
+    from lightrag.lightrag import LightRAG
+    from lightrag.utils import EmbeddingFunc, Tokenizer
+    from lightrag.kg.shared_storage import initialize_pipeline_status
+
+    lightrag = LightRAG(
+        working_dir=working_dir,
+        embedding_func=EmbeddingFunc(embedding_dim=4, func=_embed, max_token_size=8192),
+        llm_model_func=llm_model_func,
+        tokenizer=Tokenizer("chars", _CharTokenizer()),
+    )
+
+    async def init():
+        await lightrag.initialize_storages()
+        await initialize_pipeline_status()
+
+    asyncio.run(init())
+    return lightrag
+
+def _index(requests, responses, slot, writer_pid, doc_id):
+    writer = RemoteIndexWriter(requests, responses, slot, writer_pid)
+    text = f"Document {doc_id} reports quarterly revenue for its region in some detail."
+    asyncio.run(writer.ainsert(input=text, ids=[doc_id], file_paths=[f"{doc_id}.pdf"]))
+
+def test_two_processes_keep_both_documents():
+    with tempfile.TemporaryDirectory() as tmp:
+        # The API process: loaded before the documents exist, reloads when the writer stamps a version
+        reader = IndexWriter(_lightrag(tmp))
+
+        ctx = multiprocessing.get_context("fork")
+        requests = ctx.Queue()
+        responses = [ctx.Queue(), ctx.Queue()]
+        writer_pid = ctx.Value("i", 0)
+        writer = ctx.Process(target=serve_index_writer, args=(lambda: IndexWriter(_lightrag(tmp)), requests, responses))
+        writer.start()
+        writer_pid.value = writer.pid
+
+        workers = [
+            ctx.Process(target=_index, args=(requests, responses[slot], slot, writer_pid, f"doc-{slot}"))
+            for slot in range(2)
+        ]
+        for proc in workers:
+            proc.start()
+        for proc in workers:
+            proc.join(60)
+            assert proc.exitcode == 0
+        requests.put(None)
+        writer.join(60)
+        assert writer.exitcode == 0
+
+        # Both documents' vectors are on disk
+        with open(Path(tmp) / "vdb_chunks.json") as f:
+            vectors = json.load(f)
+        assert {row["full_doc_id"] for row in vectors["data"]} == {"doc-0", "doc-1"}
+
+        async def stored_docs(lightrag):
+            chunks = [await lightrag.chunks_vdb.get_by_id(chunk_id) for chunk_id in lightrag.text_chunks._data]
+            return {chunk["full_doc_id"] for chunk in chunks if chunk}
+
+        async def refresh():
+            return await reader.refresh(), await stored_docs(reader.lightrag)
+
+        reloaded, docs = asyncio.run(refresh())
+        assert reloaded and docs == {"doc-0", "doc-1"}
+        assert asyncio.run(reader.refresh()) is False
+
+def test_concurrent_inserts_return_once_indexed():
+    """A second insert must not return while the first one is still running LightRAG's queue"""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = IndexWriter(_lightrag(tmp))
+
+        async def insert(doc_id):
+            text = f"Document {doc_id} reports quarterly revenue for its region in some detail."
+            await writer.ainsert(input=text, ids=[doc_id], file_paths=[f"{doc_id}.pdf"])
+            [doc] = await writer.lightrag.doc_status.get_by_ids([doc_id])
+            return doc["status"]
+
+        async def run():
+            return await asyncio.gather(insert("doc-a"), insert("doc-b"))
+
+        assert asyncio.run(run()) == ["processed", "processed"]
+
+def test_failed_extraction_raises():
+    """LightRAG marks the document failed instead of raising; the writer raises for it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = IndexWriter(_lightrag(tmp, llm_model_func=_fail))
+        try:
+            asyncio.run(writer.ainsert(input="Revenue grew in every region.", ids=["doc-x"], file_paths=["x.pdf"]))
+            assert False, "expected the insert to fail"
+        except RuntimeError as e:
+            assert "did not index doc-x" in str(e)
+
+if __name__ == "__main__":
+    test_two_processes_keep_both_documents()
+    test_concurrent_inserts_return_once_indexed()
+    test_failed_extraction_raises()
+    print("✅ Index writer tests passed")
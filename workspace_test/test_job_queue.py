@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the persistent ingest job queue and the ingest worker loop
+"""
+
+import sys
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.ingest_worker import IngestWorker
+from rag_core.jobs import SQLiteJobQueue
+from rag_core.schemas import ProcessingStatus
+
+def test_sqlite_queue_lifecycle():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteJobQueue(Path(tmp) / "jobs.sqlite")
+        queue.enqueue("a", {"file_path": "/tmp/a.pdf", "parser_type": None})
+        queue.enqueue("b", {"file_path": "/tmp/b.pdf", "parser_type": "mineru"})
+
+        # A second handle on the same file sees the jobs (restart / separate process)
+        reopened = SQLiteJobQueue(Path(tmp) / "jobs.sqlite")
+        job = reopened.claim("w1")
+        assert job["task_id"] == "a" and job["status"] == "processing" and job["attempts"] == 1
+        assert job["file_path"] == "/tmp/a.pdf" and job["worker"] == "w1"
+
+        queue.update("a", progress=0.4)
+        queue.finish("a", "completed", progress=1.0, doc_id="a")
+        done = queue.get("a")
+        assert done["status"] == "completed" and done["progress"] == 1.0 and done["doc_id"] == "a"
+        assert queue.counts() == {"queued": 1, "processing": 0, "completed": 1, "failed": 0}
+
+        # A worker that stops heartbeating loses the job to the next one, up to max attempts
+        assert queue.claim("w1")["task_id"] == "b"
+        assert queue.claim("w2") is None
+        time.sleep(0.05)
+        assert queue.requeue_stale(lease_seconds=0.01, max_attempts=2) == 1
+        assert queue.claim("w2")["attempts"] == 2
+        # The first worker was only slow: its late result must not overwrite the new claim
+        assert not queue.finish("b", "failed", "late result", worker_id="w1")
+        assert queue.get("b")["status"] == "processing" and queue.get("b")["worker"] == "w2"
+        time.sleep(0.05)
+        queue.requeue_stale(lease_seconds=0.01, max_attempts=2)
+        failed = queue.get("b")
+        assert failed["status"] == "failed" and "Worker lost" in failed["error"]
+
+        # Failed jobs can be queued again; other states can't
+        assert not queue.retry("a")
+        assert queue.retry("b") and queue.get("b")["status"] == "queued" and queue.get("b")["attempts"] == 0
+        assert queue.claim("w3")["task_id"] == "b"
+        assert queue.finish("b", "failed", "still broken", worker_id="w3")
+
+        assert queue.purge(older_than_seconds=0.0001) == 2 and queue.get("a") is None
+
+class _Pipeline:
+    """Stand-in for RAGPipeline that records how many documents run at once"""
+
+    def __init__(self):
+        self.status_callback = None
+        self.active = 0
+        self.peak = 0
+
+    async def process_document(self, file_path, task_id, parser_type=None, file_hash=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        status = ProcessingStatus(task_id=task_id, status="processing", progress=0.5)
+        await self.status_callback(status)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        if file_path.endswith("bad.pdf"):
+            raise ValueError("unreadable")
+        return ProcessingStatus(task_id=task_id, status="completed", progress=1.0, doc_id=task_id, chunks_created=3)
+
+def test_worker_runs_jobs_with_bounded_concurrency():
+    async def run(queue):
+        pipeline = _Pipeline()
+        worker = IngestWorker(pipeline, queue, concurrency=2)
+        runner = asyncio.create_task(worker.run())
+        while queue.counts()["completed"] + queue.counts()["failed"] < 5:
+            await asyncio.sleep(0.02)
+        worker.stop()
+        await runner
+        return pipeline, worker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteJobQueue(Path(tmp) / "jobs.sqlite")
+        for i in range(5):
+            upload = Path(tmp) / ("bad.pdf" if i == 4 else f"doc{i}.pdf")
+            upload.write_bytes(b"%PDF")
+            queue.enqueue(f"job{i}", {"file_path": str(upload), "parser_type": None})
+
+        pipeline, worker = asyncio.run(run(queue))
+
+        assert pipeline.peak == 2
+        assert queue.get("job0")["status"] == "completed" and queue.get("job0")["chunks_created"] == 3
+        assert queue.get("job4")["status"] == "failed" and queue.get("job4")["error"] == "unreadable"
+        assert worker.stats == {"completed": 4, "failed": 1}
+        # Uploads are removed once processed; a failed job keeps its upload for a retry
+        assert [upload.name for upload in Path(tmp).glob("*.pdf")] == ["bad.pdf"]
+
+if __name__ == "__main__":
+    test_sqlite_queue_lifecycle()
+    test_worker_runs_jobs_with_bounded_concurrency()
+    print("✅ Job queue tests passed")
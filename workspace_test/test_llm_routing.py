@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test per-task LLM model routing and usage accounting
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.config import RAGConfig
+from rag_core.llm_unified import (
+    LLMUsageStats, llm_usage_scope, record_llm_usage, llm_usage,
+    make_lightrag_model_func, bind_usage_scope
+)
+
+def test_task_routing_falls_back_to_defaults():
+    """Unset tier models resolve to the base LLM / vision models"""
+    cfg = RAGConfig(LLM_MODEL="base-llm", OPENAI_LLM_MODEL=None,
+                    VISION_MODEL="base-vision", OPENAI_VISION_MODEL=None)
+
+    assert cfg.get_llm_task_config("extract")["model"] == "base-llm"
+    assert cfg.get_llm_task_config("answer")["model"] == "base-llm"
+    assert cfg.get_llm_task_config("vision")["model"] == "base-vision"
+
+    cfg = RAGConfig(LLM_EXTRACT_MODEL="cheap", LLM_ANSWER_MODEL="strong", LLM_EXTRACT_TIMEOUT=5)
+    extract = cfg.get_llm_task_config("extract")
+    assert extract["model"] == "cheap"
+    assert extract["timeout"] == 5
+    assert cfg.get_llm_task_config("answer")["model"] == "strong"
+
+    try:
+        cfg.get_llm_task_config("unknown")
+        assert False, "unknown task should be rejected"
+    except ValueError:
+        pass
+
+def test_usage_scope_collects_per_task_stats():
+    """Calls are recorded globally and in the active scope only"""
+    before = llm_usage.snapshot().get("extract", {}).get("calls", 0)
+
+    with llm_usage_scope() as scoped:
+        record_llm_usage("extract", "cheap", 0.5, 100, 20)
+        record_llm_usage("extract", "cheap", 1.5, 50, 10, error=True)
+        record_llm_usage("answer", "strong", 2.0, 400, 300)
+
+    record_llm_usage("extract", "cheap", 0.1)
+
+    snapshot = scoped.snapshot()
+    assert snapshot["extract"]["calls"] == 2
+    assert snapshot["extract"]["errors"] == 1
+    assert snapshot["extract"]["prompt_tokens"] == 150
+    assert snapshot["extract"]["avg_latency"] == 1.0
+    assert snapshot["answer"]["models"] == {"strong": 1}
+    assert llm_usage.snapshot()["extract"]["calls"] == before + 3
+
+    empty = LLMUsageStats()
+    assert empty.snapshot() == {}
+
+def test_lightrag_queue_charges_the_calling_document():
+    """LightRAG's queue workers keep the first document's context; the scope must follow each call"""
+    import lightrag.llm.openai as lightrag_openai
+    from lightrag.utils import priority_limit_async_func_call
+
+    async def fake_complete(model, prompt, **kwargs):
+        assert "usage_scope" not in kwargs
+        return prompt
+
+    original = lightrag_openai.openai_complete_if_cache
+    lightrag_openai.openai_complete_if_cache = fake_complete
+    try:
+        model_func = make_lightrag_model_func("extract")
+    finally:
+        lightrag_openai.openai_complete_if_cache = original
+
+    async def run():
+        queued = bind_usage_scope(priority_limit_async_func_call(2, queue_name="test")(model_func))
+        with llm_usage_scope() as first:
+            await queued("first document")
+        with llm_usage_scope() as second:
+            await queued("second document")
+            await queued("second document, next chunk")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.snapshot()["extract"]["calls"] == 1
+    assert second.snapshot()["extract"]["calls"] == 2
+
+if __name__ == "__main__":
+    test_task_routing_falls_back_to_defaults()
+    test_usage_scope_collects_per_task_stats()
+    test_lightrag_queue_charges_the_calling_document()
+    print("✅ LLM routing tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test MinerU worker pool configuration and CLI fallback
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.config import config
+from rag_core.mineru_pool import (
+    MINERU_AVAILABLE, MineruJobError, MineruWorkerPool, get_mineru_pool, run_mineru
+)
+
+def test_pool_sizing_from_cpu_cores():
+    """Workers are sized to cores / MINERU_CPU_PER_WORKER unless set explicitly"""
+    original = (config.MINERU_POOL_SIZE, config.MINERU_CPU_PER_WORKER)
+    try:
+        config.MINERU_POOL_SIZE, config.MINERU_CPU_PER_WORKER = 0, 2
+        pool = MineruWorkerPool()
+        assert pool.size == max(1, (os.cpu_count() or 1) // 2)
+        assert pool.settings["threads"] == 2
+        assert MineruWorkerPool(size=3).size == 3
+        # Nothing is spawned until the first job
+        assert pool.get_stats()["started"] is False
+    finally:
+        config.MINERU_POOL_SIZE, config.MINERU_CPU_PER_WORKER = original
+
+def test_cli_fallback_without_mineru():
+    """Without MinerU installed there is no pool and the async CLI path raises a job error"""
+    if MINERU_AVAILABLE:
+        return
+
+    assert get_mineru_pool() is None
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            asyncio.run(run_mineru(str(Path(tmp) / "missing.pdf"), tmp))
+            assert False, "expected MineruJobError"
+        except MineruJobError as e:
+            assert "not found" in str(e)
+
+if __name__ == "__main__":
+    test_pool_sizing_from_cpu_cores()
+    test_cli_fallback_without_mineru()
+    print("✅ MinerU pool tests passed")
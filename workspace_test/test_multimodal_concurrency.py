@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test bounded-concurrency multimodal item processing
+"""
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.config import config
+from rag_core.pipeline import RAGPipeline
+from rag_core.schemas import ProcessingStatus
+
+def _bare_pipeline(kv_dir: Path) -> RAGPipeline:
+    """Pipeline with only what _run_multimodal_items needs (no LightRAG/storage init)"""
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.config = config
+    pipeline.kv_dir = kv_dir
+    return pipeline
+
+def test_concurrency_is_bounded_and_order_preserved():
+    """Items run concurrently up to the limit and results keep input order"""
+    original_limit = config.MULTIMODAL_CONCURRENCY
+    config.MULTIMODAL_CONCURRENCY = 3
+    in_flight = 0
+    peak = 0
+
+    async def worker(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later items finish first to make ordering observable
+        await asyncio.sleep(0.01 * (10 - item["n"]))
+        in_flight -= 1
+        if item["n"] == 4:
+            return None
+        return item["n"] * 10
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = _bare_pipeline(Path(tmp))
+            status = ProcessingStatus(task_id="concurrency-test", status="processing", progress=0.6)
+            items = [{"n": n} for n in range(10)]
+
+            results = asyncio.run(pipeline._run_multimodal_items(items, worker, status))
+
+            assert results == [0, 10, 20, 30, None, 50, 60, 70, 80, 90]
+            assert peak == 3
+            assert status.multimodal_total == 10
+            assert status.multimodal_done == 10
+            assert abs(status.progress - 0.8) < 1e-9
+            assert (Path(tmp) / "status" / "concurrency-test.json").exists()
+    finally:
+        config.MULTIMODAL_CONCURRENCY = original_limit
+
+if __name__ == "__main__":
+    test_concurrency_is_bounded_and_order_preserved()
+    print("✅ Multimodal concurrency test passed")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed parse cache (keys, asset restore, LRU eviction, parser integration)
+"""
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from openpyxl import Workbook
+
+from rag_core.asset_store import store_asset_bytes
+from rag_core.config import config
+from rag_core.parse_cache import ParseCache, parse_cache_key
+from rag_core.parsers import ParserFactory, XlsxParser, MineruParser, DoclingParser
+
+def test_key_depends_on_parser_settings():
+    settings = {"parser": "MineruParser", "method": "auto", "enable_images": True, "version": "2.0"}
+    key = parse_cache_key("abc", settings)
+    assert key == parse_cache_key("abc", dict(reversed(list(settings.items()))))
+    assert key != parse_cache_key("abd", settings)
+    assert key != parse_cache_key("abc", {**settings, "enable_images": False})
+    assert key != parse_cache_key("abc", {**settings, "version": "2.1"})
+
+def test_assets_restored_and_lru_eviction():
+    """Cached image assets come back in the asset store; oldest entries go first"""
+    original = config.WORKING_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        config.WORKING_DIR = str(tmp / "storage")
+        try:
+            image = store_asset_bytes(b"x" * 1000, ".jpg")
+            items = [{"type": "text", "text": "hello", "page_idx": 0},
+                     {"type": "image", "img_path": str(image), "page_idx": 3}]
+
+            cache = ParseCache(tmp / "cache", max_bytes=2500)
+            cache.put("a" * 64, items, "mineru")
+            image.unlink()
+            cached = cache.get("a" * 64)
+            assert cached.parser_used == "mineru" and cached.content_list[0] == items[0]
+            assert cached.content_list[1]["img_path"] == str(image) and image.read_bytes() == b"x" * 1000
+
+            cache.put("b" * 64, items, "mineru")
+            cache.get("a" * 64)  # a becomes most recently used
+            cache.put("c" * 64, items, "mineru")
+            assert cache.get("b" * 64) is None
+            assert cache.get("a" * 64) is not None
+            stats = cache.get_stats()
+            assert stats["entries"] == 2 and stats["evicted"] == 1 and stats["bytes"] <= 2500
+        finally:
+            config.WORKING_DIR = original
+
+def test_parse_document_skips_parser_on_hit():
+    original = (config.WORKING_DIR, config.PARSE_CACHE_ENABLED)
+    calls = []
+    parse_workbook = XlsxParser._parse_workbook
+
+    def counting_parse(self, file_path):
+        calls.append(file_path)
+        return parse_workbook(self, file_path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        config.WORKING_DIR, config.PARSE_CACHE_ENABLED = str(tmp / "storage"), True
+        XlsxParser._parse_workbook = counting_parse
+        try:
+            workbook = Workbook()
+            workbook.active.append(["Name", "Value"])
+            workbook.active.append(["a", 1])
+            path = tmp / "small.xlsx"
+            workbook.save(path)
+
+            first, second = {}, {}
+            items = asyncio.run(ParserFactory.parse_document(str(path), ingest_summary=first))
+            cached = asyncio.run(ParserFactory.parse_document(str(path), ingest_summary=second))
+        finally:
+            XlsxParser._parse_workbook = parse_workbook
+            config.WORKING_DIR, config.PARSE_CACHE_ENABLED = original
+
+    assert len(calls) == 1
+    assert first["parse_cache"] == "stored" and second["parse_cache"] == "hit"
+    assert second["parser_used"] == "xlsx" and cached == items
+
+def test_fallback_parse_is_not_cached_under_primary_key():
+    """A transient MinerU failure served by Docling is retried with MinerU next time"""
+    original = (config.WORKING_DIR, config.PARSE_CACHE_ENABLED)
+    parsers = (MineruParser.parse_document, DoclingParser.parse_document)
+    calls = []
+    mineru_down = True
+
+    async def mineru(self, file_path):
+        calls.append("mineru")
+        if mineru_down:
+            raise TimeoutError("MinerU worker timed out")
+        return [{"type": "text", "text": "layout-aware text", "page_idx": 0}]
+
+    async def docling(self, file_path):
+        calls.append("docling")
+        return [{"type": "text", "text": "fallback text", "page_idx": 0}]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        config.WORKING_DIR, config.PARSE_CACHE_ENABLED = str(tmp / "storage"), True
+        MineruParser.parse_document, DoclingParser.parse_document = mineru, docling
+        try:
+            path = tmp / "report.pdf"
+            path.write_bytes(b"%PDF-1.4 report")
+
+            first = {}
+            items = asyncio.run(ParserFactory.parse_document(str(path), ingest_summary=first))
+            assert items[0]["text"] == "fallback text" and first["parser_used"] == "docling (fallback)"
+            assert "parse_cache" not in first
+
+            mineru_down = False
+            second, third = {}, {}
+            items = asyncio.run(ParserFactory.parse_document(str(path), ingest_summary=second))
+            asyncio.run(ParserFactory.parse_document(str(path), ingest_summary=third))
+        finally:
+            MineruParser.parse_document, DoclingParser.parse_document = parsers
+            config.WORKING_DIR, config.PARSE_CACHE_ENABLED = original
+
+    assert items[0]["text"] == "layout-aware text" and second["parse_cache"] == "stored"
+    assert third["parse_cache"] == "hit"
+    assert calls == ["mineru", "docling", "mineru"]
+
+if __name__ == "__main__":
+    test_key_depends_on_parser_settings()
+    test_assets_restored_and_lru_eviction()
+    test_parse_document_skips_parser_on_hit()
+    test_fallback_parse_is_not_cached_under_primary_key()
+    print("✅ Parse cache tests passed")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test page-range splitting of large PDFs and merging of MinerU range outputs
+"""
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from rag_core.config import config
+from rag_core.parsers import MineruParser
+
+def _blank_pdf(path: Path, pages: int):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+def test_page_ranges_and_split():
+    """Small PDFs stay whole; large ones are split into fixed-size ranges"""
+    original = (config.MINERU_PAGE_RANGE_SIZE, config.MINERU_SPLIT_MIN_PAGES)
+    parser = MineruParser()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pdf_path = tmp / "report.pdf"
+        _blank_pdf(pdf_path, 23)
+        try:
+            config.MINERU_PAGE_RANGE_SIZE, config.MINERU_SPLIT_MIN_PAGES = 10, 30
+            assert parser._page_ranges(str(pdf_path)) == [(0, 23)]
+
+            config.MINERU_SPLIT_MIN_PAGES = 20
+            ranges = parser._page_ranges(str(pdf_path))
+            assert ranges == [(0, 10), (10, 20), (20, 23)]
+        finally:
+            config.MINERU_PAGE_RANGE_SIZE, config.MINERU_SPLIT_MIN_PAGES = original
+
+        groups = [list(range(start, end)) for start, end in ranges]
+        parts = MineruParser._split_pdf(str(pdf_path), groups, tmp / "parts")
+        assert [part.name for part in parts] == [
+            "report_p0001-0010.pdf", "report_p0011-0020.pdf", "report_p0021-0023.pdf"
+        ]
+        assert [len(PdfReader(str(part)).pages) for part in parts] == [10, 10, 3]
+
+        # Scattered pages (e.g. the scanned ones) are packed into as few jobs as possible
+        original = (config.MINERU_PAGE_RANGE_SIZE, config.MINERU_SPLIT_MIN_PAGES)
+        try:
+            config.MINERU_PAGE_RANGE_SIZE, config.MINERU_SPLIT_MIN_PAGES = 2, 4
+            assert MineruParser._page_groups([1, 4, 9]) == [[1, 4, 9]]
+            assert MineruParser._page_groups([1, 4, 9, 12, 15]) == [[1, 4], [9, 12], [15]]
+            assert MineruParser._page_groups([]) == []
+        finally:
+            config.MINERU_PAGE_RANGE_SIZE, config.MINERU_SPLIT_MIN_PAGES = original
+        part = MineruParser._split_pdf(str(pdf_path), [[1, 4, 9]], tmp / "scattered")[0]
+        assert part.name == "report_p0002-0010.pdf" and len(PdfReader(str(part)).pages) == 3
+
+def test_range_content_list_offsets_and_assets():
+    """Range outputs get document page numbers; their images land in the asset store"""
+    parser = MineruParser()
+    original = config.WORKING_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        config.WORKING_DIR = str(tmp / "storage")
+        merged = []
+        try:
+            for start, end in [(0, 10), (10, 20)]:
+                label = f"pages_{start + 1:04d}-{end:04d}"
+                stem = f"report_p{start + 1:04d}-{end:04d}"
+                # Same layout and relative image names MinerU writes for each part
+                method_dir = tmp / "output" / label / parser.config["method"]
+                (method_dir / "images").mkdir(parents=True)
+                (method_dir / "images" / "fig.jpg").write_bytes(label.encode())
+                (method_dir / f"{stem}_content_list.json").write_text(json.dumps([
+                    {"type": "text", "text": f"first page of {label}", "page_idx": 0},
+                    {"type": "image", "img_path": "images/fig.jpg", "page_idx": 2},
+                ]))
+                merged.extend(parser._load_content_list(method_dir, stem, list(range(start, end))))
+            assert parser._load_content_list(tmp / "missing", "report", [5]) == []
+        finally:
+            config.WORKING_DIR = original
+
+        assert [item["page_idx"] for item in merged] == [0, 2, 10, 12]
+        images = [item for item in merged if item["type"] == "image"]
+        assert [Path(item["img_path"]).read_bytes() for item in images] == [b"pages_0001-0010", b"pages_0011-0020"]
+        assert all(Path(item["img_path"]).parent.parent.name == "by_hash" for item in images)
+
+if __name__ == "__main__":
+    test_page_ranges_and_split()
+    test_range_content_list_offsets_and_assets()
+    print("✅ PDF page range tests passed")
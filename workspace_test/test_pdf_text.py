@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the PyMuPDF text-layer pre-pass (page classification, extraction, MinerU bypass)
+"""
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.config import config
+from rag_core.parsers import DoclingParser, MineruParser
+from rag_core.pdf_text import scan_pdf
+
+BODY = "Quarterly revenue grew across all regions while operating costs stayed flat. " * 8
+
+def _text_page(doc, title: str):
+    page = doc.new_page()
+    page.insert_text((72, 72), title, fontsize=20)
+    page.insert_textbox(fitz.Rect(72, 100, 540, 700), BODY, fontsize=10)
+
+def build_pdf(path: Path, scanned: bool = True):
+    doc = fitz.open()
+    _text_page(doc, "Introduction")
+    if scanned:
+        # Scanned page: a full-page image and no text layer
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 260), False)
+        pixmap.set_rect(pixmap.irect, (200, 200, 200))
+        doc.new_page().insert_image(fitz.Rect(0, 0, 612, 792), pixmap=pixmap)
+        # Ruled table: many vector lines around the text
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 300), BODY, fontsize=10)
+        for i in range(30):
+            page.draw_line((72, 320 + i * 10), (540, 320 + i * 10))
+            page.draw_line((72 + i * 15, 320), (72 + i * 15, 610))
+    _text_page(doc, "Results")
+    doc.save(str(path))
+
+def test_scan_routes_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "mixed.pdf"
+        build_pdf(path)
+        scan = asyncio.run(scan_pdf(str(path)))
+
+    assert scan.page_count == 4 and scan.ocr_pages == [1, 2]
+    assert sorted({item["page_idx"] for item in scan.text_items}) == [0, 3]
+    headings = [item["text"] for item in scan.text_items if item["text_level"] == 1]
+    assert headings == ["Introduction", "Results"]
+    assert any("Quarterly revenue" in item["text"] for item in scan.text_items if item["text_level"] == 0)
+
+def test_scan_in_process_pool():
+    original = config.PDF_TEXT_POOL_MIN_PAGES
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "mixed.pdf"
+        build_pdf(path)
+        config.PDF_TEXT_POOL_MIN_PAGES = 1
+        try:
+            pooled = asyncio.run(scan_pdf(str(path)))
+        finally:
+            config.PDF_TEXT_POOL_MIN_PAGES = original
+        threaded = asyncio.run(scan_pdf(str(path)))
+    assert pooled == threaded
+
+def test_figures_and_borderless_tables_go_to_mineru():
+    """A small raster figure or a column-aligned table on a text page still needs layout analysis"""
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = fitz.open()
+        # Paragraph plus a 200x150 figure (~6% of the page)
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 300), BODY, fontsize=10)
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 150), False)
+        pixmap.set_rect(pixmap.irect, (40, 90, 200))
+        page.insert_image(fitz.Rect(72, 320, 272, 470), pixmap=pixmap)
+        # Paragraph plus a table without rules
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 300), BODY, fontsize=10)
+        for row, cells in enumerate([("Region", "Q1", "Q2", "Q3")] + [("North", "120", "135", "150")] * 4):
+            for col, cell in enumerate(cells):
+                page.insert_text((72 + col * 120, 340 + row * 16), cell, fontsize=10)
+        _text_page(doc, "Results")
+        path = Path(tmp) / "figures.pdf"
+        doc.save(str(path))
+        scan = asyncio.run(scan_pdf(str(path)))
+
+    assert scan.ocr_pages == [0, 1]
+    assert {item["page_idx"] for item in scan.text_items} == {2}
+
+def test_born_digital_pdf_skips_mineru():
+    """A PDF where every page has a text layer never reaches MinerU"""
+    original = config.WORKING_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "digital.pdf"
+        build_pdf(path, scanned=False)
+        config.WORKING_DIR = str(Path(tmp) / "storage")
+        try:
+            items = asyncio.run(MineruParser().parse_document(str(path)))
+            fallback = asyncio.run(DoclingParser()._fallback_text_extraction(str(path)))
+        finally:
+            config.WORKING_DIR = original
+
+    assert [(item["page_idx"], item["text_level"]) for item in items][:2] == [(0, 1), (0, 0)]
+    assert {item["page_idx"] for item in items} == {0, 1}
+    # The last-resort fallback uses the same extraction without classification
+    assert [item["text"] for item in fallback] == [item["text"] for item in items]
+
+if __name__ == "__main__":
+    test_scan_routes_pages()
+    test_scan_in_process_pool()
+    test_figures_and_borderless_tables_go_to_mineru()
+    test_born_digital_pdf_skips_mineru()
+    print("✅ PDF text-layer tests passed")
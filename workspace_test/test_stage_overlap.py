@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test that text indexing and multimodal analysis overlap, with per-stage timings
+"""
+
+import sys
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.config import config
+from rag_core.parsers import ParserFactory
+from rag_core.pipeline import RAGPipeline
+
+class _Separator:
+    """Content separator returning one text block and one image"""
+
+    class processor:
+        class context_extractor:
+            @staticmethod
+            def build_index(content_list):
+                return None
+
+    async def process_document_content(self, content_list, task_id):
+        return "Quarterly revenue grew.", [{"type": "image", "img_path": "chart.png", "page_idx": 0}], {
+            "structure": {"total_pages": 1}
+        }
+
+class _Registry:
+    def register_document(self, **kwargs):
+        pass
+
+class _Storage:
+    async def store_document(self, **kwargs):
+        pass
+
+    async def find_entity_relationships(self, doc_id):
+        pass
+
+def _pipeline(kv_dir: Path, events: list, fail_text: bool = False) -> RAGPipeline:
+    """Legacy-path pipeline whose network-bound stages just wait"""
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.config = config
+    pipeline.kv_dir = kv_dir
+    pipeline.lightrag = None
+    pipeline.image_dedup = None
+    pipeline.table_store = None
+    pipeline.content_separator = _Separator()
+    pipeline.doc_registry = _Registry()
+    pipeline.storage_manager = _Storage()
+
+    async def process_text(*args):
+        events.append("text start")
+        await asyncio.sleep(0.2)
+        if fail_text:
+            raise RuntimeError("embedding provider unavailable")
+        events.append("text end")
+        return 3, 2
+
+    async def process_multimodal(items, *args):
+        events.append("multimodal start")
+        await asyncio.sleep(0.2)
+        events.append("multimodal end")
+        return 1, 0
+
+    async def count_chunks(doc_id):
+        return 4
+
+    async def get_entities(doc_id):
+        return ["Revenue"]
+
+    pipeline._process_text_content = process_text
+    pipeline._process_multimodal_content = process_multimodal
+    pipeline._count_chunks = count_chunks
+    pipeline._get_entities = get_entities
+    return pipeline
+
+async def _parse(file_path, parser_type=None, ingest_summary=None):
+    ingest_summary["parser_used"] = "test"
+    return [{"type": "text", "text": "Quarterly revenue grew.", "page_idx": 0}]
+
+def test_text_and_multimodal_overlap():
+    original_parse = ParserFactory.parse_document
+    original_dir = config.CHECKPOINT_DIR
+    ParserFactory.parse_document = staticmethod(_parse)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.CHECKPOINT_DIR = str(Path(tmp) / "checkpoints")
+            source = Path(tmp) / "report.pdf"
+            source.write_bytes(b"%PDF-1.4")
+
+            # A failing text stage doesn't lose the multimodal work that ran alongside it
+            events = []
+            try:
+                asyncio.run(_pipeline(Path(tmp), events, fail_text=True).process_document(str(source), "overlap"))
+                assert False, "expected the text stage failure"
+            except RuntimeError:
+                pass
+            assert "multimodal end" in events
+
+            events = []
+            status = asyncio.run(_pipeline(Path(tmp), events).process_document(str(source), "overlap"))
+
+            assert status.status == "completed" and status.chunks_created == 4
+            # Only the failed stage ran again
+            assert events == ["text start", "text end"]
+            timings = status.ingest_summary["stage_timings"]
+            assert {"parse", "separate", "multimodal", "text_index", "graph", "register"} <= set(timings)
+
+            events = []
+            fresh = source.with_name("fresh.pdf")
+            fresh.write_bytes(b"%PDF-1.5")
+            start = time.time()
+            status = asyncio.run(_pipeline(Path(tmp), events).process_document(str(fresh), "fresh"))
+            elapsed = time.time() - start
+
+            # Both stages start before either finishes: latency ~ max(text, multimodal), not the sum
+            assert events[:2] == ["text start", "multimodal start"]
+            assert elapsed < 0.35
+            timings = status.ingest_summary["stage_timings"]
+            assert timings["text_and_multimodal"] < timings["text_index"] + timings["multimodal"]
+    finally:
+        ParserFactory.parse_document = original_parse
+        config.CHECKPOINT_DIR = original_dir
+
+if __name__ == "__main__":
+    test_text_and_multimodal_overlap()
+    print("✅ Stage overlap tests passed")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test that uploads are streamed to disk with a running hash and size limit
+"""
+
+import sys
+import io
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from rag_core.config import config
+
+# Importing the app opens its job queue and stores; keep them out of ./rag_storage
+_storage = tempfile.TemporaryDirectory()
+_original_dirs = (config.WORKING_DIR, config.UPLOAD_DIR)
+config.WORKING_DIR = _storage.name
+config.UPLOAD_DIR = str(Path(_storage.name) / "uploads")
+try:
+    from app.main import app, save_upload
+finally:
+    config.WORKING_DIR, config.UPLOAD_DIR = _original_dirs
+
+class _CountingFile(io.BytesIO):
+    """Upload body that records the largest single read"""
+
+    largest_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.largest_read = max(self.largest_read, len(data))
+        return data
+
+def test_save_upload_streams_and_hashes():
+    body = b"x" * (3 * 1024 * 1024 + 17)
+    source = _CountingFile(body)
+    with tempfile.TemporaryDirectory() as tmp:
+        target = Path(tmp) / "task" / "doc.pdf"
+        target.parent.mkdir()
+        result = asyncio.run(save_upload(UploadFile(file=source, filename="doc.pdf"), target))
+        assert result == {"size": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+        assert target.read_bytes() == body
+        assert source.largest_read == config.UPLOAD_CHUNK_SIZE_KB * 1024
+
+def test_save_upload_rejects_oversized_stream():
+    original = config.MAX_FILE_SIZE_MB
+    config.MAX_FILE_SIZE_MB = 1
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "task" / "big.pdf"
+            target.parent.mkdir()
+            # Size unknown up front (chunked request): rejected while streaming, partial file removed
+            upload = UploadFile(file=io.BytesIO(b"x" * (3 * 1024 * 1024)), filename="big.pdf")
+            try:
+                asyncio.run(save_upload(upload, target))
+                assert False, "expected 413"
+            except HTTPException as e:
+                assert e.status_code == 413
+            assert not target.parent.exists()
+
+            # Content-Length over the limit is refused before the body is read
+            response = TestClient(app).post(
+                "/ingest/upload",
+                files={"file": ("big.pdf", b"x" * (2 * 1024 * 1024), "application/pdf")}
+            )
+            assert response.status_code == 413
+    finally:
+        config.MAX_FILE_SIZE_MB = original
+
+if __name__ == "__main__":
+    test_save_upload_streams_and_hashes()
+    test_save_upload_rejects_oversized_stream()
+    print("✅ Streaming upload tests passed")
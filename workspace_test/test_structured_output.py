@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test schema-constrained JSON generation and the single repair attempt
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.llm_unified import UnifiedLLM, StructuredOutputError, parse_json_response, llm_usage_scope
+from rag_core.multimodal import TABLE_ANALYSIS_SCHEMA
+
+class ScriptedLLM(UnifiedLLM):
+    """UnifiedLLM that replays canned responses instead of calling a provider"""
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.calls = []
+
+    async def generate_text(self, prompt, model=None, system_prompt=None, temperature=0.7,
+                            max_tokens=None, task=None, response_format=None):
+        self.calls.append({"task": task, "response_format": response_format})
+        return self.responses.pop(0)
+
+VALID_TABLE = (
+    '{"main_findings": ["a"], "statistical_insights": "s", "context_relevance": "c", '
+    '"notable_points": ["p"], "patterns": "none"}'
+)
+
+def test_parse_json_response():
+    """Fenced output is accepted, missing fields are rejected"""
+    assert parse_json_response(f"```json\n{VALID_TABLE}\n```", TABLE_ANALYSIS_SCHEMA)["patterns"] == "none"
+
+    try:
+        parse_json_response('{"main_findings": []}', TABLE_ANALYSIS_SCHEMA)
+        assert False, "missing fields should be rejected"
+    except StructuredOutputError as e:
+        assert "statistical_insights" in str(e)
+
+    # Providers without native schema enforcement can return the right keys with the wrong types
+    wrong_types = [
+        VALID_TABLE.replace('["a"]', '"a, b"'),
+        VALID_TABLE.replace('["a"]', '["a", 2]'),
+        VALID_TABLE.replace('"none"', 'null')
+    ]
+    for response in wrong_types:
+        try:
+            parse_json_response(response, TABLE_ANALYSIS_SCHEMA)
+            assert False, f"{response} should be rejected"
+        except StructuredOutputError as e:
+            assert "Wrong field types" in str(e)
+
+def test_generate_json_repairs_once():
+    """A malformed first response is repaired on the extract tier"""
+    llm = ScriptedLLM(["Sure! Here is the analysis: {main_findings", VALID_TABLE])
+
+    with llm_usage_scope() as usage:
+        data = asyncio.run(llm.generate_json("analyze", TABLE_ANALYSIS_SCHEMA, "table_analysis", task="summarize"))
+
+    assert data["main_findings"] == ["a"]
+    assert [call["task"] for call in llm.calls] == ["summarize", "extract"]
+    assert llm.calls[0]["response_format"]["json_schema"]["strict"] is True
+    stats = usage.snapshot()["summarize"]
+    assert stats["json_failures"] == 1
+    assert stats["json_repaired"] == 1
+    assert stats["json_wasted"] == 0
+
+def test_generate_json_repairs_wrong_types():
+    """A string where the schema wants a list goes to the repair pass instead of being returned"""
+    llm = ScriptedLLM([VALID_TABLE.replace('["a"]', '"a, b"'), VALID_TABLE.replace('["a"]', '["a", "b"]')])
+
+    data = asyncio.run(llm.generate_json("analyze", TABLE_ANALYSIS_SCHEMA, "table_analysis", task="summarize"))
+
+    assert data["main_findings"] == ["a", "b"]
+    assert [call["task"] for call in llm.calls] == ["summarize", "extract"]
+
+def test_generate_json_gives_up_after_repair():
+    """A failed repair raises and counts the call as wasted"""
+    llm = ScriptedLLM(["not json", "still not json"])
+
+    with llm_usage_scope() as usage:
+        try:
+            asyncio.run(llm.generate_json("analyze", TABLE_ANALYSIS_SCHEMA, task="summarize"))
+            assert False, "unrepairable output should raise"
+        except StructuredOutputError as e:
+            assert e.raw_response == "not json"
+
+    assert len(llm.calls) == 2
+    assert usage.snapshot()["summarize"]["json_wasted"] == 1
+
+if __name__ == "__main__":
+    test_parse_json_response()
+    test_generate_json_repairs_once()
+    test_generate_json_repairs_wrong_types()
+    test_generate_json_gives_up_after_repair()
+    print("✅ Structured output tests passed")
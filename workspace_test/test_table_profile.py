@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test local table profiling for LLM table prompts
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.table_profile import build_table_prompt, parse_table_body, profile_table
+
+def _excel_chunk(rows: int = 200) -> str:
+    """A table chunk in the shape produced by the Excel fallback parser"""
+    lines = [f"Sheet: Sales (rows 1-{rows} of {rows})", "| Region | Date | Revenue | Units |", "| --- | --- | --- | --- |"]
+    regions = ["North", "South", "East", "West"]
+    for i in range(rows):
+        lines.append(f"| {regions[i % 4]} | 2024-01-{i % 28 + 1:02d} | ${1000 + i * 10:,} | {i} |")
+    return "\n".join(lines)
+
+def test_parse_html_and_pipe_tables():
+    """MinerU HTML (with spans) and pipe tables parse to the same grid"""
+    html = (
+        "<table><tr><th>Item</th><th colspan='2'>Q1</th></tr>"
+        "<tr><td rowspan='2'>A</td><td>1</td><td>2</td></tr>"
+        "<tr><td>3</td><td>4</td></tr></table>"
+    )
+    df = parse_table_body(html)
+    assert list(df.columns) == ["Item", "Q1", "Q1_2"]
+    assert df.values.tolist() == [["A", "1", "2"], ["A", "3", "4"]]
+
+    df = parse_table_body(_excel_chunk(5))
+    assert list(df.columns) == ["Region", "Date", "Revenue", "Units"]
+    assert len(df) == 5
+    assert parse_table_body("no table here") is None
+
+def test_profile_types_and_aggregates():
+    """Column types, numeric aggregates, date ranges and top values"""
+    profile = profile_table(parse_table_body(_excel_chunk(200)))
+    columns = {column["name"]: column for column in profile["column_profiles"]}
+
+    assert profile["rows"] == 200 and profile["columns"] == 4
+    assert columns["Revenue"]["type"] == "numeric"
+    assert columns["Revenue"]["min"] == 1000 and columns["Revenue"]["max"] == 2990
+    assert columns["Revenue"]["sum"] == sum(1000 + i * 10 for i in range(200))
+    assert columns["Units"]["mean"] == 99.5
+    assert columns["Date"]["type"] == "date"
+    assert columns["Date"]["min"] == "2024-01-01" and columns["Date"]["max"] == "2024-01-28"
+    assert columns["Region"]["type"] == "text" and columns["Region"]["distinct"] == 4
+    assert columns["Region"]["top_values"][0][1] == 50
+
+def test_large_tables_shrink_small_tables_pass_through():
+    """Only large tables are replaced by a profile plus a bounded excerpt"""
+    small = _excel_chunk(3)
+    prompt = build_table_prompt(small, max_chars=4000)
+    assert prompt.text == small and not prompt.profiled
+
+    large = _excel_chunk(200)
+    prompt = build_table_prompt(large, max_chars=4000, sample_limit=8)
+    assert prompt.profiled
+    assert len(prompt.text) < len(large) / 3
+    assert "Representative rows (8 of 200)" in prompt.text
+    # Head, tail and numeric extremes are in the excerpt
+    assert "| North | 2024-01-01 | $1,000 | 0 |" in prompt.text
+    assert "$2,990" in prompt.text
+
+    unparseable = "x" * 10000
+    prompt = build_table_prompt(unparseable, max_chars=4000)
+    assert not prompt.profiled and len(prompt.text) < 4100
+
+def test_wide_tables_stay_within_budget():
+    """Many columns and long cells: the whole prompt, profile included, fits max_chars"""
+    columns = [f"Column {n} with a rather long descriptive header" for n in range(80)]
+    lines = ["| " + " | ".join(columns) + " |", "| " + " | ".join("---" for _ in columns) + " |"]
+    for i in range(100):
+        lines.append("| " + " | ".join(f"free-text note {i % 7} " + "lorem ipsum " * 20 for _ in columns) + " |")
+    wide = "\n".join(lines)
+
+    prompt = build_table_prompt(wide, max_chars=4000)
+    assert prompt.profiled
+    assert len(prompt.text) <= 4000
+    assert "more column(s) not profiled" in prompt.text
+
+if __name__ == "__main__":
+    test_parse_html_and_pipe_tables()
+    test_profile_types_and_aggregates()
+    test_large_tables_shrink_small_tables_pass_through()
+    test_wide_tables_stay_within_budget()
+    print("✅ Table profile tests passed")
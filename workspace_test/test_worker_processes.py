@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test that stores shared by ingest worker processes don't lose each other's writes
+"""
+
+import os
+import sys
+import multiprocessing
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_core.config import config
+from rag_core.image_hashing import ImageDedupIndex
+from rag_core import mineru_pool
+from rag_core.utils import DocumentRegistry
+
+def _register_many(registry_dir: str, worker: int):
+    registry = DocumentRegistry(Path(registry_dir))
+    for i in range(20):
+        registry.register_document(f"doc-{worker}-{i}", f"/tmp/{worker}-{i}.pdf", {"chunks_count": i})
+
+def test_registry_concurrent_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=_register_many, args=(tmp, w)) for w in range(4)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+            assert proc.exitcode == 0
+
+        registry = DocumentRegistry(Path(tmp))
+        assert len(registry.list_documents()) == 80
+
+        # A long-lived reader (the API process) sees documents registered elsewhere
+        DocumentRegistry(Path(tmp)).register_document("late", "/tmp/late.pdf", {})
+        assert registry.get_document("late") is not None
+        registry.remove_document("late")
+        assert DocumentRegistry(Path(tmp)).get_document("late") is None
+
+def test_dedup_index_saves_merge():
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "image_hashes.json"
+        first = ImageDedupIndex(index_path)
+        second = ImageDedupIndex(index_path)
+        first.add(0x0F0F0F0F0F0F0F0F, "sha-a", "chart", "/a.png", "doc-a")
+        second.add(0x7777777700000000, "sha-b", "logo", "/b.png", "doc-b")
+        first.save()
+        second.save()
+
+        reloaded = ImageDedupIndex(index_path)
+        assert reloaded.find(0x0F0F0F0F0F0F0F0F, "sha-a", "doc-a")["analysis"] == "chart"
+        assert reloaded.find(0x7777777700000000, "sha-b", "doc-b")["analysis"] == "logo"
+        # The saver picks up the other process's entries too
+        assert second.find(0x0F0F0F0F0F0F0F0F, "sha-a", "doc-b")["doc_id"] == "doc-a"
+
+def test_pools_split_cores_between_processes():
+    """Each forked worker gets its share of the cores for its MinerU and page-scan pools"""
+    original = (os.cpu_count, config.INGEST_PROCESSES, config.MINERU_POOL_SIZE, config.MINERU_CPU_PER_WORKER)
+    os.cpu_count = lambda: 32
+    config.MINERU_POOL_SIZE, config.MINERU_CPU_PER_WORKER = 0, 4
+    try:
+        config.INGEST_PROCESSES = 1
+        assert config.get_cpu_share() == 32
+        assert mineru_pool.default_parallelism() == 8
+
+        config.INGEST_PROCESSES = 4
+        assert config.get_cpu_share() == 8
+        assert mineru_pool.default_parallelism() == 2
+
+        config.INGEST_PROCESSES = 64
+        assert config.get_cpu_share() == 1
+    finally:
+        os.cpu_count, config.INGEST_PROCESSES, config.MINERU_POOL_SIZE, config.MINERU_CPU_PER_WORKER = original
+
+if __name__ == "__main__":
+    test_registry_concurrent_processes()
+    test_dedup_index_saves_merge()
+    test_pools_split_cores_between_processes()
+    print("✅ Worker process store tests passed")